@@ -0,0 +1,187 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+
+
+STAGES = ('generate', 'transform', 'model')
+DEFAULT_SCALES = ['10000:10', '100000:100']
+DEFAULT_THRESHOLD = 0.20
+DEFAULT_REPETITIONS = 3
+# Diferencias absolutas menores que estas se consideran ruido, sin importar el porcentaje.
+MIN_ABSOLUTE_CHANGE = {'segundos': 0.05, 'rss_max_mb': 10.0}
+BRANDS = ['Nike', 'Adidas', 'Puma', 'Reebok', 'New Balance', 'Skechers']
+
+
+def write_competitor_fixture(project_root, num_products=1000, seed=0):
+    """
+    Escribe un `suburbia_products.json` determinista con el formato del scraper,
+    para correr el pipeline sin red. La mayoría de los precios ya vienen como
+    número; algunos conservan el texto original (con formato, rangos o vacíos)
+    para ejercitar el parseo de precios.
+    """
+    rng = np.random.default_rng(seed)
+    list_prices = np.round(rng.uniform(899.0, 2999.0, num_products), 2)
+    discounts = np.round(list_prices * rng.uniform(0.7, 1.0, num_products), 2)
+    products = []
+    for i in range(num_products):
+        discount = float(discounts[i])
+        if i % 50 == 1:
+            discount = f"${discount:,.2f}"
+        elif i % 50 == 2:
+            discount = f"${discount:,.2f} - ${float(list_prices[i]):,.2f}"
+        elif i % 50 == 3:
+            discount = None
+        products.append({
+            'sku_competidor': f"SUB-{i}",
+            'nombre_producto': f"{BRANDS[i % len(BRANDS)]} Tenis deportivos modelo {i}",
+            'precio_lista': float(list_prices[i]),
+            'precio_descuento': discount,
+            'url_producto': f"https://www.suburbia.com.mx/tienda/producto/{i}",
+            'fecha_extraccion': '2024-10-01T00:00:00',
+        })
+    scraped_path = os.path.join(project_root, 'data', 'scraped_data')
+    os.makedirs(scraped_path, exist_ok=True)
+    with open(os.path.join(scraped_path, 'suburbia_products.json'), 'w', encoding='utf-8') as f:
+        json.dump(products, f, indent=4, ensure_ascii=False)
+
+
+def _run_stage(stage, project_root, num_sales, num_stores, storage_format, seed):
+    # Se ejecuta en un proceso hijo nuevo: su RSS máximo es el de la etapa.
+    from src.ingestion.data_generation.synthetic_data_generator_v2 import generate_data_from_scrape
+    from src.processing.data_transformer import transform_data
+    from src.modeling.pricing_model import recommend_prices
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if stage == 'generate':
+            generate_data_from_scrape(project_root, num_sales_records=num_sales, num_stores=num_stores,
+                                      batched=True, seed=seed, storage_format=storage_format)
+        elif stage == 'transform':
+            transform_data(project_root, storage_format)
+        else:
+            recommend_prices(project_root, storage_format)
+    elapsed = time.perf_counter() - start
+
+    if stage == 'model':
+        output_file = os.path.join(project_root, 'data', 'recommendations', 'recommended_prices.csv')
+        with open(output_file, encoding='utf-8') as f:
+            num_rows = sum(1 for _ in f) - 1
+    else:
+        num_rows = num_sales
+    return {
+        'segundos': round(elapsed, 3),
+        'filas': num_rows,
+        'filas_s': round(num_rows / elapsed) if elapsed > 0 else None,
+        'rss_max_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def run_pipeline_benchmark(scales, num_products=1000, storage_format=None, seed=0,
+                           repetitions=DEFAULT_REPETITIONS):
+    """
+    Corre generación, transformación y modelo para cada escala (ventas, tiendas).
+    Cada ejecución de una etapa ocurre en un proceso nuevo para medir su RSS
+    máximo por separado. Cada etapa se repite `repetitions` veces y se reporta
+    el menor tiempo y el mayor RSS.
+    """
+    spawn = mp.get_context('spawn')
+    results = []
+    for num_sales, num_stores in scales:
+        project_root = tempfile.mkdtemp(prefix='pipeline_bench_')
+        try:
+            write_competitor_fixture(project_root, num_products, seed)
+            for stage in STAGES:
+                runs = []
+                for _ in range(repetitions):
+                    with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:
+                        runs.append(executor.submit(_run_stage, stage, project_root, num_sales, num_stores,
+                                                    storage_format, seed).result())
+                result = min(runs, key=lambda r: r['segundos'])
+                result = {'ventas': num_sales, 'tiendas': num_stores, 'etapa': stage, **result,
+                          'rss_max_mb': max(r['rss_max_mb'] for r in runs)}
+                print(result)
+                results.append(result)
+        finally:
+            shutil.rmtree(project_root, ignore_errors=True)
+    return results
+
+
+def compare_with_baseline(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compara contra una corrida base (misma escala y etapa). Regresa las regresiones:
+    tiempo o RSS máximo mayores que la base en más de `threshold` (proporción) y
+    en más de `MIN_ABSOLUTE_CHANGE`.
+    """
+    base = {(r['ventas'], r['tiendas'], r['etapa']): r for r in baseline['resultados']}
+    regressions = []
+    for result in results:
+        reference = base.get((result['ventas'], result['tiendas'], result['etapa']))
+        if reference is None:
+            continue
+        for metric in ('segundos', 'rss_max_mb'):
+            change = result[metric] / reference[metric] - 1 if reference[metric] else 0.0
+            if change > threshold and result[metric] - reference[metric] > MIN_ABSOLUTE_CHANGE[metric]:
+                regressions.append({
+                    'ventas': result['ventas'], 'tiendas': result['tiendas'], 'etapa': result['etapa'],
+                    'metrica': metric, 'base': reference[metric], 'actual': result[metric],
+                    'cambio': f"{change:+.1%}",
+                })
+    return regressions
+
+
+def _parse_scale(text):
+    num_sales, _, num_stores = text.partition(':')
+    return int(num_sales), int(num_stores or 10)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de generación, transformación y modelo por escala.")
+    parser.add_argument('--escalas', nargs='+', default=DEFAULT_SCALES,
+                        help="Escalas como ventas:tiendas (ej. 10000:10 1000000:100 10000000:1000).")
+    parser.add_argument('--productos', type=int, default=1000, help="Productos del fixture de competencia.")
+    parser.add_argument('--formato', default=None, help="Formato de almacenamiento (por defecto, STORAGE_FORMAT).")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--repeticiones', type=int, default=DEFAULT_REPETITIONS)
+    parser.add_argument('--salida', default='pipeline_benchmark.json', help="Archivo JSON de resultados.")
+    parser.add_argument('--base', default=None, help="JSON de una corrida anterior para comparar.")
+    parser.add_argument('--umbral', type=float, default=DEFAULT_THRESHOLD,
+                        help="Proporción de empeoramiento tolerada frente a la base (0.20 = 20%%).")
+    args = parser.parse_args()
+
+    from src.storage import STORAGE_FORMAT
+    results = run_pipeline_benchmark([_parse_scale(s) for s in args.escalas], args.productos,
+                                     args.formato, args.semilla, args.repeticiones)
+    report = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'nucleos': os.cpu_count(),
+        'formato': args.formato or STORAGE_FORMAT,
+        'productos': args.productos,
+        'repeticiones': args.repeticiones,
+        'resultados': results,
+    }
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"Resultados guardados en '{args.salida}'.")
+
+    if args.base:
+        with open(args.base, encoding='utf-8') as f:
+            regressions = compare_with_baseline(results, json.load(f), args.umbral)
+        if regressions:
+            print(f"--- {len(regressions)} regresiones frente a '{args.base}' ---")
+            for regression in regressions:
+                print(regression)
+            sys.exit(1)
+        print(f"Sin regresiones frente a '{args.base}' (umbral {args.umbral:.0%}).")
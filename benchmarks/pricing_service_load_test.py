@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from benchmarks.storage_benchmark import build_analytical_table
+from src.processing.current_state import merge_current_state, save_current_state, load_current_state
+from src.processing.schema import apply_schema
+
+
+def write_service_fixture(project_root, num_rows, num_stores, num_skus, seed=0):
+    """
+    Escribe un estado actual sintético en `project_root` y regresa sus llaves (sku, id_tienda).
+    """
+    processed = os.path.join(project_root, 'data', 'processed')
+    os.makedirs(processed, exist_ok=True)
+    df_state = merge_current_state(None, apply_schema(build_analytical_table(num_rows, num_stores, num_skus, seed)))
+    save_current_state(df_state, processed)
+    return list(zip(df_state['sku'].astype(str), df_state['id_tienda'].astype(int)))
+
+
+def bump_fixture_prices(project_root, factor=1.01):
+    """
+    Cambia los precios del estado actual (mismas llaves) para forzar una recarga.
+    """
+    processed = os.path.join(project_root, 'data', 'processed')
+    df_state = load_current_state(processed)
+    df_state['precio_unitario'] = df_state['precio_unitario'] * np.float32(factor)
+    save_current_state(df_state, processed)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def _request(reader, writer, method, target, body=b''):
+    writer.write(f"{method} {target} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+                 + body)
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b'\r\n':
+            break
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':')[1])
+    return status, await reader.readexactly(length)
+
+
+async def _wait_until_ready(host, port, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            await asyncio.sleep(0.2)
+            continue
+        status, body = await _request(reader, writer, 'GET', '/salud')
+        writer.close()
+        return json.loads(body)
+    raise TimeoutError("El servicio no respondió a tiempo.")
+
+
+async def _client(host, port, keys, num_requests, batch_size, rng, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(num_requests):
+            picks = rng.integers(0, len(keys), batch_size)
+            start = time.perf_counter()
+            if batch_size == 1:
+                sku, id_tienda = keys[picks[0]]
+                status, _ = await _request(reader, writer, 'GET', f'/precio?sku={sku}&id_tienda={id_tienda}')
+            else:
+                body = json.dumps([{'sku': keys[i][0], 'id_tienda': keys[i][1]} for i in picks]).encode()
+                status, _ = await _request(reader, writer, 'POST', '/precios', body)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, keys, connections, num_requests, batch_size, seed=0):
+    """
+    Abre `connections` conexiones persistentes que hacen `num_requests` peticiones
+    cada una y regresa la latencia observada por el cliente.
+    """
+    latencies, errors = [], []
+    rngs = [np.random.default_rng(seed + i) for i in range(connections)]
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, keys, num_requests, batch_size, rng, latencies, errors)
+                           for rng in rngs))
+    elapsed = time.perf_counter() - start
+    ms = np.array(latencies) * 1000
+    return {
+        'lote': batch_size,
+        'conexiones': connections,
+        'peticiones': len(latencies),
+        'errores': len(errors),
+        'peticiones_s': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'p99_ms_por_consulta': round(float(np.percentile(ms, 99)) / batch_size, 4),
+    }
+
+
+async def run_reload_check(host, port, project_root, keys, connections, num_requests):
+    """
+    Reescribe el estado actual mientras el servicio atiende carga y verifica que
+    no haya peticiones fallidas y que se publique una versión nueva.
+    """
+    before = await _wait_until_ready(host, port)
+    load = asyncio.create_task(run_load(host, port, keys, connections, num_requests, 1, seed=99))
+    await asyncio.sleep(0.5)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, bump_fixture_prices, project_root)
+    result = await load
+    await asyncio.sleep(3)
+    after = await _wait_until_ready(host, port)
+    result['version_antes'], result['version_despues'] = before['version'], after['version']
+    return result
+
+
+async def main(args):
+    project_root = tempfile.mkdtemp(prefix='pricing_service_')
+    keys = write_service_fixture(project_root, args.filas, args.tiendas, args.skus)
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'src.serving.pricing_service', '--raiz', project_root,
+         '--puerto', str(port), '--recarga', '1'],
+        stdout=subprocess.DEVNULL)
+    try:
+        health = await _wait_until_ready('127.0.0.1', port)
+        print(f"--- Servicio listo en el puerto {port} con {health['registros']} registros ---")
+        print(await run_load('127.0.0.1', port, keys, 1, args.peticiones, 1))
+        print(await run_load('127.0.0.1', port, keys, args.conexiones, args.peticiones, 1))
+        print(await run_load('127.0.0.1', port, keys, args.conexiones, args.peticiones // 10, args.lote))
+        print("--- Recarga en caliente bajo carga ---")
+        print(await run_reload_check('127.0.0.1', port, project_root, keys, args.conexiones, args.peticiones))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga del servicio de precios en localhost.")
+    parser.add_argument('--filas', type=int, default=500_000, help="Filas de la tabla analítica sintética.")
+    parser.add_argument('--tiendas', type=int, default=50)
+    parser.add_argument('--skus', type=int, default=1000)
+    parser.add_argument('--conexiones', type=int, default=8)
+    parser.add_argument('--peticiones', type=int, default=5000, help="Peticiones por conexión.")
+    parser.add_argument('--lote', type=int, default=100, help="Consultas por petición en la prueba de lotes.")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,91 @@
+import argparse
+import time
+import numpy as np
+from src.processing.product_matching import build_index, update_index, score_candidates, name_ngrams, MIN_SCORE
+
+BRANDS = ['Nike', 'Adidas', 'Puma', 'Reebok', 'New Balance', 'Skechers', 'Vans', 'Converse', 'Fila', 'Asics']
+KINDS = ['Tenis deportivos', 'Tenis casuales', 'Sandalias', 'Botas', 'Zapatos de vestir', 'Mocasines']
+COLORS = ['negro', 'blanco', 'azul marino', 'rojo', 'gris', 'verde olivo', 'beige']
+SYLLABLES = ['ra', 'zo', 'ki', 'mu', 'tel', 'vor', 'xa', 'pen', 'lu', 'dri', 'go', 'sen', 'qua', 'fy', 'bor']
+
+
+def synthetic_names(num_products, seed=0):
+    """
+    Nombres de producto con marca, tipo, color, un nombre de modelo inventado y talla.
+    """
+    rng = np.random.default_rng(seed)
+    names = []
+    for _ in range(num_products):
+        model = ''.join(SYLLABLES[i] for i in rng.integers(0, len(SYLLABLES), rng.integers(2, 4)))
+        names.append(f"{BRANDS[rng.integers(len(BRANDS))]} {KINDS[rng.integers(len(KINDS))]} "
+                     f"{model.capitalize()} {rng.integers(1, 999)} {COLORS[rng.integers(len(COLORS))]} "
+                     f"talla {rng.integers(22, 31)}")
+    return names
+
+
+def perturb(name, rng):
+    # Variaciones típicas entre catálogos: mayúsculas, acentos y palabras omitidas.
+    words = name.upper().replace('TENIS', 'TENÍS').split()
+    drop = rng.integers(0, len(words))
+    return ' '.join(w for i, w in enumerate(words) if i != drop or len(words) < 4)
+
+
+def run_matching_benchmark(num_products, new_fraction=0.01, sample=200, seed=0):
+    """
+    Empata `num_products` productos del catálogo (versiones alteradas de los de la
+    competencia) contra `num_products` de la competencia y reporta tiempo,
+    precisión del mejor empate, concordancia con la comparación exhaustiva en una
+    muestra y el tiempo de una actualización incremental del índice.
+    """
+    rng = np.random.default_rng(seed)
+    doc_names = synthetic_names(num_products, seed)
+    doc_keys = [f"SUB-{i}" for i in range(num_products)]
+    query_names = [perturb(name, rng) for name in doc_names]
+
+    start = time.perf_counter()
+    index = build_index(doc_keys, doc_names)
+    index_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    queries, docs, scores = score_candidates(index, query_names)
+    match_seconds = time.perf_counter() - start
+
+    first = np.concatenate([[True], queries[1:] != queries[:-1]])
+    best = dict(zip(queries[first], docs[first]))
+    accuracy = np.mean([best.get(i) == i for i in range(num_products)])
+
+    # Concordancia con la comparación exhaustiva (todos contra todos) en una muestra.
+    doc_ngrams = [name_ngrams(name) for name in doc_names]
+    agree = 0
+    for i in rng.choice(num_products, min(sample, num_products), replace=False):
+        ngrams = name_ngrams(query_names[i])
+        exhaustive = max(2 * len(ngrams & d) / (len(ngrams) + len(d)) for d in doc_ngrams)
+        found = scores[queries == i]
+        agree += bool(abs(found[0] - exhaustive) < 1e-4) if len(found) else exhaustive < MIN_SCORE
+
+    num_new = max(1, int(num_products * new_fraction))
+    new_names = synthetic_names(num_new, seed + 1)
+    start = time.perf_counter()
+    index, kept = update_index(index, doc_keys + [f"NEW-{i}" for i in range(num_new)], doc_names + new_names)
+    score_candidates(index, query_names, first_doc=kept)
+    update_seconds = time.perf_counter() - start
+
+    return {
+        'productos': num_products,
+        'indice_s': round(index_seconds, 2),
+        'empate_s': round(match_seconds, 2),
+        'consultas_s': round(num_products / match_seconds),
+        'precision_top1': round(float(accuracy), 4),
+        'concordancia_exhaustiva': round(agree / min(sample, num_products), 4),
+        'productos_nuevos': num_new,
+        'actualizacion_s': round(update_seconds, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del empate de productos por nombre.")
+    parser.add_argument('--productos', type=int, nargs='+', default=[10_000, 100_000],
+                        help="Productos en cada lado (catálogo y competencia).")
+    parser.add_argument('--muestra', type=int, default=200, help="Consultas verificadas contra todos contra todos.")
+    args = parser.parse_args()
+    for num_products in args.productos:
+        print(run_matching_benchmark(num_products, sample=args.muestra))
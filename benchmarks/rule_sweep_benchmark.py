@@ -0,0 +1,56 @@
+import argparse
+import time
+import numpy as np
+from benchmarks.storage_benchmark import build_analytical_table
+from src.modeling.pricing_model import apply_pricing_rules, build_pricing_rules
+from src.modeling.rule_sweep import build_parameter_grid, sweep_pricing_rules, SWEEP_PARAMETERS
+
+
+def benchmark_grid(num_configs):
+    """
+    Rejilla de unas `num_configs` configuraciones: tolerancia a la competencia,
+    umbral de alto inventario y factor de descuento (raíz cúbica de valores cada uno).
+    """
+    steps = max(1, round(num_configs ** (1 / 3)))
+    return build_parameter_grid(
+        factor_competencia=np.linspace(1.0, 1.2, steps),
+        umbral_alto_inventario=np.linspace(30, 90, steps).round(),
+        factor_alto_inventario=np.linspace(0.80, 0.99, steps),
+    )
+
+
+def run_sweep_benchmark(num_rows, num_configs, workers=None, loop_sample=3, seed=0):
+    """
+    Mide el barrido vectorizado de `num_configs` configuraciones sobre `num_rows`
+    filas y lo compara con el tiempo estimado de aplicar las reglas una
+    configuración a la vez (extrapolado de `loop_sample` configuraciones).
+    """
+    df_state = build_analytical_table(num_rows, num_skus=20_000, seed=seed)
+    df_grid = benchmark_grid(num_configs)
+
+    start = time.perf_counter()
+    df_results = sweep_pricing_rules(df_state, df_grid, workers=workers)
+    sweep_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _, config in df_grid.head(loop_sample).iterrows():
+        apply_pricing_rules(df_state, build_pricing_rules(**config[list(SWEEP_PARAMETERS)].to_dict()))
+    loop_seconds = (time.perf_counter() - start) / min(loop_sample, len(df_grid)) * len(df_grid)
+
+    return {
+        'filas': num_rows,
+        'configuraciones': len(df_grid),
+        'barrido_s': round(sweep_seconds, 1),
+        'celdas_s': round(num_rows * len(df_grid) / sweep_seconds),
+        'una_a_una_estimado_s': round(loop_seconds, 1),
+        'mejor_ingreso': round(float(df_results['ingreso_proyectado'].max()), 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del barrido de parámetros de las reglas de precios.")
+    parser.add_argument('--filas', type=int, default=1_000_000, help="Filas sku-tienda del estado actual.")
+    parser.add_argument('--configuraciones', type=int, default=1000)
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos (por defecto, uno por núcleo).")
+    args = parser.parse_args()
+    print(run_sweep_benchmark(args.filas, args.configuraciones, args.procesos))
@@ -0,0 +1,77 @@
+import argparse
+import tempfile
+import time
+from bs4 import BeautifulSoup
+from benchmarks.scraper_fixtures import write_listing_fixture, serve_fixture
+from src.ingestion.web_scraping import suburbia_scraper
+
+
+def _pages_per_second(num_pages, elapsed):
+    return round(num_pages / elapsed, 1) if elapsed > 0 else float('inf')
+
+
+def benchmark_parsing(html, repetitions=50):
+    """
+    Compara construir la sopa de toda la página contra parsear solo las tarjetas.
+    """
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        BeautifulSoup(html, 'html.parser').find_all('li', class_='m-product__card')
+    full_soup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        suburbia_scraper.parse_product_cards(html, 'http://localhost/')
+    strained = time.perf_counter() - start
+
+    return {
+        'sopa_completa_paginas_s': _pages_per_second(repetitions, full_soup),
+        'solo_tarjetas_paginas_s': _pages_per_second(repetitions, strained),
+        'parser': suburbia_scraper.HTML_PARSER,
+    }
+
+
+def benchmark_crawl(base_url, category_paths, num_pages, http_workers, drivers):
+    category_urls = [base_url + path for path in category_paths]
+    results = {}
+
+    start = time.perf_counter()
+    products = suburbia_scraper.scrape_categories_http(category_urls, max_workers=http_workers)
+    elapsed = time.perf_counter() - start
+    results['http'] = {'paginas_s': _pages_per_second(num_pages, elapsed), 'productos': len(products)}
+
+    try:
+        suburbia_scraper._create_driver().quit()
+    except Exception as e:
+        results['selenium'] = {'error': f"Selenium no disponible en este entorno ({type(e).__name__})"}
+        return results
+
+    start = time.perf_counter()
+    products = suburbia_scraper.scrape_categories_selenium(category_urls, max_workers=drivers)
+    elapsed = time.perf_counter() - start
+    results['selenium'] = {'paginas_s': _pages_per_second(num_pages, elapsed), 'productos': len(products)}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Páginas por segundo de las rutas HTTP y Selenium del scraper.")
+    parser.add_argument('--categorias', type=int, default=4)
+    parser.add_argument('--paginas', type=int, default=25, help="Páginas por categoría.")
+    parser.add_argument('--productos', type=int, default=48, help="Productos por página.")
+    parser.add_argument('--hilos-http', type=int, default=8)
+    parser.add_argument('--navegadores', type=int, default=2)
+    args = parser.parse_args()
+
+    fixture_dir = tempfile.mkdtemp(prefix='scraper_fixture_')
+    category_paths = write_listing_fixture(fixture_dir, args.categorias, args.paginas, args.productos)
+    num_pages = args.categorias * args.paginas
+
+    with open(f"{fixture_dir}{category_paths[0]}", encoding='utf-8') as f:
+        print("--- Parseo de una página ---")
+        print(benchmark_parsing(f.read()))
+
+    with serve_fixture(fixture_dir) as base_url:
+        print(f"--- Recorrido de {num_pages} páginas en {base_url} ---")
+        for path, result in benchmark_crawl(base_url, category_paths, num_pages,
+                                            args.hilos_http, args.navegadores).items():
+            print(path, result)
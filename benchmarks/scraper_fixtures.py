@@ -0,0 +1,86 @@
+import os
+import threading
+from contextlib import contextmanager
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+
+CARD_TEMPLATE = """
+        <li class="m-product__card" data-prodid="{prod_id}">
+            <a href="/producto/{prod_id}">
+                <h3 class="a-card-brand">{brand}</h3>
+                <h3 class="card-title">Tenis deportivos modelo {prod_id}</h3>
+                <p class="a-card-price">${list_price:,.2f}</p>
+                <p class="a-card-discount">${discount_price:,.2f}</p>
+            </a>
+        </li>"""
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="es">
+<head><meta charset="utf-8"><title>{title}</title>{next_link}</head>
+<body>
+    <header><nav>{navigation}</nav></header>
+    <ul class="o-product__list">{cards}
+    </ul>
+    <footer>{footer}</footer>
+</body>
+</html>
+"""
+
+BRANDS = ['Nike', 'Adidas', 'Puma', 'Reebok', 'New Balance', 'Skechers']
+
+
+def write_listing_fixture(fixture_dir, num_categories=3, pages_per_category=5, products_per_page=48):
+    """
+    Escribe páginas HTML estáticas que reproducen el marcado `li.m-product__card`
+    de los listados de Suburbia, con paginación mediante enlaces `rel="next"`.
+    Regresa las rutas relativas de la primera página de cada categoría.
+    """
+    category_paths = []
+    for category in range(num_categories):
+        category_dir = os.path.join(fixture_dir, 'tienda', f'categoria-{category}')
+        os.makedirs(category_dir, exist_ok=True)
+        for page in range(1, pages_per_category + 1):
+            cards = []
+            for position in range(products_per_page):
+                prod_id = (category * pages_per_category + page - 1) * products_per_page + position
+                list_price = 999 + (prod_id * 37) % 2000
+                cards.append(CARD_TEMPLATE.format(
+                    prod_id=prod_id, brand=BRANDS[prod_id % len(BRANDS)],
+                    list_price=list_price, discount_price=round(list_price * 0.85, 2)))
+
+            has_next = page < pages_per_category
+            html = PAGE_TEMPLATE.format(
+                title=f'Categoría {category} - página {page}',
+                next_link=f'<link rel="next" href="page-{page + 1}.html">' if has_next else '',
+                # Relleno que simula el resto de la página (menús, scripts, pie).
+                navigation=''.join(f'<a href="/tienda/seccion-{i}">Sección {i}</a>' for i in range(200)),
+                cards=''.join(cards),
+                footer='<p>Suburbia (fixture local)</p>' * 100,
+            )
+            with open(os.path.join(category_dir, f'page-{page}.html'), 'w', encoding='utf-8') as f:
+                f.write(html)
+        category_paths.append(f'/tienda/categoria-{category}/page-1.html')
+    return category_paths
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def serve_fixture(fixture_dir):
+    """
+    Sirve el directorio de fixtures en un puerto libre de localhost y regresa la URL base.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(_QuietHandler, directory=fixture_dir))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
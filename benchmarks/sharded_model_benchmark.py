@@ -0,0 +1,55 @@
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+from benchmarks.pricing_service_load_test import write_service_fixture
+from src.modeling.pricing_model import recommend_prices, SHARD_KEYS
+
+
+def run_sharded_benchmark(project_root, worker_counts, shard_key):
+    """
+    Mide filas por segundo de `recommend_prices` con distintos números de procesos
+    y verifica que la salida sea idéntica a la de un solo proceso.
+    """
+    output_file = os.path.join(project_root, 'data', 'recommendations', 'recommended_prices.csv')
+    results = []
+    reference = None
+    for workers in worker_counts:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            recommend_prices(project_root, workers=workers, shard_key=shard_key)
+        elapsed = time.perf_counter() - start
+        with open(output_file, encoding='utf-8') as f:
+            output = f.read()
+        if reference is None:
+            reference = output
+        num_rows = output.count('\n') - 1
+        results.append({
+            'procesos': workers,
+            'llave': shard_key,
+            'segundos': round(elapsed, 2),
+            'filas_s': round(num_rows / elapsed),
+            'identica': output == reference,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Escalamiento del modelo de precios por shards.")
+    parser.add_argument('--filas', type=int, default=2_000_000, help="Filas de la tabla analítica sintética.")
+    parser.add_argument('--tiendas', type=int, default=50)
+    parser.add_argument('--skus', type=int, default=10_000)
+    parser.add_argument('--llave-shard', choices=SHARD_KEYS, default='id_tienda')
+    parser.add_argument('--procesos', type=int, nargs='+', default=None,
+                        help="Números de procesos a probar (por defecto, potencias de 2 hasta los núcleos).")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    worker_counts = args.procesos or sorted({1, cores} | {2 ** i for i in range(1, cores.bit_length()) if 2 ** i <= cores})
+    project_root = tempfile.mkdtemp(prefix='sharded_model_')
+    num_keys = len(write_service_fixture(project_root, args.filas, args.tiendas, args.skus))
+    print(f"--- Estado actual con {num_keys} llaves sku-tienda, {cores} núcleos ---")
+    for result in run_sharded_benchmark(project_root, worker_counts, args.llave_shard):
+        print(result)
@@ -0,0 +1,86 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Módulos que solo necesita el scraper; la ruta del modelo no debe importarlos.
+HEAVY_MODULES = ('selenium', 'webdriver_manager', 'bs4', 'requests')
+DEFAULT_STAGES = ['model']
+DEFAULT_REPETITIONS = 5
+TOP_MODULES = 10
+
+
+def stage_import_code(stages):
+    """
+    Código que importa lo mismo que `python -m src.main --etapas <stages>`: el
+    punto de entrada y los módulos de esas etapas.
+    """
+    loads = ''.join(f"; load_stage_function('{stage}')" for stage in stages)
+    return f"from src.main import load_stage_function{loads}"
+
+
+def parse_importtime(stderr):
+    """
+    Convierte la salida de `python -X importtime` en {módulo: (propio_us,
+    acumulado_us, profundidad)}; profundidad 0 son los imports de primer nivel.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def measure_startup(stages, repetitions=DEFAULT_REPETITIONS):
+    """
+    Ejecuta `python -X importtime` en un proceso nuevo `repetitions` veces con
+    los imports de `stages` y regresa la mediana del tiempo de imports y del
+    tiempo de reloj del proceso, los módulos más lentos y los pesados que se cargaron.
+    """
+    command = [sys.executable, '-X', 'importtime', '-c', stage_import_code(stages)]
+    totals, walls, modules = [], [], {}
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=PROJECT_ROOT, capture_output=True, text=True)
+        walls.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"Falló el import de {stages}:\n{result.stderr[-2000:]}")
+        modules = parse_importtime(result.stderr)
+        totals.append(sum(cumulative for _, cumulative, depth in modules.values() if depth == 0))
+
+    top = sorted(((name, cumulative) for name, (_, cumulative, depth) in modules.items() if depth == 0),
+                 key=lambda item: item[1], reverse=True)[:TOP_MODULES]
+    return {
+        'etapas': stages,
+        'imports_ms': round(statistics.median(totals) / 1000, 1),
+        'proceso_ms': round(statistics.median(walls) * 1000, 1),
+        'modulos': len(modules),
+        'pesados': sorted({name.split('.')[0] for name in modules} & set(HEAVY_MODULES)),
+        'mas_lentos_ms': {name: round(cumulative / 1000, 1) for name, cumulative in top},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del tiempo de arranque (python -X importtime) por etapa.")
+    parser.add_argument('--etapas', nargs='+', default=DEFAULT_STAGES,
+                        help="Etapas cuyo código se importa (por defecto, solo el modelo).")
+    parser.add_argument('--repeticiones', type=int, default=DEFAULT_REPETITIONS)
+    args = parser.parse_args()
+
+    report = measure_startup(args.etapas, args.repeticiones)
+    print(f"--- Arranque de {' '.join(report['etapas'])} (mediana de {args.repeticiones}) ---")
+    print(f"Imports: {report['imports_ms']} ms | proceso: {report['proceso_ms']} ms | módulos: {report['modulos']}")
+    print("Imports de primer nivel más lentos (acumulado):")
+    for name, ms in report['mas_lentos_ms'].items():
+        print(f"  {name}: {ms} ms")
+    if 'scrape' not in args.etapas and report['pesados']:
+        print(f"Error: se importaron módulos del scraper: {report['pesados']}")
+        sys.exit(1)
+    print(f"Módulos pesados importados: {report['pesados'] or 'ninguno'}")
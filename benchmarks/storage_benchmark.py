@@ -0,0 +1,74 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from src.storage import write_table, read_table, table_size_bytes
+
+
+def build_analytical_table(num_rows, num_stores=50, num_skus=1000, seed=0):
+    """
+    Construye una tabla analítica sintética con el mismo esquema que produce `transform_data`.
+    """
+    rng = np.random.default_rng(seed)
+    sku_idx = rng.integers(0, num_skus, num_rows)
+    quantities = rng.integers(1, 4, num_rows)
+    base_prices = np.round(rng.uniform(899.99, 2999.99, num_skus), 2)
+    return pd.DataFrame({
+        'fecha': np.datetime64('2023-01-01') + rng.integers(0, 640, num_rows).astype('timedelta64[D]'),
+        'id_tienda': rng.integers(100, 100 + num_stores, num_rows),
+        'sku': np.array([f'SKU{1000 + i}' for i in range(num_skus)])[sku_idx],
+        'product_name': np.array([f'Tenis deportivos {i}' for i in range(num_skus)])[sku_idx],
+        'precio_base_interno': base_prices[sku_idx],
+        'precio_unitario': np.round(base_prices[sku_idx] * rng.uniform(0.9, 1.1, num_rows), 2),
+        'cantidad_vendida': quantities,
+        'stock_disponible': rng.integers(5, 100, num_rows),
+        'competitor_price': base_prices[sku_idx],
+    })
+
+
+def run_storage_benchmark(num_rows):
+    df = build_analytical_table(num_rows)
+    model_columns = ['fecha', 'sku', 'id_tienda', 'precio_unitario', 'stock_disponible', 'competitor_price']
+    latest_month = [('fecha', '>=', pd.Timestamp('2024-09-01'))]
+
+    results = []
+    work_dir = tempfile.mkdtemp(prefix='storage_bench_')
+    try:
+        for storage_format in ('csv', 'parquet'):
+            base_path = os.path.join(work_dir, 'analytical_base_table')
+
+            start = time.perf_counter()
+            write_table(df, base_path, storage_format, partitioned=True)
+            write_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            read_table(base_path, storage_format)
+            read_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            read_table(base_path, storage_format, columns=model_columns, filters=latest_month)
+            pruned_time = time.perf_counter() - start
+
+            results.append({
+                'formato': storage_format,
+                'escritura_s': round(write_time, 3),
+                'lectura_completa_s': round(read_time, 3),
+                'lectura_podada_s': round(pruned_time, 3),
+                'tamano_mb': round(table_size_bytes(base_path, storage_format) / 1e6, 2),
+            })
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara tiempos de E/S y tamaño en disco de CSV vs Parquet.")
+    parser.add_argument('--filas', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"--- Benchmark de almacenamiento ({args.filas} filas) ---")
+    print(run_storage_benchmark(args.filas).to_string(index=False))
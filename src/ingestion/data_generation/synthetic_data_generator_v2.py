@@ -1,39 +1,77 @@
 import pandas as pd
+import numpy as np
 import json
 import random
 from datetime import datetime, timedelta
 import os
-from src.utils import clean_and_parse_price
+from src.utils import parse_prices
+from src.storage import write_table, table_size_bytes
+from src.orchestration.metrics import record_metrics
 
 
 NUM_STORES = 10
 NUM_SALES_RECORDS = 5000
 START_DATE = datetime(2023, 1, 1)
 END_DATE = datetime(2024, 10, 1)
+SALES_CHUNK_SIZE = 1_000_000
 
 
-def generate_data_from_scrape(project_root):
+def generate_sales_batched(df_catalog, sales_base_path, num_sales_records=NUM_SALES_RECORDS, num_stores=NUM_STORES,
+                           start_date=START_DATE, end_date=END_DATE, chunk_size=SALES_CHUNK_SIZE, seed=None,
+                           storage_format=None):
     """
-    Genera TODOS los datos sintéticos (internos y externos) usando la ruta del proyecto.
+    Genera las ventas (POS) por lotes: tiendas, SKUs, fechas, cantidades y
+    modificadores de precio se sortean como arreglos completos con un
+    `numpy.random.Generator` con semilla. Se escribe en bloques de `chunk_size`
+    filas para que la memoria no dependa del total de registros.
+    """
+    rng = np.random.default_rng(seed)
+    skus = df_catalog['sku'].to_numpy()
+    base_prices = df_catalog['base_price'].to_numpy(dtype=float)
+    start = np.datetime64(start_date.date(), 'D')
+    total_days = (end_date - start_date).days
+
+    written = 0
+    while written < num_sales_records:
+        size = min(chunk_size, num_sales_records - written)
+
+        store_ids = rng.integers(100, 100 + num_stores, size)
+        sku_idx = rng.integers(0, len(skus), size)
+        dates = start + rng.integers(0, total_days + 1, size).astype('timedelta64[D]')
+        quantities = rng.integers(1, 4, size)
+        price_modifiers = rng.uniform(0.9, 1.1, size)
+
+        df_chunk = pd.DataFrame({
+            'id_tienda': store_ids,
+            'sku': skus[sku_idx],
+            'fecha': dates,
+            'cantidad_vendida': quantities,
+            'precio_final': np.round(base_prices[sku_idx] * price_modifiers * quantities, 2)
+        })
+        write_table(df_chunk, sales_base_path, storage_format, partitioned=True, append=written > 0)
+        written += size
+
+    return written
+
+
+def generate_internal_data(project_root, num_sales_records=NUM_SALES_RECORDS, num_stores=NUM_STORES,
+                           start_date=START_DATE, end_date=END_DATE, batched=False,
+                           chunk_size=SALES_CHUNK_SIZE, seed=None, storage_format=None):
+    """
+    Genera los datos internos (catálogo, inventario y ventas) a partir del scraping.
+    Con `batched=True` las ventas se generan con NumPy por lotes (ver `generate_sales_batched`),
+    útil para pruebas de carga con millones de registros. Las tablas se escriben con
+    el backend de `src.storage` (Parquet por defecto, o CSV). Regresa el catálogo
+    generado, o None si no hay datos de scraping.
     """
-    # Definición de Rutas
     SCRAPED_DATA_PATH = os.path.join(project_root, 'data', 'scraped_data', 'suburbia_products.json')
     INTERNAL_DATA_PATH = os.path.join(project_root, 'data', 'synthetic_data', 'internal')
-    EXTERNAL_DATA_PATH = os.path.join(project_root, 'data', 'synthetic_data', 'external')
-
-    # Creación de Directorios
     os.makedirs(INTERNAL_DATA_PATH, exist_ok=True)
-    os.makedirs(EXTERNAL_DATA_PATH, exist_ok=True)
 
-    print(f"--- Generador: Leyendo de '{SCRAPED_DATA_PATH}' y guardando en carpetas internal/ y external/")
-    print("--- Iniciando Generación de Datos Sintéticos v2 (Basado en Scraping) ---")
-
-    # =============================================================
-    # SECCIÓN 1: GENERACIÓN DE DATOS INTERNOS
-    # =============================================================
     try:
         df_competitor = pd.read_json(SCRAPED_DATA_PATH)
         print(f"Cargados {len(df_competitor)} productos de '{SCRAPED_DATA_PATH}'")
+        record_metrics(filas_entrada=len(df_competitor), bytes_leidos=os.path.getsize(SCRAPED_DATA_PATH))
 
         # Si el scraper falla y el archivo está vacío, detenemos esta parte.
         if df_competitor.empty:
@@ -42,9 +80,9 @@ def generate_data_from_scrape(project_root):
     except (FileNotFoundError, ValueError) as e:
         print(f"ADVERTENCIA: No se pudieron generar datos internos. Causa: {e}")
         print("El pipeline continuará sin datos internos actualizados.")
-        return  # Detenemos la función si no hay datos de entrada.
+        return None  # Detenemos la función si no hay datos de entrada.
 
-    df_competitor['base_price'] = df_competitor['precio_descuento'].apply(clean_and_parse_price)
+    df_competitor['base_price'] = parse_prices(df_competitor['precio_descuento'])
     df_competitor.dropna(subset=['base_price'], inplace=True)
 
     # a. Catálogo de Productos
@@ -59,13 +97,13 @@ def generate_data_from_scrape(project_root):
             'competitor_sku': row['sku_competidor']
         })
     df_catalog = pd.DataFrame(product_catalog)
-    df_catalog.to_csv(os.path.join(INTERNAL_DATA_PATH, 'product_catalog.csv'), index=False)
+    write_table(df_catalog, os.path.join(INTERNAL_DATA_PATH, 'product_catalog'), storage_format)
     print(f"Catálogo interno guardado. Contiene {len(df_catalog)} productos.")
 
     # b. Inventario
     print("\nGenerando datos de inventario...")
     inventory = []
-    for i in range(NUM_STORES):
+    for i in range(num_stores):
         store_id = 100 + i
         for sku in df_catalog['sku']:
             inventory.append({
@@ -74,38 +112,58 @@ def generate_data_from_scrape(project_root):
                 'stock_disponible': random.randint(5, 100)
             })
     df_inventory = pd.DataFrame(inventory)
-    df_inventory.to_csv(os.path.join(INTERNAL_DATA_PATH, 'inventory.csv'), index=False)
-    print(f"Inventario guardado para {NUM_STORES} tiendas.")
+    write_table(df_inventory, os.path.join(INTERNAL_DATA_PATH, 'inventory'), storage_format)
+    print(f"Inventario guardado para {num_stores} tiendas.")
 
     # c. Ventas (POS)
     print("\nGenerando datos de ventas...")
-    sales = []
-    for _ in range(NUM_SALES_RECORDS):
-        store_id = random.randint(100, 100 + NUM_STORES - 1)
-        sku_info = df_catalog.sample(1).iloc[0]
-
-        total_days = (END_DATE - START_DATE).days
-        random_days = random.randint(0, total_days)
-        date = START_DATE + timedelta(days=random_days)
-
-        quantity = random.randint(1, 3)
-        price_modifier = random.uniform(0.9, 1.1)
-        final_price = round(sku_info['base_price'] * price_modifier * quantity, 2)
-
-        sales.append({
-            'id_tienda': store_id,
-            'sku': sku_info['sku'],
-            'fecha': date.strftime('%Y-%m-%d'),
-            'cantidad_vendida': quantity,
-            'precio_final': final_price
-        })
-    df_sales = pd.DataFrame(sales)
-    df_sales.to_csv(os.path.join(INTERNAL_DATA_PATH, 'daily_sales.csv'), index=False)
-    print(f"Datos de ventas guardados ({NUM_SALES_RECORDS} registros).")
+    sales_base_path = os.path.join(INTERNAL_DATA_PATH, 'daily_sales')
+    if batched:
+        generate_sales_batched(df_catalog, sales_base_path, num_sales_records, num_stores,
+                               start_date, end_date, chunk_size, seed, storage_format)
+    else:
+        sales = []
+        for _ in range(num_sales_records):
+            store_id = random.randint(100, 100 + num_stores - 1)
+            sku_info = df_catalog.sample(1).iloc[0]
+
+            total_days = (end_date - start_date).days
+            random_days = random.randint(0, total_days)
+            date = start_date + timedelta(days=random_days)
+
+            quantity = random.randint(1, 3)
+            price_modifier = random.uniform(0.9, 1.1)
+            final_price = round(sku_info['base_price'] * price_modifier * quantity, 2)
+
+            sales.append({
+                'id_tienda': store_id,
+                'sku': sku_info['sku'],
+                'fecha': date.strftime('%Y-%m-%d'),
+                'cantidad_vendida': quantity,
+                'precio_final': final_price
+            })
+        df_sales = pd.DataFrame(sales)
+        df_sales['fecha'] = pd.to_datetime(df_sales['fecha'])
+        write_table(df_sales, sales_base_path, storage_format, partitioned=True)
+    print(f"Datos de ventas guardados ({num_sales_records} registros).")
+
+    record_metrics(
+        filas_salida=len(df_catalog) + len(df_inventory) + num_sales_records,
+        bytes_escritos=sum(table_size_bytes(os.path.join(INTERNAL_DATA_PATH, name), storage_format)
+                           for name in ('product_catalog', 'inventory', 'daily_sales')),
+    )
+    return df_catalog
+
+
+def generate_external_data(project_root):
+    """
+    Genera los datos externos simulados (clima y demografía). No depende del
+    scraping, por lo que puede ejecutarse en paralelo con los datos internos.
+    Regresa la carpeta de los datos externos.
+    """
+    EXTERNAL_DATA_PATH = os.path.join(project_root, 'data', 'synthetic_data', 'external')
+    os.makedirs(EXTERNAL_DATA_PATH, exist_ok=True)
 
-    # =============================================================
-    # SECCIÓN 2: GENERACIÓN DE DATOS EXTERNOS
-    # =============================================================
     print("\nGenerando datos externos (Clima y Demografía)...")
     states_mx = ['Ciudad de México', 'Jalisco', 'Nuevo León', 'Puebla', 'Estado de México', 'Veracruz']
 
@@ -135,6 +193,36 @@ def generate_data_from_scrape(project_root):
     with open(os.path.join(EXTERNAL_DATA_PATH, 'demographic_data.json'), 'w', encoding='utf-8') as f:
         json.dump(demographic_data, f, indent=4, ensure_ascii=False)
     print("Datos demográficos guardados.")
+    record_metrics(
+        filas_salida=len(weather_data) + len(demographic_data),
+        bytes_escritos=sum(os.path.getsize(os.path.join(EXTERNAL_DATA_PATH, name))
+                           for name in ('weather_data.json', 'demographic_data.json')),
+    )
+    return EXTERNAL_DATA_PATH
+
+
+def generate_data_from_scrape(project_root, num_sales_records=NUM_SALES_RECORDS, num_stores=NUM_STORES,
+                              start_date=START_DATE, end_date=END_DATE, batched=False,
+                              chunk_size=SALES_CHUNK_SIZE, seed=None, storage_format=None):
+    """
+    Genera TODOS los datos sintéticos (internos y externos) usando la ruta del proyecto.
+    Ver `generate_internal_data` y `generate_external_data`.
+    """
+    print("--- Generador: Leyendo del scraping y guardando en carpetas internal/ y external/")
+    print("--- Iniciando Generación de Datos Sintéticos v2 (Basado en Scraping) ---")
+
+    # =============================================================
+    # SECCIÓN 1: GENERACIÓN DE DATOS INTERNOS
+    # =============================================================
+    df_catalog = generate_internal_data(project_root, num_sales_records, num_stores, start_date, end_date,
+                                        batched, chunk_size, seed, storage_format)
+    if df_catalog is None:
+        return
+
+    # =============================================================
+    # SECCIÓN 2: GENERACIÓN DE DATOS EXTERNOS
+    # =============================================================
+    generate_external_data(project_root)
 
     print("\n--- Proceso completo de generación de datos sintéticos finalizado. ---")
 
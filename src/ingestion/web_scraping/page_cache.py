@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+PAGE_CACHE_FILE = 'page_cache.json'
+PAGE_CACHE_MAX_ENTRIES = 5_000
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class PageCache:
+    """
+    Caché en disco de páginas de listado, por URL. Guarda los validadores de la
+    respuesta (ETag y Last-Modified), el hash del HTML de las tarjetas de
+    producto y los productos ya extraídos, para no volver a parsear páginas que
+    no cambiaron. El número de entradas está acotado y se descartan las usadas
+    hace más tiempo (LRU).
+    """
+
+    def __init__(self, cache_dir, max_entries=PAGE_CACHE_MAX_ENTRIES):
+        self.cache_file = os.path.join(cache_dir, PAGE_CACHE_FILE)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                self._entries = OrderedDict(json.load(f))
+        except (FileNotFoundError, ValueError):
+            self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, url):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def conditional_headers(self, url):
+        """
+        Encabezados para una petición condicional (respuesta 304 si la página no cambió).
+        """
+        entry = self.get(url)
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, url, etag, last_modified, cards_hash, products, next_url):
+        with self._lock:
+            self._entries[url] = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'hash': cards_hash,
+                'products': products,
+                'next_url': next_url,
+            }
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def save(self):
+        with self._lock:
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp_file, self.cache_file)
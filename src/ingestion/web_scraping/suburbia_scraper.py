@@ -1,97 +1,534 @@
-import time
 import json
 import os
+import queue
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
 from datetime import datetime
+from importlib.util import find_spec
+from urllib.parse import urljoin
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
-from src.utils import clean_and_parse_price
+from bs4 import BeautifulSoup, SoupStrainer
+import pandas as pd
+from src.utils import parse_prices, write_json
+from src.ingestion.web_scraping.page_cache import PageCache, content_hash
+from src.orchestration.metrics import record_metrics
+from src.processing.competitor_history import append_history, COMPETITOR_DELTA_FILE
 
 URL = "https://www.suburbia.com.mx/tienda/tenis-deportivos/catst55251553"
+CATEGORY_URLS = [URL]
 MAX_PRODUCTS = 100
 
+CARD_SELECTOR = "li.m-product__card"
+PAGE_LOAD_TIMEOUT = 20
+# Tiempo máximo de espera a que el scroll infinito agregue productos nuevos.
+SCROLL_TIMEOUT = 5
+MAX_DRIVERS = 4
 
-def scrape_suburbia_selenium(project_root):
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36'
+HTTP_TIMEOUT = 15
+HTTP_RETRIES = 3
+MAX_HTTP_WORKERS = 16
+# lxml es bastante más rápido que html.parser; se usa solo si está instalado.
+HTML_PARSER = 'lxml' if find_spec('lxml') else 'html.parser'
+CARD_STRAINER = SoupStrainer('li', class_='m-product__card')
+NEXT_PAGE_PATTERN = re.compile(r'<(?:a|link)\b[^>]*\brel=["\']?next\b[^>]*>', re.IGNORECASE)
+HREF_PATTERN = re.compile(r'\bhref=["\']([^"\']+)["\']', re.IGNORECASE)
+
+# Ruta local del chromedriver; si está definida no se consulta webdriver_manager.
+CHROMEDRIVER_PATH_ENV = 'CHROMEDRIVER_PATH'
+DRIVER_CACHE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))), 'data', 'scraped_data', 'chromedriver_path.json')
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+def resolve_chromedriver_path(cache_file=DRIVER_CACHE_FILE):
     """
-    Realiza el web scraping usando Selenium y guarda los datos
-    en la ruta del proyecto proporcionada.
+    Ruta del chromedriver: la de `CHROMEDRIVER_PATH` si existe; si no, la que
+    quedó guardada en `cache_file` mientras el binario siga ahí. Solo si no hay
+    ninguna se resuelve con webdriver_manager (que consulta la red) y la ruta se
+    guarda para las siguientes ejecuciones. Dentro del proceso se resuelve una vez.
     """
-    OUTPUT_PATH = os.path.join(project_root, 'data', 'scraped_data')
-    os.makedirs(OUTPUT_PATH, exist_ok=True)
-    print(f"--- Scraper: Guardando datos en: {OUTPUT_PATH}")
+    global _driver_path
+    override = os.environ.get(CHROMEDRIVER_PATH_ENV)
+    if override:
+        if not os.path.isfile(override):
+            raise FileNotFoundError(f"{CHROMEDRIVER_PATH_ENV} apunta a un archivo que no existe: '{override}'")
+        return override
+    with _driver_path_lock:
+        if _driver_path and os.path.isfile(_driver_path):
+            return _driver_path
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                cached = json.load(f).get('ruta')
+        except (FileNotFoundError, json.JSONDecodeError):
+            cached = None
+        if cached and os.path.isfile(cached):
+            _driver_path = cached
+            return _driver_path
 
-    print("Iniciando scraping con Selenium...")
+        # webdriver_manager tarda en importarse y descarga el driver: solo si no hay ruta guardada.
+        from webdriver_manager.chrome import ChromeDriverManager
+        _driver_path = ChromeDriverManager().install()
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp_file = f"{cache_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'ruta': _driver_path, 'resuelto': datetime.now().isoformat(timespec='seconds')}, f)
+        os.replace(tmp_file, cache_file)
+        return _driver_path
 
+
+def _create_driver():
     options = webdriver.ChromeOptions()
     options.add_argument('--headless')
     options.add_argument('--no-sandbox')
     options.add_argument('--disable-dev-shm-usage')
-    options.add_argument(
-        'user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36')
+    options.add_argument(f'user-agent={USER_AGENT}')
+
+    return webdriver.Chrome(service=ChromeService(resolve_chromedriver_path()), options=options)
+
+
+class DriverPool:
+    """
+    Pool acotado de navegadores headless reutilizables. Los navegadores se crean
+    bajo demanda hasta `size` y se devuelven al pool al terminar cada página.
+    """
+
+    def __init__(self, size=MAX_DRIVERS, driver_factory=_create_driver):
+        self.size = size
+        self._driver_factory = driver_factory
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def driver(self):
+        try:
+            driver = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    driver = self._driver_factory()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                driver = self._idle.get()
 
-    driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=options)
+        try:
+            yield driver
+        except Exception:
+            # Un navegador que falló puede quedar en mal estado: se descarta.
+            driver.quit()
+            with self._lock:
+                self._created -= 1
+            raise
+        self._idle.put(driver)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().quit()
+            except queue.Empty:
+                break
+        print("Navegadores cerrados.")
+
+
+def card_region(html):
+    """
+    Regresa el fragmento del HTML que va de la primera a la última tarjeta
+    `m-product__card`, o None si la página no trae tarjetas.
+    """
+    first = html.find('m-product__card')
+    if first == -1:
+        return None
+    start = html.rfind('<li', 0, first)
+    end = html.find('</li>', html.rfind('m-product__card'))
+    return html[start if start != -1 else first:end + len('</li>') if end != -1 else len(html)]
+
+
+def parse_product_cards(html, page_url, limit=None):
+    """
+    Extrae los productos de las tarjetas `li.m-product__card` de una página.
+    Solo se parsea el fragmento de las tarjetas y solo se construye su árbol
+    (SoupStrainer), no el de la página completa.
+    Los precios se regresan como texto; se convierten en bloque con `_parse_product_prices`.
+    """
+    region = card_region(html)
+    if region is None:
+        return []
+    soup = BeautifulSoup(region, HTML_PARSER, parse_only=CARD_STRAINER)
+    product_containers = soup.find_all('li', class_='m-product__card', limit=limit)
 
     products = []
+    for item in product_containers:
+        brand_element = item.find('h3', class_='a-card-brand')
+        desc_element = item.find('h3', class_='card-title')
+
+        brand = brand_element.text.strip() if brand_element else ''
+        description = desc_element.text.strip() if desc_element else ''
+        product_name = f"{brand} {description}".strip()
+
+        list_price_element = item.find('p', class_='a-card-price')
+        discount_price_element = item.find('p', class_='a-card-discount')
+
+        url_element = item.find('a', href=True)
+        relative_url = url_element['href'] if url_element else None
+        product_url = urljoin(page_url, relative_url) if relative_url else "URL no encontrada"
+
+        sku_competidor = "SUB-" + (item.get('data-prodid') or product_name.replace(" ", "-")[:15].upper())
+
+        products.append({
+            'sku_competidor': sku_competidor,
+            'nombre_producto': product_name,
+            'precio_lista': list_price_element.text if list_price_element else None,
+            'precio_descuento': discount_price_element.text if discount_price_element else None,
+            'url_producto': product_url,
+            'fecha_extraccion': datetime.now().isoformat()
+        })
+    return products
+
+
+def _next_page_url(html, page_url):
+    """
+    Regresa la URL de la siguiente página del listado (enlace `rel="next"`), o None.
+    """
+    next_link = NEXT_PAGE_PATTERN.search(html)
+    href = HREF_PATTERN.search(next_link.group(0)) if next_link else None
+    return urljoin(page_url, href.group(1).replace('&amp;', '&')) if href else None
+
+
+def _parse_product_prices(products):
+    """
+    Convierte en bloque los precios de texto a float. Si falta uno de los dos
+    precios se usa el otro.
+    """
+    precios_lista = parse_prices([p['precio_lista'] for p in products])
+    precios_descuento = parse_prices([p['precio_descuento'] for p in products])
+    precios_lista = precios_lista.fillna(precios_descuento)
+    precios_descuento = precios_descuento.fillna(precios_lista)
+    for product, price_lista, price_descuento in zip(products, precios_lista, precios_descuento):
+        product['precio_lista'] = None if pd.isna(price_lista) else price_lista
+        product['precio_descuento'] = None if pd.isna(price_descuento) else price_descuento
+    return products
+
+
+PRICE_FIELDS = ('precio_lista', 'precio_descuento')
+
+
+def _load_previous_products(output_path):
     try:
-        driver.get(URL)
-        print(f"Página cargada: {URL}")
+        with open(os.path.join(output_path, 'suburbia_products.json'), 'r', encoding='utf-8') as f:
+            return {p['sku_competidor']: p for p in json.load(f)}
+    except (FileNotFoundError, ValueError):
+        return {}
 
-        wait = WebDriverWait(driver, 20)
-        wait.until(EC.visibility_of_element_located((By.CLASS_NAME, "m-product__card")))
-        print("Contenedores de productos encontrados. El JavaScript ha cargado.")
 
-        driver.execute_script("window.scrollTo(0, 1000);")
-        time.sleep(2)
+def detect_price_changes(products, previous_products):
+    """
+    Compara los productos extraídos contra la extracción anterior. Regresa la
+    foto completa, en la que los productos sin cambio de precio conservan su
+    registro (y `fecha_extraccion`) anterior, y la lista de productos nuevos o
+    con precio distinto.
+    """
+    snapshot, changed = [], []
+    for product in products:
+        previous = previous_products.get(product['sku_competidor'])
+        if previous is not None and all(previous.get(f) == product[f] for f in PRICE_FIELDS):
+            snapshot.append(previous)
+        else:
+            snapshot.append(product)
+            changed.append(product)
+    return snapshot, changed
 
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
 
-        product_containers = soup.find_all('li', class_='m-product__card', limit=MAX_PRODUCTS)
+def _save_products(products, output_path, file_name='suburbia_products.json'):
+    # Escritura atómica: la transformación y el servicio de precios nunca leen un archivo a medias.
+    output_file = os.path.join(output_path, file_name)
+    write_json(output_file, products)
+    record_metrics(filas_salida=len(products), bytes_escritos=os.path.getsize(output_file))
+    return output_file
 
-        if not product_containers:
-            print("Error inesperado: los productos cargaron pero no se pudieron parsear.")
+
+def _scroll_until_exhausted(driver):
+    """
+    Hace scroll hasta el final mientras el scroll infinito siga agregando tarjetas.
+    En lugar de pausas fijas, espera a que aumente el número de tarjetas en el DOM.
+    """
+    while True:
+        count = len(driver.find_elements(By.CSS_SELECTOR, CARD_SELECTOR))
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        try:
+            WebDriverWait(driver, SCROLL_TIMEOUT).until(
+                lambda d: len(d.find_elements(By.CSS_SELECTOR, CARD_SELECTOR)) > count)
+        except TimeoutException:
             return
 
-        print(f"Procesando {len(product_containers)} productos...")
 
-        for item in product_containers:
-            brand_element = item.find('h3', class_='a-card-brand')
-            desc_element = item.find('h3', class_='card-title')
+def _scrape_page_selenium(driver, page_url):
+    """
+    Carga una página del listado, agota su scroll infinito y regresa sus productos
+    junto con la URL de la página siguiente (o None).
+    """
+    driver.get(page_url)
+    try:
+        WebDriverWait(driver, PAGE_LOAD_TIMEOUT).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, CARD_SELECTOR)))
+    except TimeoutException:
+        print(f"No se encontraron productos en: {page_url}")
+        return [], None
+
+    _scroll_until_exhausted(driver)
+    html = driver.page_source
+    return parse_product_cards(html, page_url), _next_page_url(html, page_url)
+
+
+def _deduplicate_products(products):
+    # Se conserva la primera aparición de cada `sku_competidor`.
+    unique = {}
+    for product in products:
+        unique.setdefault(product['sku_competidor'], product)
+    return list(unique.values())
+
+
+def _crawl(category_urls, scrape_page, max_workers, max_pages=None, start_pages=None):
+    """
+    Recorre las categorías página por página con un pool de `max_workers` hilos.
+    `scrape_page(url, numero_pagina)` regresa `(productos, url_siguiente)`: al
+    terminar una página se encola la siguiente de su categoría, de modo que las
+    páginas de todas las categorías se reparten entre el pool.
+
+    `start_pages` indica el número de página de cada URL inicial (por defecto 1):
+    una categoría que se retoma a la mitad conserva su cuenta y no pasa de
+    `max_pages` páginas en total.
+    """
+    start_pages = start_pages or [1] * len(category_urls)
+    products = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(scrape_page, url, page_number): (url, page_number)
+                   for url, page_number in zip(category_urls, start_pages)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                page_url, page_number = pending.pop(future)
+                try:
+                    page_products, next_url = future.result()
+                except Exception as e:
+                    print(f"Error al procesar '{page_url}': {e}")
+                    continue
+                print(f"Página {page_number} procesada ({len(page_products)} productos): {page_url}")
+                products.extend(page_products)
+                if next_url and (max_pages is None or page_number < max_pages):
+                    pending[executor.submit(scrape_page, next_url, page_number + 1)] = (next_url, page_number + 1)
+    return products
+
+
+def scrape_categories_selenium(category_urls, max_workers=MAX_DRIVERS, max_pages=None, driver_factory=_create_driver,
+                               start_pages=None):
+    """
+    Recorre varias categorías con un pool acotado de navegadores headless.
+    Regresa los productos sin duplicados por `sku_competidor`. `start_pages` es
+    el número de página de cada URL (ver `_crawl`).
+    """
+    pool = DriverPool(max_workers, driver_factory)
+
+    def scrape_page(page_url, page_number):
+        with pool.driver() as driver:
+            return _scrape_page_selenium(driver, page_url)
+
+    try:
+        products = _crawl(category_urls, scrape_page, max_workers, max_pages, start_pages)
+    finally:
+        pool.close()
+
+    return _deduplicate_products(products)
+
+
+def create_http_session(pool_size=MAX_HTTP_WORKERS):
+    """
+    Sesión HTTP con conexiones persistentes (keep-alive) reutilizadas entre
+    hilos y reintentos con espera exponencial ante errores transitorios.
+    """
+    retry = Retry(total=HTTP_RETRIES, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=['GET'])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.headers.update({'User-Agent': USER_AGENT, 'Accept-Language': 'es-MX,es;q=0.9'})
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _scrape_page_http(session, page_url, cache=None):
+    """
+    Descarga una página del listado por HTTP y extrae sus productos. Si las
+    tarjetas no vienen en el HTML del servidor (se generan con JavaScript),
+    regresa None para que la página se procese con Selenium.
+
+    Con `cache`, la petición es condicional (ETag / Last-Modified) y, si la
+    página o el HTML de sus tarjetas no cambiaron, se reutilizan los productos
+    guardados sin volver a parsear.
+    """
+    cached = cache.get(page_url) if cache is not None else None
+    headers = cache.conditional_headers(page_url) if cached else {}
+
+    response = session.get(page_url, timeout=HTTP_TIMEOUT, headers=headers)
+    if response.status_code == 304 and cached:
+        return [dict(p) for p in cached['products']], cached['next_url']
+    response.raise_for_status()
+
+    html = response.text
+    region = card_region(html)
+    if region is None:
+        return None, None
+
+    next_url = _next_page_url(html, page_url)
+    cards_hash = content_hash(region)
+    if cached and cached['hash'] == cards_hash:
+        products = [dict(p) for p in cached['products']]
+    else:
+        products = parse_product_cards(html, page_url)
+        if not products:
+            return None, None
+
+    if cache is not None:
+        cache.put(page_url, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                  cards_hash, [dict(p) for p in products], next_url)
+    return products, next_url
+
 
-            brand = brand_element.text.strip() if brand_element else ''
-            description = desc_element.text.strip() if desc_element else ''
-            product_name = f"{brand} {description}".strip()
+def scrape_categories_http(category_urls, max_workers=MAX_HTTP_WORKERS, max_pages=None, session=None,
+                           max_drivers=MAX_DRIVERS, driver_factory=_create_driver, cache=None):
+    """
+    Recorre las categorías primero por HTTP (sesión compartida, concurrencia
+    acotada). Las páginas sin tarjetas en el HTML del servidor, o cuya petición
+    falla después de los reintentos, se reintentan con el pool de navegadores de
+    Selenium desde esa misma página, sin reiniciar la cuenta de `max_pages`.
+    Regresa los productos sin duplicados.
+    """
+    session = session or create_http_session(max_workers)
+    fallback_pages = []
 
-            list_price_element = item.find('p', class_='a-card-price')
-            discount_price_element = item.find('p', class_='a-card-discount')
+    def scrape_page(page_url, page_number):
+        try:
+            products, next_url = _scrape_page_http(session, page_url, cache)
+        except requests.RequestException as e:
+            print(f"Error HTTP en '{page_url}': {e}")
+            products, next_url = None, None
+        if products is None:
+            fallback_pages.append((page_url, page_number))
+            return [], None
+        return products, next_url
 
-            price_lista = clean_and_parse_price(list_price_element.text if list_price_element else None)
-            price_descuento = clean_and_parse_price(discount_price_element.text if discount_price_element else None)
+    products = _crawl(category_urls, scrape_page, max_workers, max_pages)
 
-            if price_lista is None:
-                price_lista = price_descuento
+    if fallback_pages:
+        print(f"{len(fallback_pages)} páginas no se pudieron extraer por HTTP: se procesan con Selenium...")
+        fallback_urls, start_pages = (list(values) for values in zip(*fallback_pages))
+        products.extend(scrape_categories_selenium(fallback_urls, max_drivers, max_pages, driver_factory, start_pages))
 
-            if price_descuento is None:
-                price_descuento = price_lista
+    return _deduplicate_products(products)
 
-            url_element = item.find('a', href=True)
-            relative_url = url_element['href'] if url_element else None
-            product_url = "https://www.suburbia.com.mx" + relative_url if relative_url else "URL no encontrada"
 
-            sku_competidor = "SUB-" + (item.get('data-prodid') or product_name.replace(" ", "-")[:15].upper())
+def scrape_suburbia_categories(project_root, category_urls=None, max_workers=MAX_DRIVERS, max_pages=None,
+                               use_http=True, storage_format=None):
+    """
+    Extrae todas las páginas de varias categorías (paginación y scroll infinito)
+    y guarda los productos sin duplicados. Sin `category_urls` se recorren las
+    de `CATEGORY_URLS`. Con `use_http=True` se intenta primero
+    la ruta HTTP (con caché de páginas) y solo se usa Selenium en las páginas que
+    lo requieren. Además de la foto completa se escribe
+    `suburbia_products_delta.json` con los productos nuevos o con cambio de precio;
+    solo esos productos se agregan al historial de precios de la competencia, y
+    la transformación también sincroniza el historial desde la delta. Regresa
+    la foto completa, o None si no se pudo extraer ningún producto.
+    """
+    OUTPUT_PATH = os.path.join(project_root, 'data', 'scraped_data')
+    os.makedirs(OUTPUT_PATH, exist_ok=True)
+    print(f"--- Scraper: Guardando datos en: {OUTPUT_PATH}")
+    category_urls = category_urls or CATEGORY_URLS
 
-            products.append({
-                'sku_competidor': sku_competidor,
-                'nombre_producto': product_name,
-                'precio_lista': price_lista,
-                'precio_descuento': price_descuento,
-                'url_producto': product_url,
-                'fecha_extraccion': datetime.now().isoformat()
-            })
+    if use_http:
+        print(f"Iniciando scraping HTTP de {len(category_urls)} categorías...")
+        cache = PageCache(os.path.join(OUTPUT_PATH, 'page_cache'))
+        products = scrape_categories_http(category_urls, max_pages=max_pages, max_drivers=max_workers, cache=cache)
+        cache.save()
+    else:
+        print(f"Iniciando scraping de {len(category_urls)} categorías con hasta {max_workers} navegadores...")
+        products = scrape_categories_selenium(category_urls, max_workers, max_pages)
+
+    if not products:
+        print("\nNo se pudo extraer ningún producto.")
+        return
+
+    _parse_product_prices(products)
+    previous_products = _load_previous_products(OUTPUT_PATH)
+    snapshot, changed = detect_price_changes(products, previous_products)
+
+    if changed or {p['sku_competidor'] for p in snapshot} != set(previous_products):
+        output_file = _save_products(snapshot, OUTPUT_PATH)
+        print(f"Foto completa actualizada en: {output_file}")
+    else:
+        print("Sin cambios de precio: la foto completa no se reescribe.")
+
+    # Solo los productos nuevos o con precio distinto se envían aguas abajo. La
+    # delta se escribe después de la foto completa: así es la más reciente y la
+    # transformación la usa en lugar de la foto.
+    delta_file = _save_products(changed, OUTPUT_PATH, COMPETITOR_DELTA_FILE)
+    print(f"\n Scraping completado. {len(changed)} de {len(products)} productos son nuevos o cambiaron de precio: {delta_file}")
+    if changed:
+        added = append_history(project_root, pd.DataFrame(changed), storage_format)
+        print(f"{added} cambios de precio agregados al historial de la competencia.")
+    return snapshot
+
+
+def scrape_suburbia_selenium(project_root, storage_format=None):
+    """
+    Realiza el web scraping usando Selenium y guarda los datos
+    en la ruta del proyecto proporcionada. Los precios que cambiaron se agregan
+    al historial de precios de la competencia.
+    """
+    OUTPUT_PATH = os.path.join(project_root, 'data', 'scraped_data')
+    os.makedirs(OUTPUT_PATH, exist_ok=True)
+    print(f"--- Scraper: Guardando datos en: {OUTPUT_PATH}")
+
+    print("Iniciando scraping con Selenium...")
+
+    driver = _create_driver()
+
+    products = []
+    try:
+        driver.get(URL)
+        print(f"Página cargada: {URL}")
+
+        wait_driver = WebDriverWait(driver, PAGE_LOAD_TIMEOUT)
+        wait_driver.until(EC.visibility_of_element_located((By.CLASS_NAME, "m-product__card")))
+        print("Contenedores de productos encontrados. El JavaScript ha cargado.")
+
+        _scroll_until_exhausted(driver)
+
+        products = parse_product_cards(driver.page_source, URL, limit=MAX_PRODUCTS)
+
+        if not products:
+            print("Error inesperado: los productos cargaron pero no se pudieron parsear.")
+            return
+
+        print(f"Procesando {len(products)} productos...")
 
     except Exception as e:
         print(f"Ha ocurrido un error durante el scraping con Selenium: {e}")
@@ -101,15 +538,32 @@ def scrape_suburbia_selenium(project_root):
         print("Navegador cerrado.")
 
     if products:
-        output_file = os.path.join(OUTPUT_PATH, 'suburbia_products.json')
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(products, f, indent=4, ensure_ascii=False)
+        _parse_product_prices(products)
+        output_file = _save_products(products, OUTPUT_PATH)
         print(f"\n Scraping completado con éxito. Se guardaron {len(products)} productos en: {output_file}")
+        added = append_history(project_root, pd.DataFrame(products), storage_format)
+        print(f"{added} cambios de precio agregados al historial de la competencia.")
     else:
         print("\nNo se pudo extraer ningún producto.")
 
 
 if __name__ == "__main__":
     # Esta parte es solo para pruebas aisladas
-    project_root_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    scrape_suburbia_selenium(project_root_path)
\ No newline at end of file
+    import argparse
+    from src.storage import STORAGE_FORMATS
+
+    parser = argparse.ArgumentParser(description="Scraper de precios de la competencia (Suburbia).")
+    parser.add_argument('--categorias', nargs='+', default=None,
+                        help="URLs de categorías a extraer (por defecto, CATEGORY_URLS).")
+    parser.add_argument('--max-paginas', type=int, default=None,
+                        help="Páginas máximas por categoría (por defecto, todas).")
+    parser.add_argument('--navegadores', type=int, default=MAX_DRIVERS,
+                        help="Navegadores de Selenium en paralelo.")
+    parser.add_argument('--selenium', action='store_true',
+                        help="Extrae todo con Selenium en lugar de HTTP con Selenium como respaldo.")
+    parser.add_argument('--formato', choices=STORAGE_FORMATS, default=None,
+                        help="Formato del historial (por defecto, STORAGE_FORMAT).")
+    args = parser.parse_args()
+    project_root_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    scrape_suburbia_categories(project_root_path, args.categorias, args.navegadores, args.max_paginas,
+                               use_http=not args.selenium, storage_format=args.formato)
@@ -1,34 +1,293 @@
+import argparse
+import importlib
 import os
-from src.ingestion.web_scraping.suburbia_scraper import scrape_suburbia_selenium
-from src.ingestion.data_generation.synthetic_data_generator_v2 import generate_data_from_scrape
-from src.processing.data_transformer import transform_data
-from src.modeling.pricing_model import recommend_prices
+from functools import partial
+from src.processing.current_state import CURRENT_STATE_TABLE
+from src.processing.data_transformer import CHUNK_SIZE
+from src.processing.product_matching import MATCH_TABLE, MATCH_INDEX_FILE
+from src.processing.competitor_history import history_base, COMPETITOR_SNAPSHOT_FILE, COMPETITOR_DELTA_FILE
+from src.modeling.elasticity import ELASTICITY_TABLE, ELASTICITY_LEVELS
+from src.modeling.demand_velocity import VELOCITY_TABLE, VELOCITY_BUFFER_TABLE
+from src.modeling.pricing_model import SHARD_KEYS
+from src.modeling.recommendation_delta import CHANGES_FILE, PUBLISHED_TABLE
+from src.orchestration.dag_runner import run_stages, PIPELINE_STATE_FILE
+from src.orchestration.metrics import stage_metrics, PROFILE_MODES
+from src.storage import table_path, STORAGE_FORMAT, STORAGE_FORMATS
 
 
-def run_pipeline():
-    
+STAGE_NAMES = ['scrape', 'generate_internal', 'generate_external', 'match', 'transform', 'elasticity', 'velocity',
+               'model']
+# Etapa -> (módulo, función). Los módulos se importan al ejecutar la etapa, así
+# que correr solo el modelo no carga selenium, bs4 ni requests.
+STAGE_FUNCTIONS = {
+    'scrape': ('src.ingestion.web_scraping.suburbia_scraper', 'scrape_suburbia_categories'),
+    'generate_internal': ('src.ingestion.data_generation.synthetic_data_generator_v2', 'generate_internal_data'),
+    'generate_external': ('src.ingestion.data_generation.synthetic_data_generator_v2', 'generate_external_data'),
+    'match': ('src.processing.product_matching', 'match_products'),
+    'transform': ('src.processing.data_transformer', 'transform_data'),
+    'elasticity': ('src.modeling.elasticity', 'estimate_elasticities'),
+    'velocity': ('src.modeling.demand_velocity', 'update_demand_velocity'),
+    'model': ('src.modeling.pricing_model', 'recommend_prices'),
+}
+
+
+def load_stage_function(name):
+    """
+    Importa el módulo de la etapa `name` y regresa su función.
+    """
+    module, function = STAGE_FUNCTIONS[name]
+    return getattr(importlib.import_module(module), function)
+
+
+def _call_stage(name, *args, **kwargs):
+    return load_stage_function(name)(*args, **kwargs)
+
+
+def build_pipeline_stages(project_root, storage_format=None, workers=1, shard_key='id_tienda',
+                          elasticity_level='sku', use_elasticity=False, use_coverage=False, incremental=False,
+                          chunk_size=CHUNK_SIZE, category_urls=None, max_pages=None, use_http=True):
+    """
+    Declara las etapas del pipeline con sus dependencias, artefactos de entrada
+    y salida y los módulos de código que determinan su resultado. El modelo
+    recibe en memoria el estado actual que calcula la transformación, salvo con
+    `workers > 1`, donde cada proceso lee su shard del disco. Con
+    `use_elasticity` el modelo depende además de las elasticidades estimadas
+    (por SKU o por SKU-tienda según `elasticity_level`), y con `use_coverage`, de
+    la velocidad de demanda. Con `incremental` la transformación solo agrega las
+    ventas nuevas a la tabla analítica; lee las ventas por bloques de
+    `chunk_size` filas (None = todas en memoria). El scraper recorre todas las
+    páginas de `category_urls` (por defecto, `CATEGORY_URLS` del scraper), hasta
+    `max_pages` por categoría; con `use_http` (por defecto) las páginas se piden
+    por HTTP y Selenium solo procesa las que no se pudieron extraer así.
+    """
+    fmt = storage_format or STORAGE_FORMAT
+    src = os.path.join(project_root, 'src')
+    scraped = os.path.join(project_root, 'data', 'scraped_data', COMPETITOR_SNAPSHOT_FILE)
+    scraped_delta = os.path.join(project_root, 'data', 'scraped_data', COMPETITOR_DELTA_FILE)
+    internal = os.path.join(project_root, 'data', 'synthetic_data', 'internal')
+    external = os.path.join(project_root, 'data', 'synthetic_data', 'external')
+    processed = os.path.join(project_root, 'data', 'processed')
+    recommendations = os.path.join(project_root, 'data', 'recommendations')
+    history = table_path(history_base(project_root), fmt)
+    internal_tables = [table_path(os.path.join(internal, name), fmt)
+                       for name in ('product_catalog', 'inventory', 'daily_sales')]
+    shared_code = [os.path.join(src, 'storage.py'), os.path.join(src, 'utils.py')]
+    groupby_code = os.path.join(src, 'modeling', '_groupby.py')
+    abt = table_path(os.path.join(processed, 'analytical_base_table'), fmt)
+    elasticities = table_path(os.path.join(processed, ELASTICITY_TABLE), fmt)
+    velocity = table_path(os.path.join(processed, VELOCITY_TABLE), fmt)
+    current_state = table_path(os.path.join(processed, CURRENT_STATE_TABLE), fmt)
+    model_dependencies = (['transform'] + (['elasticity'] if use_elasticity else [])
+                          + (['velocity'] if use_coverage else []))
+
+    return [
+        {
+            'nombre': 'scrape',
+            'descripcion': 'Web Scraper',
+            'funcion': partial(_call_stage, 'scrape', project_root, storage_format=fmt,
+                               category_urls=category_urls, max_pages=max_pages, use_http=use_http),
+            'depende_de': [],
+            'entradas': [],
+            'salidas': [scraped, history],
+            'codigo': [os.path.join(src, 'ingestion', 'web_scraping', 'suburbia_scraper.py'),
+                       os.path.join(src, 'ingestion', 'web_scraping', 'page_cache.py'),
+                       os.path.join(src, 'processing', 'competitor_history.py')] + shared_code,
+            'parametros': {'formato': fmt, 'categorias': category_urls, 'max_paginas': max_pages,
+                           'http': use_http},
+        },
+        {
+            'nombre': 'generate_internal',
+            'descripcion': 'Generador de Datos Internos',
+            'funcion': partial(_call_stage, 'generate_internal', project_root, storage_format=fmt),
+            'depende_de': ['scrape'],
+            'entradas': [scraped],
+            'salidas': internal_tables,
+            'codigo': [os.path.join(src, 'ingestion', 'data_generation', 'synthetic_data_generator_v2.py')] + shared_code,
+            'parametros': {'formato': fmt},
+        },
+        {
+            'nombre': 'generate_external',
+            'descripcion': 'Generador de Datos Externos',
+            'funcion': partial(_call_stage, 'generate_external', project_root),
+            'depende_de': [],
+            'entradas': [],
+            'salidas': [os.path.join(external, 'weather_data.json'), os.path.join(external, 'demographic_data.json')],
+            'codigo': [os.path.join(src, 'ingestion', 'data_generation', 'synthetic_data_generator_v2.py')],
+        },
+        {
+            'nombre': 'match',
+            'descripcion': 'Empate de Productos por Nombre',
+            'funcion': partial(_call_stage, 'match', project_root, storage_format=fmt),
+            'depende_de': ['scrape', 'generate_internal'],
+            'entradas': [scraped, internal_tables[0]],
+            'salidas': [table_path(os.path.join(processed, MATCH_TABLE), fmt),
+                        os.path.join(processed, MATCH_INDEX_FILE)],
+            'codigo': [os.path.join(src, 'processing', 'product_matching.py')] + shared_code,
+            'parametros': {'formato': fmt},
+        },
+        {
+            'nombre': 'transform',
+            'descripcion': 'Transformación de Datos',
+            # El modo incremental y el tamaño de bloque producen la misma tabla que una
+            # reconstrucción en memoria, así que no forman parte de la clave de la etapa.
+            'funcion': partial(_call_stage, 'transform', project_root, storage_format=fmt,
+                               incremental=incremental, chunk_size=chunk_size),
+            'depende_de': ['scrape', 'generate_internal', 'match'],
+            'entradas': internal_tables + [scraped, scraped_delta, history,
+                                           table_path(os.path.join(processed, MATCH_TABLE), fmt)],
+            'salidas': [abt, table_path(os.path.join(processed, CURRENT_STATE_TABLE), fmt)],
+            'codigo': [os.path.join(src, 'processing', 'data_transformer.py'),
+                       os.path.join(src, 'processing', 'current_state.py'),
+                       os.path.join(src, 'processing', 'product_matching.py'),
+                       os.path.join(src, 'processing', 'competitor_history.py')] + shared_code,
+            'parametros': {'formato': fmt},
+        },
+        {
+            'nombre': 'elasticity',
+            'descripcion': 'Estimación de Elasticidades',
+            'funcion': partial(_call_stage, 'elasticity', project_root, storage_format=fmt, level=elasticity_level),
+            'depende_de': ['transform'],
+            'entradas': [abt],
+            'salidas': [elasticities],
+            'codigo': [os.path.join(src, 'modeling', 'elasticity.py'), groupby_code] + shared_code,
+            'parametros': {'formato': fmt, 'nivel': elasticity_level},
+        },
+        {
+            'nombre': 'velocity',
+            'descripcion': 'Velocidad de Demanda y Días de Cobertura',
+            'funcion': partial(_call_stage, 'velocity', project_root, storage_format=fmt),
+            'depende_de': ['transform'],
+            'entradas': [abt, current_state],
+            'salidas': [velocity, table_path(os.path.join(processed, VELOCITY_BUFFER_TABLE), fmt)],
+            'codigo': [os.path.join(src, 'modeling', 'demand_velocity.py'),
+                       os.path.join(src, 'modeling', 'elasticity.py'), groupby_code] + shared_code,
+            'parametros': {'formato': fmt},
+        },
+        {
+            'nombre': 'model',
+            'descripcion': 'Modelo de Recomendación',
+            'funcion': partial(_call_stage, 'model', project_root, storage_format=fmt,
+                               workers=workers, shard_key=shard_key, use_elasticity=use_elasticity,
+                               use_coverage=use_coverage),
+            'depende_de': model_dependencies,
+            'recibe': {'df_current_state': 'transform'} if workers <= 1 else {},
+            'entradas': [current_state] + ([elasticities] if use_elasticity else [])
+                        + ([velocity] if use_coverage else []),
+            'salidas': [os.path.join(recommendations, 'recommended_prices.csv'),
+                        os.path.join(recommendations, CHANGES_FILE),
+                        table_path(os.path.join(recommendations, PUBLISHED_TABLE), fmt)],
+            'codigo': [os.path.join(src, 'modeling', 'pricing_model.py'),
+                       os.path.join(src, 'modeling', 'elasticity.py'),
+                       os.path.join(src, 'modeling', 'recommendation_delta.py'),
+                       os.path.join(src, 'modeling', 'demand_velocity.py'), groupby_code,
+                       os.path.join(src, 'processing', 'current_state.py')] + shared_code,
+            'parametros': {'formato': fmt, 'elasticidad': use_elasticity, 'cobertura': use_coverage},
+        },
+    ]
+
+
+def run_pipeline(start=None, force=False, storage_format=None, workers=1, shard_key='id_tienda',
+                 metrics_dir=None, profile=None, profile_stages=None, elasticity_level='sku', use_elasticity=False,
+                 only=None, use_coverage=False, incremental=False, chunk_size=CHUNK_SIZE,
+                 category_urls=None, max_pages=None, use_http=True):
+    """
+    Ejecuta el pipeline como un DAG: las etapas sin cambios en sus entradas ni
+    en su código se omiten y las independientes se ejecutan en paralelo.
+    Con `start` se ejecuta solo esa etapa y las que dependen de ella; con `only`,
+    exactamente esas etapas, y solo se importa el código de las etapas que se
+    ejecutan. Con `workers > 1` el modelo se ejecuta por shards de `shard_key`
+    en varios procesos.
+    Con `use_elasticity` el modelo maximiza el ingreso con las elasticidades
+    estimadas a nivel `elasticity_level` (ver `src.modeling.elasticity`); con
+    `use_coverage` agrega las reglas de días de cobertura (ver
+    `src.modeling.demand_velocity`). Con `incremental` la transformación solo
+    procesa las ventas posteriores a su marca de agua, lo que conserva la
+    `generacion` de la tabla analítica y con ella las cachés de elasticidades y
+    velocidad de demanda. La transformación lee las ventas por bloques de
+    `chunk_size` filas, así que la memoria no crece con el volumen de ventas.
+    El scraper recorre las categorías `category_urls`, hasta `max_pages` páginas
+    por categoría, por HTTP con Selenium como respaldo (`use_http=False`: solo Selenium).
+
+    Cada etapa ejecutada emite métricas (ver `src.orchestration.metrics`) en
+    `metrics_dir` (por defecto `data/metrics`). Con `profile` ('cprofile' o
+    'tracemalloc') se guarda el perfil de las etapas de `profile_stages` (todas
+    si no se indica) y las etapas se ejecutan una a la vez para que los perfiles
+    no se mezclen.
+    """
     PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
     print("==============================================")
     print(f"== INICIANDO PIPELINE (RAÍZ: {PROJECT_ROOT}) ==")
     print("==============================================")
 
-    print("\n[PASO 1/4] Ejecutando Web Scraper...")
-    scrape_suburbia_selenium(PROJECT_ROOT)
+    stages = build_pipeline_stages(PROJECT_ROOT, storage_format, workers, shard_key, elasticity_level, use_elasticity,
+                                   use_coverage, incremental, chunk_size, category_urls, max_pages, use_http)
+    state_path = os.path.join(PROJECT_ROOT, 'data', PIPELINE_STATE_FILE)
+    metrics_dir = metrics_dir or os.path.join(PROJECT_ROOT, 'data', 'metrics')
+
+    def instrument(name):
+        profiled = profile if not profile_stages or name in profile_stages else None
+        return stage_metrics(name, metrics_dir, profiled)
 
-    print("\n[PASO 2/4] Ejecutando Generador de Datos Sintéticos...")
-    generate_data_from_scrape(PROJECT_ROOT)
+    with stage_metrics('pipeline', metrics_dir):
+        results = run_stages(stages, state_path, start=start, force=force,
+                             max_workers=1 if profile else None, stage_wrapper=instrument, only=only)
+    print(f"Métricas guardadas en: '{metrics_dir}'")
 
-    print("\n[PASO 3/4] Ejecutando Transformación de Datos...")
-    transform_data(PROJECT_ROOT)
+    print("\n--- Resumen de etapas ---")
+    for name, status in results.items():
+        print(f"{name}: {status}")
 
-    print("\n[PASO 4/4] Ejecutando Modelo de Recomendación...")
-    recommend_prices(PROJECT_ROOT)
+    if any(status in ('fallida', 'cancelada') for status in results.values()):
+        print("\n=============================================")
+        print("== PIPELINE TERMINADO CON ERRORES ==")
+        print("=============================================")
+        return results
 
     print("\n=============================================")
     print("== PIPELINE COMPLETADO CON ÉXITO ==")
     print("=============================================")
+    return results
 
 
 if __name__ == "__main__":
-    run_pipeline()
+    parser = argparse.ArgumentParser(description="Pipeline de precios dinámicos.")
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument('--desde', choices=STAGE_NAMES, default=None,
+                           help="Ejecuta solo esta etapa y las que dependen de ella.")
+    selection.add_argument('--etapas', nargs='+', choices=STAGE_NAMES, default=None,
+                           help="Ejecuta solo estas etapas; las demás no se importan.")
+    parser.add_argument('--forzar', action='store_true', help="Ignora la caché de etapas.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="La transformación solo agrega las ventas posteriores a su marca de agua.")
+    parser.add_argument('--filas-bloque', type=int, default=CHUNK_SIZE,
+                        help="Ventas por bloque en la transformación (0 = todas en memoria).")
+    parser.add_argument('--formato', choices=STORAGE_FORMATS, default=None,
+                        help="Formato de almacenamiento (por defecto, STORAGE_FORMAT).")
+    parser.add_argument('--procesos', type=int, default=1, help="Procesos para el modelo de precios.")
+    parser.add_argument('--llave-shard', choices=SHARD_KEYS, default='id_tienda',
+                        help="Llave para repartir el estado actual entre procesos.")
+    parser.add_argument('--elasticidad', action='store_true',
+                        help="El modelo maximiza el ingreso con las elasticidades estimadas.")
+    parser.add_argument('--nivel-elasticidad', choices=list(ELASTICITY_LEVELS), default='sku',
+                        help="Estima la elasticidad por SKU o por SKU-tienda.")
+    parser.add_argument('--cobertura', action='store_true',
+                        help="El modelo agrega las reglas de días de cobertura (velocidad de demanda).")
+    parser.add_argument('--categorias', nargs='+', default=None,
+                        help="URLs de categorías a extraer (por defecto, CATEGORY_URLS del scraper).")
+    parser.add_argument('--max-paginas', type=int, default=None,
+                        help="Páginas máximas por categoría en el scraper (por defecto, todas).")
+    parser.add_argument('--selenium', action='store_true',
+                        help="El scraper usa solo Selenium en lugar de HTTP con Selenium como respaldo.")
+    parser.add_argument('--metricas', default=None, help="Carpeta de métricas (por defecto, data/metrics).")
+    parser.add_argument('--perfil', choices=PROFILE_MODES, default=None,
+                        help="Guarda un perfil de cada etapa junto a las métricas.")
+    parser.add_argument('--perfil-etapas', nargs='+', choices=STAGE_NAMES, default=None,
+                        help="Etapas a perfilar (por defecto, todas).")
+    args = parser.parse_args()
+    run_pipeline(start=args.desde, force=args.forzar, storage_format=args.formato,
+                 workers=args.procesos, shard_key=args.llave_shard,
+                 metrics_dir=args.metricas, profile=args.perfil, profile_stages=args.perfil_etapas,
+                 elasticity_level=args.nivel_elasticidad, use_elasticity=args.elasticidad, only=args.etapas,
+                 use_coverage=args.cobertura, incremental=args.incremental, chunk_size=args.filas_bloque or None,
+                 category_urls=args.categorias, max_pages=args.max_paginas, use_http=not args.selenium)
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+
+# Tipos de las columnas de agrupación (SKU y tienda) en todas las tablas del modelo.
+KEY_TYPES = {'sku': str, 'id_tienda': np.int64}
+
+
+def group_keys(df, group_cols):
+    # Tipos uniformes para que las llaves de la caché y de las ventas coincidan.
+    return df[group_cols].astype({col: KEY_TYPES[col] for col in group_cols})
+
+
+def factorize_groups(df, group_cols):
+    """
+    Código entero de grupo de cada fila y las llaves de los grupos. Cada columna
+    se factoriza por separado (rápido con categorías) y los códigos se combinan
+    en un entero; la conversión de tipos solo se hace sobre las llaves únicas.
+    """
+    codes = np.zeros(len(df), dtype=np.int64)
+    uniques = []
+    for col in group_cols:
+        col_codes, col_uniques = pd.factorize(df[col])
+        codes = codes * len(col_uniques) + col_codes
+        uniques.append(col_uniques)
+    codes, combined = pd.factorize(codes)
+    keys = {}
+    for col, col_uniques in zip(reversed(group_cols), reversed(uniques)):
+        keys[col] = np.asarray(col_uniques)[combined % len(col_uniques)]
+        combined = combined // len(col_uniques)
+    keys = pd.DataFrame({col: keys[col] for col in group_cols})
+    return codes, pd.MultiIndex.from_frame(group_keys(keys, group_cols))
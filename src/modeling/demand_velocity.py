@@ -0,0 +1,293 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from src.storage import read_table, iter_table, write_table, table_size_bytes, STORAGE_FORMAT, STORAGE_FORMATS
+from src.processing.current_state import CURRENT_STATE_TABLE
+from src.utils import read_json, write_json
+from src.modeling._groupby import group_keys, factorize_groups
+from src.modeling.elasticity import ABT_WATERMARK_FILE
+from src.orchestration.metrics import record_metrics
+
+
+VELOCITY_TABLE = 'demand_velocity'
+VELOCITY_BUFFER_TABLE = 'demand_velocity_buffer'
+VELOCITY_WATERMARK_FILE = 'demand_velocity_watermark.json'
+# Ventanas móviles en días, terminando en el último día con ventas de la tabla analítica.
+VELOCITY_WINDOWS = (7, 28, 90)
+BUFFER_DAYS = max(VELOCITY_WINDOWS)
+# Ventana cuya velocidad (unidades por día) se usa para los días de cobertura y,
+# si en ella no hubo ventas, la ventana larga de respaldo.
+COVER_WINDOW = 28
+COVER_FALLBACK_WINDOW = max(VELOCITY_WINDOWS)
+KEY_COLUMNS = ['sku', 'id_tienda']
+SALES_COLUMNS = ['fecha', 'sku', 'id_tienda', 'precio_unitario', 'cantidad_vendida']
+UNIT_COLUMNS = [f'unidades_{w}d' for w in VELOCITY_WINDOWS]
+REVENUE_COLUMNS = [f'ingreso_{w}d' for w in VELOCITY_WINDOWS]
+RATE_COLUMNS = [f'velocidad_{w}d' for w in VELOCITY_WINDOWS]
+FEATURE_COLUMNS = UNIT_COLUMNS + REVENUE_COLUMNS + RATE_COLUMNS + ['dias_cobertura']
+CHUNK_SIZE = 1_000_000
+
+
+def _day_numbers(values):
+    # Días desde 1970-01-01: las ventanas se comparan con enteros.
+    return np.asarray(values, dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int64)
+
+
+def _aggregate_daily(positions, days, units, revenue):
+    """
+    Suma unidades e ingreso por (posición de la llave, día). Regresa los cuatro
+    arreglos de los pares distintos.
+    """
+    if len(positions) == 0:
+        return positions, days, units, revenue
+    first_day = days.min()
+    span = days.max() - first_day + 1
+    codes, pairs = pd.factorize(positions * span + (days - first_day))
+    return (pairs // span, pairs % span + first_day,
+            np.bincount(codes, weights=units, minlength=len(pairs)),
+            np.bincount(codes, weights=revenue, minlength=len(pairs)))
+
+
+def _empty_daily():
+    return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0)
+
+
+def daily_totals(df_sales, keys):
+    """
+    Unidades e ingreso (precio x cantidad) de las ventas por sku-tienda y día.
+    Las llaves se ubican en `keys` (las del estado actual); se ignoran las
+    ventas sin llave o cuya llave no está en `keys`.
+    """
+    valid = df_sales[KEY_COLUMNS].notna().all(axis=1).to_numpy()
+    df_sales = df_sales.loc[valid]
+    if df_sales.empty:
+        return _empty_daily()
+    codes, groups = factorize_groups(df_sales, KEY_COLUMNS)
+    positions = keys.get_indexer(groups)[codes]
+    quantity = np.nan_to_num(df_sales['cantidad_vendida'].to_numpy(dtype=float, na_value=np.nan))
+    price = df_sales['precio_unitario'].to_numpy(dtype=float, na_value=np.nan)
+    known = positions >= 0
+    return _aggregate_daily(positions[known].astype(np.int64), _day_numbers(df_sales['fecha'])[known],
+                            quantity[known], np.nan_to_num(price[known] * quantity[known]))
+
+
+def update_window_sums(sums, new_daily, buffer_daily, previous_day, reference_day):
+    """
+    Actualiza en su lugar las sumas móviles (`sums`: una fila por llave, primero
+    las unidades y luego el ingreso de cada ventana) al mover el día de
+    referencia de `previous_day` a `reference_day`: suma las ventas nuevas que
+    caen en cada ventana y resta, del buffer de totales diarios, los días que
+    salen de ella. Solo se procesan las ventas nuevas y los días que expiran.
+    """
+    num_keys, num_windows = len(sums), len(VELOCITY_WINDOWS)
+    for i, window in enumerate(VELOCITY_WINDOWS):
+        start = reference_day - window
+        positions, days, units, revenue = new_daily
+        entering = days > start
+        sums[:, i] += np.bincount(positions[entering], weights=units[entering], minlength=num_keys)
+        sums[:, num_windows + i] += np.bincount(positions[entering], weights=revenue[entering], minlength=num_keys)
+        if previous_day is None:
+            continue
+        positions, days, units, revenue = buffer_daily
+        leaving = (days > previous_day - window) & (days <= start)
+        sums[:, i] -= np.bincount(positions[leaving], weights=units[leaving], minlength=num_keys)
+        sums[:, num_windows + i] -= np.bincount(positions[leaving], weights=revenue[leaving], minlength=num_keys)
+    # Las unidades son enteras (exactas); en una ventana sin unidades el ingreso
+    # solo puede traer residuo de punto flotante de las restas.
+    sums[:, num_windows:][sums[:, :num_windows] == 0] = 0.0
+    return sums
+
+
+def coverage_days(stock, velocity, fallback_velocity=None):
+    """
+    Días que dura el inventario al ritmo de venta `velocity` (unidades por día).
+    Si no hubo ventas a ese ritmo se usa `fallback_velocity` (la ventana larga);
+    sin ventas en ninguna la cobertura es NaN (desconocida), así que las reglas
+    de cobertura no aplican a esas llaves. Sin inventario es 0; sin dato de
+    inventario, NaN.
+    """
+    velocity = np.asarray(velocity, dtype=float)
+    if fallback_velocity is not None:
+        velocity = np.where(velocity > 0, velocity, fallback_velocity)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(stock == 0, 0.0, stock / np.where(velocity > 0, velocity, np.nan))
+
+
+def velocity_features(keys, sums, stock):
+    """
+    Tabla de características por sku-tienda: unidades e ingreso de cada
+    ventana, velocidad (unidades por día) y días de cobertura del inventario.
+    """
+    num_windows = len(VELOCITY_WINDOWS)
+    df = group_keys(keys.to_frame(index=False), KEY_COLUMNS)
+    for i, window in enumerate(VELOCITY_WINDOWS):
+        df[UNIT_COLUMNS[i]] = sums[:, i].round().astype(np.int64)
+    for i in range(num_windows):
+        df[REVENUE_COLUMNS[i]] = sums[:, num_windows + i]
+    for i, window in enumerate(VELOCITY_WINDOWS):
+        df[RATE_COLUMNS[i]] = sums[:, i] / window
+    df['dias_cobertura'] = coverage_days(stock, df[f'velocidad_{COVER_WINDOW}d'].to_numpy(),
+                                         df[f'velocidad_{COVER_FALLBACK_WINDOW}d'].to_numpy())
+    return df
+
+
+def _buffer_frame(keys, buffer_daily):
+    positions, days, units, revenue = buffer_daily
+    return pd.DataFrame({
+        'sku': keys.get_level_values('sku').to_numpy(dtype=object)[positions],
+        'id_tienda': keys.get_level_values('id_tienda').to_numpy()[positions],
+        'fecha': days.astype('datetime64[D]').astype('datetime64[ns]'),
+        'unidades': units,
+        'ingreso': revenue,
+    })
+
+
+def _buffer_daily(df_buffer, keys):
+    positions = keys.get_indexer(pd.MultiIndex.from_frame(group_keys(df_buffer, KEY_COLUMNS)))
+    known = positions >= 0
+    return (positions[known].astype(np.int64), _day_numbers(df_buffer['fecha'])[known],
+            df_buffer['unidades'].to_numpy(dtype=float)[known], df_buffer['ingreso'].to_numpy(dtype=float)[known])
+
+
+def load_demand_velocity(project_root, storage_format=None):
+    """
+    Tabla de velocidad de demanda guardada por `update_demand_velocity`. Lanza
+    FileNotFoundError si no existe.
+    """
+    df = read_table(os.path.join(project_root, 'data', 'processed', VELOCITY_TABLE), storage_format)
+    df['sku'] = df['sku'].astype(str)
+    return df
+
+
+def attach_velocity_features(df_current_state, df_velocity):
+    """
+    Agrega al estado actual las columnas de `df_velocity` (0 para las llaves sin
+    ventas) y recalcula `dias_cobertura` con el inventario de cada fila, para
+    que las reglas de precios las usen como cualquier otra columna.
+    """
+    index = pd.MultiIndex.from_frame(group_keys(df_velocity, KEY_COLUMNS))
+    positions = index.get_indexer(pd.MultiIndex.from_frame(group_keys(df_current_state, KEY_COLUMNS)))
+    features = {}
+    for col in UNIT_COLUMNS + REVENUE_COLUMNS + RATE_COLUMNS:
+        features[col] = np.append(df_velocity[col].to_numpy(), 0)[positions]
+    stock = df_current_state['stock_disponible'].to_numpy(dtype=float, na_value=np.nan)
+    features['dias_cobertura'] = coverage_days(stock, features[f'velocidad_{COVER_WINDOW}d'],
+                                               features[f'velocidad_{COVER_FALLBACK_WINDOW}d'])
+    return df_current_state.assign(**features)
+
+
+def update_demand_velocity(project_root, storage_format=None, chunk_size=CHUNK_SIZE):
+    """
+    Mantiene por sku-tienda las sumas móviles de 7, 28 y 90 días de unidades e
+    ingreso, la velocidad de venta y los días de cobertura del inventario, y
+    las guarda en la tabla `demand_velocity`.
+
+    Las sumas se actualizan de forma incremental: si la tabla analítica solo
+    recibió ventas nuevas (misma `generacion` en su marca de agua), se leen solo
+    las ventas posteriores a la última `fecha` procesada, se suman a cada
+    ventana y se restan los días que salen de ella, tomados de un buffer con los
+    totales diarios de los últimos 90 días (`demand_velocity_buffer`). Si la
+    tabla se reconstruyó, se leen solo las ventas de los últimos 90 días.
+    """
+    fmt = storage_format or STORAGE_FORMAT
+    PROCESSED_PATH = os.path.join(project_root, 'data', 'processed')
+    abt_base = os.path.join(PROCESSED_PATH, 'analytical_base_table')
+    output_base = os.path.join(PROCESSED_PATH, VELOCITY_TABLE)
+    buffer_base = os.path.join(PROCESSED_PATH, VELOCITY_BUFFER_TABLE)
+    watermark_file = os.path.join(PROCESSED_PATH, VELOCITY_WATERMARK_FILE)
+
+    print("--- Velocidad de demanda por SKU-tienda (ventanas de 7, 28 y 90 días) ---")
+    try:
+        df_state = read_table(os.path.join(PROCESSED_PATH, CURRENT_STATE_TABLE), fmt,
+                              columns=KEY_COLUMNS + ['stock_disponible'])
+    except FileNotFoundError:
+        print("Error: No existe el estado actual. Ejecuta la transformación primero.")
+        return None
+    keys = pd.MultiIndex.from_frame(group_keys(df_state, KEY_COLUMNS))
+    sums = np.zeros((len(keys), 2 * len(VELOCITY_WINDOWS)))
+
+    abt_watermark = read_json(os.path.join(PROCESSED_PATH, ABT_WATERMARK_FILE)) or {}
+    watermark = read_json(watermark_file)
+    df_cache = df_buffer = None
+    if (watermark is not None and abt_watermark.get('generacion')
+            and watermark.get('generacion') == abt_watermark['generacion']):
+        try:
+            df_cache = read_table(output_base, fmt, columns=KEY_COLUMNS + UNIT_COLUMNS + REVENUE_COLUMNS)
+            df_buffer = read_table(buffer_base, fmt)
+        except FileNotFoundError:
+            df_cache = df_buffer = None
+
+    last_date = None
+    if df_cache is not None:
+        positions = keys.get_indexer(pd.MultiIndex.from_frame(group_keys(df_cache, KEY_COLUMNS)))
+        known = positions >= 0
+        sums[positions[known]] = df_cache[UNIT_COLUMNS + REVENUE_COLUMNS].to_numpy(dtype=float)[known]
+        buffer_daily = _buffer_daily(df_buffer, keys)
+        last_date = watermark['ultima_fecha']
+        sales_filters = None if last_date is None else [('fecha', '>', pd.Timestamp(last_date))]
+        print(f"Caché vigente: se procesan solo las ventas posteriores a {last_date}.")
+    else:
+        buffer_daily = _empty_daily()
+        sales_filters = None
+        if abt_watermark.get('ultima_fecha'):
+            # Solo hacen falta las ventas de la ventana más larga.
+            first_day = pd.Timestamp(abt_watermark['ultima_fecha']).normalize() - pd.Timedelta(days=BUFFER_DAYS - 1)
+            sales_filters = [('fecha', '>=', first_day)]
+        print("Sin caché vigente: se calculan las ventanas con las ventas de los últimos "
+              f"{BUFFER_DAYS} días.")
+    previous_day = None if last_date is None else int(_day_numbers([pd.Timestamp(last_date)])[0])
+
+    num_rows = 0
+    new_parts = []
+    try:
+        for df_sales in iter_table(abt_base, fmt, columns=SALES_COLUMNS, filters=sales_filters,
+                                   chunk_size=chunk_size):
+            if df_sales.empty:
+                continue
+            num_rows += len(df_sales)
+            chunk_last = pd.Timestamp(df_sales['fecha'].max()).isoformat()
+            last_date = chunk_last if last_date is None else max(last_date, chunk_last)
+            new_parts.append(daily_totals(df_sales, keys))
+    except FileNotFoundError:
+        print(f"Error: No se encontró la tabla analítica en '{abt_base}'. Ejecuta la transformación primero.")
+        return None
+    record_metrics(filas_entrada=num_rows, bytes_leidos=table_size_bytes(abt_base, fmt))
+
+    new_daily = tuple(np.concatenate(arrays) for arrays in zip(*new_parts)) if new_parts else _empty_daily()
+    reference_day = None if last_date is None else int(_day_numbers([pd.Timestamp(last_date)])[0])
+    if reference_day is not None:
+        update_window_sums(sums, new_daily, buffer_daily, previous_day, reference_day)
+        # El buffer conserva los totales diarios que aún están dentro de la ventana más larga.
+        merged = tuple(np.concatenate([old, new]) for old, new in zip(buffer_daily, new_daily))
+        recent = merged[1] > reference_day - BUFFER_DAYS
+        buffer_daily = _aggregate_daily(*(values[recent] for values in merged))
+
+    stock = df_state['stock_disponible'].to_numpy(dtype=float, na_value=np.nan)
+    df_velocity = velocity_features(keys, sums, stock)
+    # Si el proceso se interrumpe entre la escritura de las tablas y la de la
+    # marca de agua, la siguiente ejecución recalcula todo en vez de volver a
+    # sumar las mismas ventas.
+    write_json(watermark_file, {'generacion': None, 'ultima_fecha': None})
+    write_table(df_velocity, output_base, fmt)
+    write_table(_buffer_frame(keys, buffer_daily), buffer_base, fmt)
+    write_json(watermark_file, {
+        'generacion': abt_watermark.get('generacion'),
+        'ultima_fecha': last_date,
+    })
+    record_metrics(filas_salida=len(df_velocity),
+                   bytes_escritos=table_size_bytes(output_base, fmt) + table_size_bytes(buffer_base, fmt))
+
+    with_sales = int(np.count_nonzero(df_velocity[f'unidades_{BUFFER_DAYS}d']))
+    print(f"{num_rows} ventas procesadas; {with_sales} de {len(df_velocity)} sku-tienda con ventas "
+          f"en los últimos {BUFFER_DAYS} días (al {last_date}).")
+    print(f"Velocidad de demanda guardada en: '{output_base}'")
+    return df_velocity
+
+
+if __name__ == "__main__":
+    project_root_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser = argparse.ArgumentParser(description="Velocidad de demanda y días de cobertura por SKU-tienda.")
+    parser.add_argument('--formato', choices=STORAGE_FORMATS, default=None)
+    args = parser.parse_args()
+    update_demand_velocity(project_root_path, args.formato)
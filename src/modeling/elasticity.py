@@ -0,0 +1,235 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from src.storage import read_table, iter_table, write_table, table_size_bytes, STORAGE_FORMAT, STORAGE_FORMATS
+from src.utils import read_json, write_json
+from src.modeling._groupby import group_keys, factorize_groups
+from src.orchestration.metrics import record_metrics
+
+
+ELASTICITY_TABLE = 'price_elasticity'
+ELASTICITY_WATERMARK_FILE = 'price_elasticity_watermark.json'
+ABT_WATERMARK_FILE = 'analytical_base_table_watermark.json'
+# Nivel de agrupación de las regresiones: por SKU o por SKU-tienda.
+ELASTICITY_LEVELS = {
+    'sku': ['sku'],
+    'sku_tienda': ['sku', 'id_tienda'],
+}
+SALES_COLUMNS = ['fecha', 'sku', 'id_tienda', 'precio_unitario', 'cantidad_vendida']
+# Estadísticos suficientes de cada grupo: observaciones, medias de log(precio) y
+# log(cantidad) y sumas de productos centrados. Se combinan sin volver a leer las ventas.
+STAT_COLUMNS = ['observaciones', 'media_log_precio', 'media_log_cantidad', 'sxx', 'sxy', 'syy']
+COEFFICIENT_COLUMNS = ['elasticidad', 'intercepto', 'r2', 'error_estandar', 'confiable']
+# Una elasticidad es confiable con suficientes observaciones, pendiente negativa
+# y estadístico t (|pendiente| / error estándar) de al menos este valor.
+MIN_OBSERVATIONS = 30
+MIN_T_STAT = 2.0
+CHUNK_SIZE = 1_000_000
+
+
+def _empty_stats(group_cols):
+    return pd.DataFrame(np.zeros((0, len(STAT_COLUMNS))), columns=STAT_COLUMNS,
+                        index=pd.MultiIndex.from_arrays([[] for _ in group_cols], names=group_cols))
+
+
+def sales_statistics(df_sales, group_cols):
+    """
+    Estadísticos suficientes de la regresión log-log de cada grupo en un solo
+    paso vectorizado: los grupos se codifican como enteros y todas las sumas
+    se calculan con `np.bincount`, sin iterar por grupo. Se ignoran las ventas
+    sin llave o sin precio o cantidad positivos.
+    """
+    price = df_sales['precio_unitario'].to_numpy(dtype=float, na_value=np.nan)
+    quantity = df_sales['cantidad_vendida'].to_numpy(dtype=float, na_value=np.nan)
+    valid = (price > 0) & (quantity > 0) & df_sales[group_cols].notna().all(axis=1).to_numpy()
+    if not valid.any():
+        return _empty_stats(group_cols)
+    codes, groups = factorize_groups(df_sales.loc[valid], group_cols)
+    x, y = np.log(price[valid]), np.log(quantity[valid])
+
+    count = np.bincount(codes, minlength=len(groups))
+    mean_x = np.bincount(codes, weights=x, minlength=len(groups)) / count
+    mean_y = np.bincount(codes, weights=y, minlength=len(groups)) / count
+    # Sumas centradas en la media del grupo (más estables que las sumas crudas).
+    dx, dy = x - mean_x[codes], y - mean_y[codes]
+    stats = np.column_stack([
+        count, mean_x, mean_y,
+        np.bincount(codes, weights=dx * dx, minlength=len(groups)),
+        np.bincount(codes, weights=dx * dy, minlength=len(groups)),
+        np.bincount(codes, weights=dy * dy, minlength=len(groups)),
+    ])
+    return pd.DataFrame(stats, columns=STAT_COLUMNS, index=groups.set_names(group_cols))
+
+
+def combine_statistics(stats_a, stats_b):
+    """
+    Combina los estadísticos de dos conjuntos de ventas (fórmula de Chan para
+    medias y momentos centrados), alineando los grupos de ambos. Regresa los
+    estadísticos combinados y una máscara de los grupos que aparecen en `stats_b`.
+    """
+    # Con un solo nivel, `MultiIndex.append` degrada a un Index simple: se une por tablas de llaves.
+    groups = pd.MultiIndex.from_frame(
+        pd.concat([stats_a.index.to_frame(), stats_b.index.to_frame()], ignore_index=True).drop_duplicates())
+    a = stats_a.reindex(groups, fill_value=0.0).to_numpy()
+    b = stats_b.reindex(groups, fill_value=0.0).to_numpy()
+    n_a, n_b = a[:, 0], b[:, 0]
+    n = n_a + n_b
+    dx, dy = b[:, 1] - a[:, 1], b[:, 2] - a[:, 2]
+    weight = n_a * n_b / n
+    combined = np.column_stack([
+        n,
+        a[:, 1] + dx * n_b / n,
+        a[:, 2] + dy * n_b / n,
+        a[:, 3] + b[:, 3] + dx * dx * weight,
+        a[:, 4] + b[:, 4] + dx * dy * weight,
+        a[:, 5] + b[:, 5] + dy * dy * weight,
+    ])
+    return pd.DataFrame(combined, columns=STAT_COLUMNS, index=groups), n_b > 0
+
+
+def fit_coefficients(stats):
+    """
+    Resuelve a la vez la regresión `log(cantidad) = intercepto + elasticidad *
+    log(precio)` de todos los grupos a partir de sus estadísticos suficientes.
+    Los grupos sin variación de precio quedan con elasticidad NaN.
+    """
+    n, mean_x, mean_y, sxx, sxy, syy = (stats[col].to_numpy() for col in STAT_COLUMNS)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        has_variation = sxx > 1e-12 * np.maximum(n, 1)
+        slope = np.where(has_variation, sxy / sxx, np.nan)
+        residual = np.maximum(syy - slope * sxy, 0.0)
+        r2 = np.where(syy > 0, 1 - residual / syy, np.nan)
+        std_error = np.where(n > 2, np.sqrt(residual / (n - 2) / sxx), np.nan)
+        t_stat = np.abs(slope) / std_error
+    reliable = (n >= MIN_OBSERVATIONS) & (slope < 0) & ((t_stat >= MIN_T_STAT) | (std_error == 0))
+    return pd.DataFrame({
+        'elasticidad': slope,
+        'intercepto': mean_y - slope * mean_x,
+        'r2': r2,
+        'error_estandar': std_error,
+        'confiable': reliable,
+    }, index=stats.index)
+
+
+def load_elasticities(project_root, storage_format=None):
+    """
+    Tabla de elasticidades guardada por `estimate_elasticities`. Lanza
+    FileNotFoundError si no existe.
+    """
+    df = read_table(os.path.join(project_root, 'data', 'processed', ELASTICITY_TABLE), storage_format)
+    df['sku'] = df['sku'].astype(str)
+    return df
+
+
+def estimate_elasticities(project_root, storage_format=None, level='sku', chunk_size=CHUNK_SIZE):
+    """
+    Estima la elasticidad precio de la demanda de cada SKU (o de cada SKU-tienda
+    con `level='sku_tienda'`) con un modelo log-log sobre las ventas de la tabla
+    analítica, y guarda la tabla `price_elasticity` con los coeficientes y los
+    estadísticos suficientes de cada grupo.
+
+    La tabla funciona como caché: si la tabla analítica solo recibió ventas
+    nuevas (misma `generacion` en su marca de agua), se leen solo las ventas
+    posteriores a la última `fecha` procesada y se reajustan únicamente los
+    grupos que tienen ventas nuevas. Si la tabla se reconstruyó o cambió el
+    nivel, se estiman todos los grupos.
+    """
+    fmt = storage_format or STORAGE_FORMAT
+    if level not in ELASTICITY_LEVELS:
+        raise ValueError(f"Nivel de elasticidad no soportado: '{level}'. Usa uno de {list(ELASTICITY_LEVELS)}.")
+    group_cols = ELASTICITY_LEVELS[level]
+    PROCESSED_PATH = os.path.join(project_root, 'data', 'processed')
+    abt_base = os.path.join(PROCESSED_PATH, 'analytical_base_table')
+    output_base = os.path.join(PROCESSED_PATH, ELASTICITY_TABLE)
+    watermark_file = os.path.join(PROCESSED_PATH, ELASTICITY_WATERMARK_FILE)
+
+    print("--- Estimación de elasticidades precio de la demanda ---")
+    abt_watermark = read_json(os.path.join(PROCESSED_PATH, ABT_WATERMARK_FILE)) or {}
+    watermark = read_json(watermark_file)
+    df_cache = None
+    if (watermark is not None and watermark.get('nivel') == level and abt_watermark.get('generacion')
+            and watermark.get('generacion') == abt_watermark['generacion']):
+        try:
+            df_cache = read_table(output_base, fmt)
+        except FileNotFoundError:
+            df_cache = None
+
+    stats = _empty_stats(group_cols)
+    sales_filters = None
+    if df_cache is not None:
+        # `set_index` degrada un MultiIndex de un nivel a un Index simple; se construye aparte.
+        df_cache = pd.DataFrame({col: df_cache[col].to_numpy() for col in STAT_COLUMNS + COEFFICIENT_COLUMNS},
+                                index=pd.MultiIndex.from_frame(group_keys(df_cache, group_cols)))
+        stats = df_cache[STAT_COLUMNS]
+        if watermark['ultima_fecha'] is not None:
+            sales_filters = [('fecha', '>', pd.Timestamp(watermark['ultima_fecha']))]
+        print(f"Caché vigente: se procesan solo las ventas posteriores a {watermark['ultima_fecha']}.")
+    else:
+        print(f"Sin caché vigente: se estiman todos los grupos (nivel '{level}').")
+
+    num_rows = 0
+    last_date = None if watermark is None or df_cache is None else watermark['ultima_fecha']
+    new_stats = _empty_stats(group_cols)
+    try:
+        for df_sales in iter_table(abt_base, fmt, columns=SALES_COLUMNS, filters=sales_filters,
+                                   chunk_size=chunk_size):
+            if df_sales.empty:
+                continue
+            num_rows += len(df_sales)
+            chunk_last = pd.Timestamp(df_sales['fecha'].max()).isoformat()
+            last_date = chunk_last if last_date is None else max(last_date, chunk_last)
+            new_stats, _ = combine_statistics(new_stats, sales_statistics(df_sales, group_cols))
+    except FileNotFoundError:
+        print(f"Error: No se encontró la tabla analítica en '{abt_base}'. Ejecuta la transformación primero.")
+        return None
+    record_metrics(filas_entrada=num_rows, bytes_leidos=table_size_bytes(abt_base, fmt))
+
+    stats, touched = combine_statistics(stats, new_stats)
+    if df_cache is not None:
+        coefficients = df_cache[COEFFICIENT_COLUMNS].reindex(stats.index)
+    else:
+        coefficients = pd.DataFrame(index=stats.index, columns=COEFFICIENT_COLUMNS)
+    # Solo se reajustan los grupos con ventas nuevas; los demás conservan sus coeficientes.
+    coefficients.loc[touched, :] = fit_coefficients(stats[touched])
+    coefficients = coefficients.astype({col: float for col in COEFFICIENT_COLUMNS[:-1]})
+    coefficients['confiable'] = coefficients['confiable'].eq(True)
+    df_elasticities = pd.concat([stats, coefficients], axis=1).reset_index()
+    df_elasticities['observaciones'] = df_elasticities['observaciones'].astype(np.int64)
+
+    if touched.any() or df_cache is None:
+        write_table(df_elasticities, output_base, fmt)
+    write_json(watermark_file, {
+        'nivel': level,
+        'generacion': abt_watermark.get('generacion'),
+        'ultima_fecha': last_date,
+    })
+    record_metrics(filas_salida=int(touched.sum()), bytes_escritos=table_size_bytes(output_base, fmt))
+
+    print(f"{num_rows} ventas procesadas; {int(touched.sum())} de {len(df_elasticities)} grupos reajustados.")
+    print(f"{int(df_elasticities['confiable'].sum())} grupos con elasticidad confiable "
+          f"(mínimo {MIN_OBSERVATIONS} ventas, pendiente negativa y |t| >= {MIN_T_STAT}).")
+    return df_elasticities
+
+
+def lookup_elasticities(df_elasticities, df_keys):
+    """
+    Elasticidad de cada fila de `df_keys` (sku e id_tienda) según el nivel de la
+    tabla. Las filas sin una elasticidad confiable quedan con NaN.
+    """
+    group_cols = ['sku', 'id_tienda'] if 'id_tienda' in df_elasticities else ['sku']
+    df_reliable = df_elasticities[df_elasticities['confiable'].astype(bool)]
+    index = pd.MultiIndex.from_frame(group_keys(df_reliable, group_cols))
+    keys = pd.MultiIndex.from_frame(group_keys(df_keys, group_cols))
+    positions = index.get_indexer(keys)
+    values = np.append(df_reliable['elasticidad'].to_numpy(dtype=float), np.nan)
+    return values[positions]
+
+
+if __name__ == "__main__":
+    project_root_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser = argparse.ArgumentParser(description="Estimación de elasticidades precio de la demanda.")
+    parser.add_argument('--nivel', choices=list(ELASTICITY_LEVELS), default='sku')
+    parser.add_argument('--formato', choices=STORAGE_FORMATS, default=None)
+    args = parser.parse_args()
+    estimate_elasticities(project_root_path, args.formato, args.nivel)
@@ -1,12 +1,425 @@
+import argparse
 import pandas as pd
 import os
+import shutil
+import uuid
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from src.storage import read_table, write_table, table_path, table_size_bytes
+from src.processing.current_state import load_current_state, CURRENT_STATE_KEYS, CURRENT_STATE_TABLE
+from src.processing.schema import apply_schema
+from src.modeling.elasticity import load_elasticities, lookup_elasticities
+from src.modeling.demand_velocity import load_demand_velocity, attach_velocity_features
+from src.modeling.recommendation_delta import (publish_recommendations, published_size_bytes, PUBLISHED_COLUMNS,
+                                               CHANGES_FILE)
+from src.orchestration.metrics import record_metrics
 
 
-def recommend_prices(project_root):
+OPERATORS = {
+    '>': np.greater,
+    '<': np.less,
+}
+
+
+def build_pricing_rules(factor_competencia=1.05, umbral_alto_inventario=50, umbral_bajo_inventario=10,
+                        factor_alto_inventario=0.95, factor_bajo_inventario=1.10):
+    """
+    Declara las reglas de negocio como datos. Cada regla compara una columna contra
+    un umbral (opcionalmente multiplicado por otra columna) y, si se cumple, propone
+    `precio_base * factor_precio`. Cuando varias reglas se cumplen, prevalece la de
+    mayor prioridad.
+    """
+    return [
+        {
+            'prioridad': 1,
+            'justificacion': 'Ajuste por Competencia',
+            'columna': 'precio_unitario',
+            'operador': '>',
+            'referencia': 'competitor_price',
+            'umbral': factor_competencia,
+            'precio_base': 'competitor_price',
+            'factor_precio': 1.0,
+        },
+        {
+            'prioridad': 2,
+            'justificacion': 'Descuento por Alto Inventario',
+            'columna': 'stock_disponible',
+            'operador': '>',
+            'referencia': None,
+            'umbral': umbral_alto_inventario,
+            'precio_base': 'precio_base_interno',
+            'factor_precio': factor_alto_inventario,
+        },
+        {
+            'prioridad': 3,
+            'justificacion': 'Aumento por Bajo Inventario',
+            'columna': 'stock_disponible',
+            'operador': '<',
+            'referencia': None,
+            'umbral': umbral_bajo_inventario,
+            'precio_base': 'precio_base_interno',
+            'factor_precio': factor_bajo_inventario,
+        },
+    ]
+
+
+PRICING_RULES = build_pricing_rules()
+
+
+def build_coverage_rules(cobertura_alta=60, cobertura_baja=7, factor_cobertura_alta=0.90,
+                         factor_cobertura_baja=1.05):
+    """
+    Reglas opcionales sobre los días de cobertura del inventario (inventario /
+    velocidad de venta, ver `src.modeling.demand_velocity`). Tienen prioridad
+    sobre las de inventario, porque el mismo inventario puede sobrar o faltar
+    según lo rápido que se vende el SKU en la tienda.
+    """
+    return [
+        {
+            'prioridad': 4,
+            'justificacion': 'Descuento por Sobrecobertura',
+            'columna': 'dias_cobertura',
+            'operador': '>',
+            'referencia': None,
+            'umbral': cobertura_alta,
+            'precio_base': 'precio_base_interno',
+            'factor_precio': factor_cobertura_alta,
+        },
+        {
+            'prioridad': 5,
+            'justificacion': 'Aumento por Baja Cobertura',
+            'columna': 'dias_cobertura',
+            'operador': '<',
+            'referencia': None,
+            'umbral': cobertura_baja,
+            'precio_base': 'precio_base_interno',
+            'factor_precio': factor_cobertura_baja,
+        },
+    ]
+
+
+COVERAGE_RULES = build_coverage_rules()
+DEFAULT_REASON = "Mantener Precio Actual"
+ELASTICITY_REASON = "Optimización por Elasticidad"
+
+
+def build_elasticity_guardrails(max_cambio=0.10, tope_competencia=1.05, piso_precio_base=0.80):
+    """
+    Límites del precio que maximiza el ingreso con la elasticidad estimada: a lo
+    más `max_cambio` de variación sobre el precio actual, sin superar
+    `tope_competencia` veces el precio de la competencia ni bajar de
+    `piso_precio_base` veces el precio base interno.
+    """
+    return {
+        'max_cambio': max_cambio,
+        'tope_competencia': tope_competencia,
+        'piso_precio_base': piso_precio_base,
+    }
+
+
+ELASTICITY_GUARDRAILS = build_elasticity_guardrails()
+
+# Columnas de la tabla analítica que necesita el modelo (poda de columnas al leer).
+MODEL_COLUMNS = [
+    'fecha', 'sku', 'id_tienda', 'product_name', 'precio_base_interno',
+    'precio_unitario', 'stock_disponible', 'competitor_price'
+]
+# Decimales máximos al buscar la representación corta de un float32 y límite de
+# magnitud (2**24): por encima, el texto puede terminar en ceros antes del punto.
+FLOAT32_MAX_DECIMALS = 12
+FLOAT32_EXACT_LIMIT = 2 ** 24
+
+
+def _round_prices(values):
+    """
+    Redondea a 2 decimales igual que `round()` de Python. `np.round` solo difiere
+    en los empates (ej. 2.675), que se resuelven elemento a elemento.
+    """
+    values = np.asarray(values, dtype=float)
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if ties.any():
+        rounded[ties] = [round(float(v), 2) for v in values[ties]]
+    return rounded
+
+
+def _to_float64(series):
+    """
+    Convierte una columna a float64. Los precios float32 se reemplazan por su
+    representación decimal más corta (ej. 858.645 y no 858.64502), para que
+    los empates del redondeo se resuelvan igual que con los valores originales.
+    Se busca numéricamente: el primer redondeo a 0, 1, 2... decimales que
+    regresa al mismo float32 (las columnas enteras, como el stock, se resuelven
+    en la primera pasada). Los valores fuera de ese alcance usan su texto.
+    """
+    if series.dtype != np.float32:
+        return series.to_numpy(dtype=float, na_value=np.nan)
+    single = series.to_numpy()
+    values = single.astype(np.float64)
+    resolved = np.zeros(len(single), dtype=bool)
+    pending = np.flatnonzero(np.abs(single) < FLOAT32_EXACT_LIMIT)
+    for decimals in range(FLOAT32_MAX_DECIMALS + 1):
+        if len(pending) == 0:
+            break
+        candidate = np.round(values[pending], decimals)
+        found = candidate.astype(np.float32) == single[pending]
+        values[pending[found]] = candidate[found]
+        resolved[pending[found]] = True
+        pending = pending[~found]
+    if not resolved.all():
+        values[~resolved] = single[~resolved].astype(str).astype(float)
+    return values
+
+
+def evaluate_rules(columns, rules=PRICING_RULES):
+    """
+    Evalúa las reglas como operaciones con máscaras sobre arreglos.
+    Regresa el precio recomendado y el índice de la regla aplicada
+    (0 = mantener precio, i = i-ésima regla en orden de prioridad).
+    """
+    current_price = columns['precio_unitario']
+    recommended_price = current_price.copy()
+    reason_codes = np.zeros(current_price.shape, dtype=np.int8)
+
+    for code, rule in enumerate(sorted(rules, key=lambda r: r['prioridad']), start=1):
+        threshold = rule['umbral']
+        if rule['referencia'] is not None:
+            threshold = columns[rule['referencia']] * threshold
+        # Las comparaciones con NaN son falsas, igual que el `pd.notna` original.
+        mask = OPERATORS[rule['operador']](columns[rule['columna']], threshold)
+        new_price = columns[rule['precio_base']] * rule['factor_precio']
+        recommended_price = np.where(mask, new_price, recommended_price)
+        reason_codes = np.where(mask, np.int8(code), reason_codes)
+
+    return recommended_price, reason_codes
+
+
+def revenue_maximizing_prices(columns, elasticity, guardrails=ELASTICITY_GUARDRAILS):
+    """
+    Precio que maximiza el ingreso dentro de los límites de `guardrails`. Con
+    demanda `q = A * p^e` el ingreso `p * q = A * p^(1 + e)` es monótono en el
+    precio: baja al subir el precio si la demanda es elástica (e < -1) y sube si
+    es inelástica (-1 < e < 0), así que el óptimo es el límite inferior o el
+    superior. Regresa el precio y una máscara de las filas donde aplica (con
+    elasticidad, distinta de -1 y con límites compatibles).
+    """
+    current_price = columns['precio_unitario']
+    lower = np.fmax(current_price * (1 - guardrails['max_cambio']),
+                    columns['precio_base_interno'] * guardrails['piso_precio_base'])
+    upper = np.fmin(current_price * (1 + guardrails['max_cambio']),
+                    columns['competitor_price'] * guardrails['tope_competencia'])
+    applies = np.isfinite(elasticity) & (elasticity != -1) & (lower <= upper)
+    return np.where(elasticity < -1, lower, upper), applies
+
+
+def apply_pricing_rules(df_current_state, rules=PRICING_RULES, elasticities=None, guardrails=ELASTICITY_GUARDRAILS,
+                        velocity=None):
+    """
+    Aplica las reglas de precios de forma columnar sobre el estado actual
+    (una fila por sku-tienda) y construye la tabla de recomendaciones.
+
+    Con `velocity` (tabla de `src.modeling.demand_velocity`) se agregan al estado
+    las sumas móviles, la velocidad de venta y los días de cobertura, que las
+    reglas pueden usar como columnas (ver `build_coverage_rules`).
+
+    Con `elasticities` (tabla de `src.modeling.elasticity`), las filas con una
+    elasticidad confiable reciben en su lugar el precio que maximiza el ingreso
+    dentro de `guardrails` (ver `revenue_maximizing_prices`).
+
+    Un `stock_disponible` nulo (sku-tienda sin registro de inventario) es stock
+    desconocido: no cumple ninguna regla de inventario ni de cobertura y
+    `stock_actual` queda nulo.
+    """
+    if velocity is not None:
+        df_current_state = attach_velocity_features(df_current_state, velocity)
+    # Columnas de la salida más las que usan las reglas.
+    names = ['precio_unitario', 'competitor_price', 'stock_disponible', 'precio_base_interno']
+    names += [rule[key] for rule in rules for key in ('columna', 'referencia', 'precio_base') if rule[key]]
+    columns = {col: _to_float64(df_current_state[col]) for col in dict.fromkeys(names)}
+    recommended_price, reason_codes = evaluate_rules(columns, rules)
+
+    reasons = np.array(
+        [DEFAULT_REASON] + [r['justificacion'] for r in sorted(rules, key=lambda r: r['prioridad'])]
+        + [ELASTICITY_REASON],
+        dtype=object
+    )
+    if elasticities is not None:
+        elasticity = lookup_elasticities(elasticities, df_current_state)
+        optimal_price, applies = revenue_maximizing_prices(columns, elasticity, guardrails)
+        recommended_price = np.where(applies, optimal_price, recommended_price)
+        reason_codes = np.where(applies, np.int8(len(reasons) - 1), reason_codes)
+
+    return pd.DataFrame({
+        'sku': df_current_state['sku'].to_numpy(),
+        'id_tienda': df_current_state['id_tienda'].to_numpy(),
+        'product_name': df_current_state['product_name'].to_numpy(),
+        'precio_actual': _round_prices(columns['precio_unitario']),
+        # Entero con nulos: el stock desconocido se publica vacío, no como un entero inválido.
+        'stock_actual': pd.array(columns['stock_disponible'], dtype='Int32'),
+        'precio_competidor': _round_prices(columns['competitor_price']),
+        'precio_recomendado': _round_prices(recommended_price),
+        'justificacion': reasons[reason_codes],
+    })
+
+
+SHARD_KEYS = ('id_tienda', 'sku')
+
+
+def assign_shards(df_keys, shard_key, num_shards):
+    """
+    Asigna un shard a cada fila del estado actual. Por `id_tienda`, las tiendas se
+    reparten entre los shards equilibrando el número de filas; por `sku`, con un
+    hash estable del SKU (igual en todos los procesos).
+    """
+    if shard_key not in SHARD_KEYS:
+        raise ValueError(f"Llave de shard no soportada: '{shard_key}'. Usa una de {SHARD_KEYS}.")
+    if shard_key == 'id_tienda':
+        loads = np.zeros(num_shards)
+        owner = {}
+        for store, count in df_keys['id_tienda'].value_counts().items():
+            owner[store] = int(loads.argmin())
+            loads[owner[store]] += count
+        return df_keys['id_tienda'].map(owner).to_numpy()
+    sku = pd.Categorical(df_keys['sku'])
+    category_shards = pd.util.hash_array(sku.categories.to_numpy(dtype=object)) % np.uint64(num_shards)
+    return category_shards.astype(np.int64)[sku.codes]
+
+
+# Terminador de fila de las partes: incluye '\n' para que los campos con saltos de
+# línea se sigan entrecomillando igual, y un separador de registro para poder
+# separar las filas sin ambigüedad.
+PART_LINE_TERMINATOR = '\n\x1e'
+
+
+def _recommend_shard(state_base, storage_format, shard_key, values, part_file, rules, elasticities, velocity):
+    # Cada proceso lee solo las filas de su shard y escribe su propia parte ya en CSV,
+    # para que el formateo (la parte más costosa de la salida) también sea paralelo.
+    df_shard = apply_schema(read_table(state_base, storage_format, columns=MODEL_COLUMNS,
+                                       filters=[(shard_key, 'in', values)]))
+    df_part = apply_pricing_rules(df_shard, rules, elasticities, velocity=velocity)
+    df_part.to_csv(part_file, index=False, lineterminator=PART_LINE_TERMINATOR)
+    return df_part[PUBLISHED_COLUMNS]
+
+
+def recommend_prices_sharded(processed_path, output_file, storage_format=None, workers=2,
+                             shard_key='id_tienda', rules=PRICING_RULES, elasticities=None, velocity=None):
+    """
+    Calcula las recomendaciones en paralelo: reparte el estado actual en
+    `workers` shards (ver `assign_shards`), cada proceso aplica las reglas a su
+    shard y escribe una parte, y al final se unen las filas de las partes en el
+    orden original del estado actual. Se verifica que cada parte traiga
+    exactamente las llaves de su shard, así que el archivo es idéntico al de un
+    solo proceso. Regresa las columnas `PUBLISHED_COLUMNS` de las recomendaciones
+    en el orden del estado actual.
+    """
+    state_base = os.path.join(processed_path, CURRENT_STATE_TABLE)
+    df_keys = read_table(state_base, storage_format, columns=CURRENT_STATE_KEYS)
+    shard_of_row = assign_shards(df_keys, shard_key, workers)
+    expected_skus = df_keys['sku'].astype(str).to_numpy()
+    expected_stores = df_keys['id_tienda'].to_numpy()
+
+    parts_dir = os.path.join(os.path.dirname(output_file), f"parts-{uuid.uuid4().hex}")
+    os.makedirs(parts_dir)
+    rows = np.empty(len(df_keys), dtype=object)
+    parts = []
+    header = None
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            shards = []
+            for shard in range(workers):
+                positions = np.flatnonzero(shard_of_row == shard)
+                if len(positions) == 0:
+                    continue
+                values = pd.unique(df_keys[shard_key].to_numpy()[positions]).tolist()
+                part_file = os.path.join(parts_dir, f"part-{shard:05d}.csv")
+                future = executor.submit(_recommend_shard, state_base, storage_format, shard_key,
+                                         values, part_file, rules, elasticities, velocity)
+                shards.append((shard, positions, part_file, future))
+
+            for shard, positions, part_file, future in shards:
+                df_part = future.result()
+                skus, stores = df_part['sku'].astype(str).to_numpy(), df_part['id_tienda'].to_numpy()
+                with open(part_file, 'r', encoding='utf-8', newline='') as f:
+                    records = f.read().split(PART_LINE_TERMINATOR)
+                header, records = records[0], records[1:-1]
+                if (len(records) != len(positions) or not np.array_equal(skus, expected_skus[positions])
+                        or not np.array_equal(stores, expected_stores[positions])):
+                    raise ValueError(f"La parte del shard {shard} no coincide con sus llaves del estado actual.")
+                rows[positions] = records
+                parts.append(df_part.set_axis(positions))
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+    if header is None:
+        raise ValueError("El estado actual está vacío.")
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8', newline='') as f:
+        f.write(os.linesep.join([header, *rows, '']))
+    os.replace(tmp_file, output_file)
+    return pd.concat(parts).sort_index()
+
+
+def _publish_changes(df_recommendations, recommendations_path, storage_format=None):
+    # Conjunto de cambios contra la copia publicada (ver `src.modeling.recommendation_delta`).
+    df_changes = publish_recommendations(df_recommendations, recommendations_path, storage_format)
+    record_metrics(cambios_publicados=len(df_changes),
+                   bytes_escritos=published_size_bytes(recommendations_path, storage_format))
+    counts = df_changes['tipo_cambio'].value_counts()
+    print(f"Cambios contra la publicación anterior: {counts.get('nuevo', 0)} nuevos, "
+          f"{counts.get('modificado', 0)} modificados y {counts.get('eliminado', 0)} eliminados "
+          f"(en '{os.path.join(recommendations_path, CHANGES_FILE)}').")
+
+
+def load_model_inputs(project_root, storage_format=None, use_elasticity=False, use_coverage=False):
+    """
+    Reglas y entradas opcionales del modelo: las elasticidades con
+    `use_elasticity` y la velocidad de demanda (junto con `COVERAGE_RULES`) con
+    `use_coverage`; si una entrada no existe se omite. Regresa (reglas,
+    elasticidades, velocidad). El modelo y el servicio de precios la usan para
+    recomendar los mismos precios.
+    """
+    df_elasticities = None
+    if use_elasticity:
+        try:
+            df_elasticities = load_elasticities(project_root, storage_format)
+            print(f"Usando elasticidades de {int(df_elasticities['confiable'].sum())} grupos confiables.")
+        except FileNotFoundError:
+            print("No existen elasticidades estimadas: se aplican solo las reglas de negocio.")
+    df_velocity = None
+    rules = PRICING_RULES
+    if use_coverage:
+        try:
+            df_velocity = load_demand_velocity(project_root, storage_format)
+            rules = PRICING_RULES + COVERAGE_RULES
+            print(f"Usando días de cobertura de {len(df_velocity)} sku-tienda.")
+        except FileNotFoundError:
+            print("No existe la velocidad de demanda: se omiten las reglas de cobertura.")
+    return rules, df_elasticities, df_velocity
+
+
+def recommend_prices(project_root, storage_format=None, df_current_state=None, workers=1, shard_key='id_tienda',
+                     use_elasticity=False, use_coverage=False):
     """
     Carga la tabla analítica y aplica reglas de negocio para
     generar un nuevo set de precios recomendados, usando la ruta del proyecto.
+    Si la transformación ya entregó el estado actual en memoria (`df_current_state`),
+    se usa directamente sin volver a leerlo del disco.
+
+    Con `workers > 1` el estado actual se procesa en paralelo por shards de
+    `shard_key` (ver `recommend_prices_sharded`); cada proceso lee su shard del disco.
+
+    Con `use_elasticity=True` se usan las elasticidades estimadas por
+    `src.modeling.elasticity` para fijar el precio que maximiza el ingreso
+    dentro de `ELASTICITY_GUARDRAILS` en los grupos con elasticidad confiable.
+
+    Con `use_coverage=True` se agregan las reglas de `COVERAGE_RULES` sobre los
+    días de cobertura calculados por `src.modeling.demand_velocity`.
+
+    Además del archivo completo (escrito de forma atómica), cada ejecución
+    escribe solo los cambios contra las recomendaciones publicadas en la
+    ejecución anterior en `recommended_prices_changes.csv`. Regresa las
+    recomendaciones, o None si falló.
     """
     PROCESSED_PATH = os.path.join(project_root, 'data', 'processed')
     RECOMMENDATIONS_PATH = os.path.join(project_root, 'data', 'recommendations')
@@ -15,63 +428,77 @@ def recommend_prices(project_root):
 
     print("--- Iniciando Fase 4: Modelo de Recomendación de Precios (Basado en Reglas) ---")
 
-    abt_path = os.path.join(PROCESSED_PATH, 'analytical_base_table.csv')
+    abt_base = os.path.join(PROCESSED_PATH, 'analytical_base_table')
+    abt_path = table_path(abt_base, storage_format)
+    output_file = os.path.join(RECOMMENDATIONS_PATH, 'recommended_prices.csv')
+    rules, df_elasticities, df_velocity = load_model_inputs(project_root, storage_format, use_elasticity, use_coverage)
+    if workers > 1:
+        print(f"Aplicando reglas de negocio en {workers} procesos (shards por '{shard_key}')...")
+        try:
+            df_published = recommend_prices_sharded(PROCESSED_PATH, output_file, storage_format, workers,
+                                                    shard_key, rules, df_elasticities, df_velocity)
+        except FileNotFoundError:
+            print("No existe el estado actual materializado: se usa un solo proceso.")
+        except ValueError as e:
+            print(f"Error en la ejecución por shards: {e}")
+            return
+        else:
+            num_rows = len(df_published)
+            record_metrics(filas_entrada=num_rows, filas_salida=num_rows,
+                           bytes_leidos=table_size_bytes(os.path.join(PROCESSED_PATH, CURRENT_STATE_TABLE), storage_format),
+                           bytes_escritos=os.path.getsize(output_file))
+            _publish_changes(df_published, RECOMMENDATIONS_PATH, storage_format)
+            print("\n--- Modelo de Recomendación Completado ---")
+            print(f"{num_rows} recomendaciones de precios guardadas en: '{output_file}'")
+            print("Primeras 5 recomendaciones:")
+            print(pd.read_csv(output_file, nrows=5))
+            return df_published
+
     try:
-        df = pd.read_csv(abt_path)
-        df['fecha'] = pd.to_datetime(df['fecha'])
-        df_current_state = df.sort_values('fecha').groupby(['sku', 'id_tienda']).last().reset_index()
-        print(f"Cargada la tabla analítica con {len(df_current_state)} registros de estado actual.")
+        # El estado actual (última fila por sku-tienda) lo mantiene la transformación;
+        # si no existe, se calcula a partir de toda la historia.
+        if df_current_state is not None:
+            print(f"Recibido en memoria el estado actual con {len(df_current_state)} registros.")
+        else:
+            try:
+                df_current_state = load_current_state(PROCESSED_PATH, storage_format, columns=MODEL_COLUMNS)
+                record_metrics(bytes_leidos=table_size_bytes(os.path.join(PROCESSED_PATH, CURRENT_STATE_TABLE),
+                                                             storage_format))
+            except FileNotFoundError:
+                df = apply_schema(read_table(abt_base, storage_format, columns=MODEL_COLUMNS))
+                df_current_state = df.sort_values('fecha').groupby(['sku', 'id_tienda'], observed=True).last().reset_index()
+                record_metrics(bytes_leidos=table_size_bytes(abt_base, storage_format))
+            print(f"Cargada la tabla analítica con {len(df_current_state)} registros de estado actual.")
     except FileNotFoundError:
         print(f"Error: No se encontró la tabla analítica en '{abt_path}'. Ejecuta el script de transformación primero.")
         return
 
     print("Aplicando reglas de negocio para generar recomendaciones...")
+    df_recommendations = apply_pricing_rules(df_current_state, rules, df_elasticities, velocity=df_velocity)
 
-    recommendations = []
-
-    for _, row in df_current_state.iterrows():
-        current_price = row['precio_unitario']
-        competitor_price = row['competitor_price']
-        stock = row['stock_disponible']
-        base_price = row['precio_base_interno']
-
-        recommended_price = current_price
-        reason = "Mantener Precio Actual"
-
-        if pd.notna(competitor_price) and current_price > (competitor_price * 1.05):
-            recommended_price = competitor_price
-            reason = "Ajuste por Competencia"
-
-        if stock > 50:
-            recommended_price = base_price * 0.95
-            reason = "Descuento por Alto Inventario"
-
-        if stock < 10:
-            recommended_price = base_price * 1.10
-            reason = "Aumento por Bajo Inventario"
-
-        recommendations.append({
-            'sku': row['sku'],
-            'id_tienda': row['id_tienda'],
-            'product_name': row['product_name'],
-            'precio_actual': round(current_price, 2),
-            'stock_actual': int(stock),
-            'precio_competidor': round(competitor_price, 2) if pd.notna(competitor_price) else None,
-            'precio_recomendado': round(recommended_price, 2),
-            'justificacion': reason
-        })
-
-    df_recommendations = pd.DataFrame(recommendations)
-
-    output_file = os.path.join(RECOMMENDATIONS_PATH, 'recommended_prices.csv')
-    df_recommendations.to_csv(output_file, index=False)
+    tmp_file = f"{output_file}.tmp"
+    df_recommendations.to_csv(tmp_file, index=False)
+    os.replace(tmp_file, output_file)
+    record_metrics(filas_entrada=len(df_current_state), filas_salida=len(df_recommendations),
+                   bytes_escritos=os.path.getsize(output_file))
+    _publish_changes(df_recommendations, RECOMMENDATIONS_PATH, storage_format)
 
     print("\n--- Modelo de Recomendación Completado ---")
     print(f"Recomendaciones de precios guardadas en: '{output_file}'")
     print("Primeras 5 recomendaciones:")
     print(df_recommendations.head())
+    return df_recommendations
 
 
 if __name__ == "__main__":
     project_root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    recommend_prices(project_root_path)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Modelo de recomendación de precios.")
+    parser.add_argument('--procesos', type=int, default=1, help="Procesos para la ejecución por shards.")
+    parser.add_argument('--llave-shard', choices=SHARD_KEYS, default='id_tienda')
+    parser.add_argument('--elasticidad', action='store_true',
+                        help="Maximiza el ingreso con las elasticidades estimadas.")
+    parser.add_argument('--cobertura', action='store_true',
+                        help="Agrega las reglas de días de cobertura (velocidad de demanda).")
+    args = parser.parse_args()
+    recommend_prices(project_root_path, workers=args.procesos, shard_key=args.llave_shard,
+                     use_elasticity=args.elasticidad, use_coverage=args.cobertura)
\ No newline at end of file
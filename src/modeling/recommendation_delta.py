@@ -0,0 +1,109 @@
+import os
+import numpy as np
+import pandas as pd
+from src.storage import read_table, write_table, table_size_bytes
+
+
+PUBLISHED_TABLE = 'published_recommendations'
+CHANGES_FILE = 'recommended_prices_changes.csv'
+PUBLISHED_COLUMNS = ['sku', 'id_tienda', 'precio_recomendado', 'justificacion']
+CHANGE_COLUMNS = ['sku', 'id_tienda', 'tipo_cambio', 'precio_anterior', 'precio_recomendado', 'justificacion']
+CHANGE_TYPES = np.array(['nuevo', 'modificado', 'eliminado'], dtype=object)
+
+
+def _keys(sku_codes, stores):
+    # Llave entera (código de sku, id_tienda): con códigos en orden alfabético de
+    # sku, ordenar las llaves equivale a ordenar por (sku, id_tienda).
+    return (sku_codes.astype(np.int64) << 32) | (stores.astype(np.int64) & 0xFFFFFFFF)
+
+
+def load_published(recommendations_path, storage_format=None):
+    """
+    Copia de las últimas recomendaciones publicadas, ordenada por (sku,
+    id_tienda). Regresa None si aún no se ha publicado nada.
+    """
+    try:
+        df = read_table(os.path.join(recommendations_path, PUBLISHED_TABLE), storage_format, columns=PUBLISHED_COLUMNS)
+    except FileNotFoundError:
+        return None
+    return df.astype({'sku': str, 'id_tienda': np.int64, 'justificacion': str})
+
+
+def diff_recommendations(df_previous, df_current):
+    """
+    Compara las recomendaciones nuevas contra la copia publicada (ordenada por
+    llave) con búsquedas binarias sobre llaves enteras, sin merges. Regresa las
+    recomendaciones ordenadas por llave (la nueva copia publicada) y el conjunto
+    de cambios: llaves nuevas, llaves con otro precio recomendado o con otra
+    justificación (aunque el precio sea el mismo) y llaves que ya no están, con
+    el precio anterior, el nuevo y la justificación.
+    """
+    if df_previous is None:
+        df_previous = pd.DataFrame({'sku': pd.Series(dtype=str), 'id_tienda': pd.Series(dtype=np.int64),
+                                    'precio_recomendado': pd.Series(dtype=float),
+                                    'justificacion': pd.Series(dtype=str)})
+    current_skus = df_current['sku'].astype(str).to_numpy(dtype=object)
+    previous_skus = df_previous['sku'].to_numpy(dtype=object)
+    codes, sku_values = pd.factorize(np.concatenate([previous_skus, current_skus]), sort=True)
+    previous_keys = _keys(codes[:len(previous_skus)], df_previous['id_tienda'].to_numpy())
+    current_keys = _keys(codes[len(previous_skus):], df_current['id_tienda'].to_numpy())
+
+    order = np.argsort(current_keys, kind='stable')
+    df_current = df_current[PUBLISHED_COLUMNS].iloc[order].reset_index(drop=True)
+    current_keys = current_keys[order]
+    current_price = df_current['precio_recomendado'].to_numpy(dtype=float)
+    previous_price = df_previous['precio_recomendado'].to_numpy(dtype=float)
+
+    # La copia publicada se guarda ordenada: cada llave nueva se busca con searchsorted.
+    if np.any(previous_keys[1:] <= previous_keys[:-1]):
+        previous_order = np.argsort(previous_keys, kind='stable')
+        df_previous = df_previous.iloc[previous_order]
+        previous_keys, previous_price = previous_keys[previous_order], previous_price[previous_order]
+    found = np.minimum(np.searchsorted(previous_keys, current_keys), len(previous_keys) - 1)
+    matched = np.zeros(len(current_keys), dtype=bool)
+    if len(previous_keys):
+        matched = previous_keys[found] == current_keys
+    old_price = np.full(len(current_keys), np.nan)
+    old_price[matched] = previous_price[found[matched]]
+    same_price = (old_price == current_price) | (matched & np.isnan(old_price) & np.isnan(current_price))
+    current_reason = df_current['justificacion'].to_numpy(dtype=object)
+    same_reason = np.zeros(len(current_keys), dtype=bool)
+    same_reason[matched] = df_previous['justificacion'].to_numpy(dtype=object)[found[matched]] == current_reason[matched]
+    new_or_changed = ~matched | ~same_price | ~same_reason
+    removed = np.ones(len(previous_keys), dtype=bool)
+    removed[found[matched]] = False
+
+    keys = np.concatenate([current_keys[new_or_changed], previous_keys[removed]])
+    df_changes = pd.DataFrame({
+        'sku': sku_values[(keys >> 32).astype(np.int64)],
+        'id_tienda': (keys & 0xFFFFFFFF).astype(np.int64),
+        'tipo_cambio': np.concatenate([CHANGE_TYPES[matched[new_or_changed].astype(int)],
+                                       np.repeat(CHANGE_TYPES[2], removed.sum())]),
+        'precio_anterior': np.concatenate([old_price[new_or_changed], previous_price[removed]]),
+        'precio_recomendado': np.concatenate([current_price[new_or_changed], np.full(removed.sum(), np.nan)]),
+        'justificacion': np.concatenate([current_reason[new_or_changed],
+                                         df_previous['justificacion'].to_numpy(dtype=object)[removed]]),
+    }, columns=CHANGE_COLUMNS)
+    return df_current, df_changes.iloc[np.argsort(keys, kind='stable')].reset_index(drop=True)
+
+
+def publish_recommendations(df_recommendations, recommendations_path, storage_format=None):
+    """
+    Escribe de forma atómica el conjunto de cambios contra la copia publicada
+    (`recommended_prices_changes.csv`) y después reemplaza la copia publicada.
+    Si el proceso se interrumpe antes de actualizar la copia, la siguiente
+    ejecución vuelve a incluir esos cambios. Regresa el conjunto de cambios.
+    """
+    df_published, df_changes = diff_recommendations(load_published(recommendations_path, storage_format),
+                                                    df_recommendations)
+    changes_file = os.path.join(recommendations_path, CHANGES_FILE)
+    tmp_file = f"{changes_file}.tmp"
+    df_changes.to_csv(tmp_file, index=False)
+    os.replace(tmp_file, changes_file)
+    write_table(df_published, os.path.join(recommendations_path, PUBLISHED_TABLE), storage_format)
+    return df_changes
+
+
+def published_size_bytes(recommendations_path, storage_format=None):
+    return (os.path.getsize(os.path.join(recommendations_path, CHANGES_FILE))
+            + table_size_bytes(os.path.join(recommendations_path, PUBLISHED_TABLE), storage_format))
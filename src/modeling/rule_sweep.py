@@ -0,0 +1,201 @@
+import argparse
+import inspect
+import itertools
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from src.modeling.pricing_model import build_pricing_rules, evaluate_rules, _to_float64, MODEL_COLUMNS
+from src.modeling.elasticity import load_elasticities, lookup_elasticities
+from src.processing.current_state import load_current_state
+from src.storage import STORAGE_FORMATS
+
+
+# Parámetros de `build_pricing_rules` que se pueden barrer, con sus valores actuales.
+SWEEP_PARAMETERS = {name: p.default for name, p in inspect.signature(build_pricing_rules).parameters.items()}
+RULE_COLUMNS = ('precio_unitario', 'competitor_price', 'stock_disponible', 'precio_base_interno')
+# Celdas (configuraciones x filas) que se evalúan a la vez; acota la memoria de cada bloque.
+MAX_CELLS = 4_000_000
+MAX_ROWS_PER_BLOCK = 262_144
+# Con más configuraciones que esto (y más de un proceso) el barrido se reparte entre procesos.
+PARALLEL_MIN_CONFIGS = 64
+# Diferencia mínima (medio centavo) para contar un cambio de precio tras el redondeo.
+PRICE_TOLERANCE = 0.005
+
+
+def build_parameter_grid(**values):
+    """
+    Todas las combinaciones de los valores dados para los parámetros de
+    `build_pricing_rules` (los que no se indican conservan su valor actual),
+    una configuración por fila.
+    """
+    unknown = set(values) - set(SWEEP_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Parámetros no soportados: {sorted(unknown)}. Usa {list(SWEEP_PARAMETERS)}.")
+    axes = [np.atleast_1d(values.get(name, default)) for name, default in SWEEP_PARAMETERS.items()]
+    return pd.DataFrame(list(itertools.product(*axes)), columns=list(SWEEP_PARAMETERS))
+
+
+def sweep_columns(df_current_state, elasticities=None):
+    """
+    Arreglos por fila que necesita el barrido: las columnas de las reglas, la
+    demanda base (última cantidad vendida) y la elasticidad de cada fila (0 si
+    no hay una confiable, es decir, demanda fija). Las filas con elasticidad
+    van primero para que el ajuste de la demanda se haga sobre un bloque contiguo.
+    """
+    columns = {col: _to_float64(df_current_state[col]) for col in RULE_COLUMNS}
+    columns['demanda'] = np.nan_to_num(df_current_state['cantidad_vendida'].to_numpy(dtype=float, na_value=0.0))
+    with np.errstate(divide='ignore'):
+        columns['inverso_precio'] = np.nan_to_num(1 / columns['precio_unitario'], posinf=0.0)
+    # Filas donde alguna regla puede proponer un precio NaN (sin precio base o actual).
+    columns['con_nulos'] = np.isnan(columns['precio_unitario']) | np.isnan(columns['precio_base_interno'])
+    elasticity = np.zeros(len(df_current_state)) if elasticities is None \
+        else np.nan_to_num(lookup_elasticities(elasticities, df_current_state), nan=0.0)
+    order = np.argsort(elasticity == 0, kind='stable')
+    columns = {col: values[order] for col, values in columns.items()}
+    columns['elasticidad'] = elasticity[order]
+    columns['filas_elasticas'] = int(np.count_nonzero(elasticity))
+    return columns
+
+
+def _grid_rules(df_grid):
+    # Cada parámetro como columna (configuraciones, 1): las reglas se evalúan con
+    # broadcasting contra las filas (n,) y producen matrices (configuraciones, n).
+    return build_pricing_rules(**{name: df_grid[name].to_numpy(dtype=float)[:, None] for name in SWEEP_PARAMETERS})
+
+
+def evaluate_grid(columns, df_grid):
+    """
+    KPIs de cada configuración de `df_grid` sobre las filas de `columns` (ver
+    `sweep_columns`), evaluando bloques de configuraciones x filas con
+    broadcasting. El ingreso proyectado usa la demanda base ajustada por
+    `(precio nuevo / precio actual) ^ elasticidad`; el descuento promedio es la
+    reducción relativa media de las filas cuyo precio baja.
+    """
+    num_rows = len(columns['precio_unitario'])
+    num_configs = len(df_grid)
+    revenue = np.zeros(num_configs)
+    changes = np.zeros(num_configs, dtype=np.int64)
+    discounted = np.zeros(num_configs, dtype=np.int64)
+    discount_sum = np.zeros(num_configs)
+
+    row_block = max(1, min(num_rows, MAX_ROWS_PER_BLOCK))
+    config_block = max(1, MAX_CELLS // row_block)
+    elastic_rows = columns['filas_elasticas']
+    for config_start in range(0, num_configs, config_block):
+        configs = slice(config_start, config_start + config_block)
+        rules = _grid_rules(df_grid.iloc[configs])
+        for row_start in range(0, num_rows, row_block):
+            rows = slice(row_start, row_start + row_block)
+            block = {col: columns[col][rows] for col in RULE_COLUMNS}
+            current_price = block['precio_unitario']
+            demand = columns['demanda'][rows]
+            new_price, _ = evaluate_rules(block, rules)
+            new_price = np.broadcast_to(new_price, (len(rules[0]['umbral']), len(current_price)))
+            # Los precios NaN no suman al ingreso (ni cuentan como cambio o descuento).
+            priced = np.nan_to_num(new_price) if columns['con_nulos'][rows].any() else new_price
+
+            # Filas sin elasticidad: ingreso = precio x demanda base (producto matricial).
+            elastic = max(0, min(elastic_rows - row_start, len(current_price)))
+            revenue[configs] += priced[:, elastic:] @ demand[elastic:]
+            if elastic:
+                ratio = new_price[:, :elastic] / current_price[:elastic]
+                units = demand[:elastic] * ratio ** columns['elasticidad'][rows][:elastic]
+                revenue[configs] += np.nansum(new_price[:, :elastic] * units, axis=1)
+
+            difference = new_price - current_price
+            changes[configs] += np.count_nonzero(np.abs(difference) >= PRICE_TOLERANCE, axis=1)
+            lowered = difference <= -PRICE_TOLERANCE
+            discounted[configs] += np.count_nonzero(lowered, axis=1)
+            discount_sum[configs] += np.where(lowered, -difference, 0.0) @ columns['inverso_precio'][rows]
+
+    current_revenue = np.nansum(columns['precio_unitario'] * columns['demanda'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return pd.DataFrame({
+            'ingreso_proyectado': revenue,
+            'variacion_ingreso': revenue / current_revenue - 1,
+            'cambios_precio': changes,
+            'descuento_promedio': np.where(discounted > 0, discount_sum / discounted, 0.0),
+        }, index=df_grid.index)
+
+
+_WORKER_COLUMNS = None
+
+
+def _init_worker(columns):
+    # Cada proceso recibe las columnas una sola vez, no con cada bloque de configuraciones.
+    global _WORKER_COLUMNS
+    _WORKER_COLUMNS = columns
+
+
+def _evaluate_chunk(df_grid):
+    return evaluate_grid(_WORKER_COLUMNS, df_grid)
+
+
+def sweep_pricing_rules(df_current_state, df_grid, elasticities=None, workers=None):
+    """
+    Evalúa todas las configuraciones de `df_grid` (ver `build_parameter_grid`)
+    contra el estado actual y regresa la rejilla con sus KPIs: ingreso
+    proyectado, variación contra el ingreso actual, número de cambios de precio
+    y descuento promedio. Con `elasticities` la demanda responde al precio.
+
+    Con más de `PARALLEL_MIN_CONFIGS` configuraciones y `workers > 1` (por
+    defecto, un proceso por núcleo) la rejilla se reparte en bloques entre procesos.
+    """
+    df_grid = df_grid.reset_index(drop=True)
+    columns = sweep_columns(df_current_state, elasticities)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(df_grid) <= PARALLEL_MIN_CONFIGS:
+        df_kpis = evaluate_grid(columns, df_grid)
+    else:
+        chunks = np.array_split(np.arange(len(df_grid)), workers * 4)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(columns,)) as executor:
+            parts = executor.map(_evaluate_chunk, [df_grid.iloc[chunk] for chunk in chunks if len(chunk)])
+            df_kpis = pd.concat(list(parts))
+    return pd.concat([df_grid, df_kpis], axis=1)
+
+
+def run_sweep(project_root, df_grid, storage_format=None, use_elasticity=False, workers=None):
+    """
+    Carga el estado actual, evalúa la rejilla de parámetros y guarda el resultado
+    en `data/recommendations/rule_sweep.csv`, ordenado por ingreso proyectado.
+    """
+    PROCESSED_PATH = os.path.join(project_root, 'data', 'processed')
+    RECOMMENDATIONS_PATH = os.path.join(project_root, 'data', 'recommendations')
+    os.makedirs(RECOMMENDATIONS_PATH, exist_ok=True)
+
+    print(f"--- Barrido de parámetros de las reglas de precios ({len(df_grid)} configuraciones) ---")
+    try:
+        df_state = load_current_state(PROCESSED_PATH, storage_format, columns=MODEL_COLUMNS + ['cantidad_vendida'])
+    except FileNotFoundError:
+        print("Error: No existe el estado actual. Ejecuta la transformación primero.")
+        return None
+    elasticities = None
+    if use_elasticity:
+        try:
+            elasticities = load_elasticities(project_root, storage_format)
+        except FileNotFoundError:
+            print("No existen elasticidades estimadas: se supone demanda fija.")
+
+    df_results = sweep_pricing_rules(df_state, df_grid, elasticities, workers)
+    df_results = df_results.sort_values('ingreso_proyectado', ascending=False, kind='stable')
+    output_file = os.path.join(RECOMMENDATIONS_PATH, 'rule_sweep.csv')
+    df_results.to_csv(output_file, index=False)
+
+    print(f"Resultados del barrido guardados en: '{output_file}'")
+    print("Mejores 5 configuraciones por ingreso proyectado:")
+    print(df_results.head())
+    return df_results
+
+
+if __name__ == "__main__":
+    project_root_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser = argparse.ArgumentParser(description="Barrido de parámetros de las reglas de precios.")
+    for name, default in SWEEP_PARAMETERS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float, nargs='+', default=[default])
+    parser.add_argument('--elasticidad', action='store_true', help="La demanda responde a la elasticidad estimada.")
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos (por defecto, uno por núcleo).")
+    parser.add_argument('--formato', choices=STORAGE_FORMATS, default=None)
+    args = parser.parse_args()
+    grid = build_parameter_grid(**{name: getattr(args, name) for name in SWEEP_PARAMETERS})
+    run_sweep(project_root_path, grid, args.formato, args.elasticidad, args.procesos)
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from src.storage import file_checksum, file_fingerprint
+
+
+PIPELINE_STATE_FILE = 'pipeline_state.json'
+
+
+def _load_state(state_path):
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {'etapas': {}, 'artefactos': {}}
+
+
+def _save_state(state, state_path):
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, state_path)
+
+
+def artifact_hash(path, known_hashes):
+    """
+    Hash del contenido de un artefacto (archivo o directorio de tabla). Solo se
+    vuelve a leer el contenido cuando cambia su huella (tamaños y fechas de
+    modificación); si no, se reutiliza el hash guardado en `known_hashes`.
+    Regresa None si el artefacto no existe.
+    """
+    if not os.path.exists(path):
+        return None
+    fingerprint = file_fingerprint(path)
+    known = known_hashes.get(path)
+    if known and known['huella'] == fingerprint:
+        return known['hash']
+    content = file_checksum(path)
+    known_hashes[path] = {'huella': fingerprint, 'hash': content}
+    return content
+
+
+def stage_key(stage, known_hashes):
+    """
+    Clave de caché de una etapa: hash de su código, de sus parámetros y del
+    contenido de sus entradas. Si la clave no cambia, tampoco cambian sus salidas.
+    """
+    digest = hashlib.sha256(stage['nombre'].encode())
+    for path in stage.get('codigo', []):
+        digest.update(f"codigo:{os.path.basename(path)}:{artifact_hash(path, known_hashes)}".encode())
+    digest.update(f"parametros:{json.dumps(stage.get('parametros', {}), sort_keys=True, default=str)}".encode())
+    for path in stage['entradas']:
+        digest.update(f"entrada:{path}:{artifact_hash(path, known_hashes)}".encode())
+    return digest.hexdigest()
+
+
+def downstream_stages(stages, start):
+    """
+    Nombres de la etapa `start` y de todas las que dependen de ella, directa o indirectamente.
+    """
+    selected = {start}
+    changed = True
+    while changed:
+        changed = False
+        for stage in stages:
+            if stage['nombre'] not in selected and selected.intersection(stage['depende_de']):
+                selected.add(stage['nombre'])
+                changed = True
+    return selected
+
+
+def run_stages(stages, state_path, start=None, force=False, max_workers=None, stage_wrapper=None, only=None):
+    """
+    Ejecuta las etapas como un DAG. Cada etapa declara sus dependencias, sus
+    artefactos de entrada y de salida y los archivos de código de los que depende.
+    Una etapa se omite si su clave (ver `stage_key`) coincide con la de la última
+    ejecución y sus salidas siguen existiendo. Las etapas cuyas dependencias ya
+    terminaron se ejecutan en paralelo.
+
+    Una etapa falla si lanza una excepción, si su función regresa None (la
+    convención de las etapas al fallar) o si no genera sus salidas; su clave
+    solo se guarda tras una ejecución exitosa, así que una etapa fallida se
+    vuelve a ejecutar en la siguiente corrida.
+
+    Una etapa puede recibir en memoria lo que regresó otra (`recibe`:
+    {argumento: etapa}) si esa etapa se ejecutó en esta misma corrida; si se
+    omitió, la etapa lee sus entradas del disco como siempre.
+
+    `stage_wrapper(nombre)`, si se indica, regresa un context manager que envuelve
+    cada etapa ejecutada (ej. `src.orchestration.metrics.stage_metrics`).
+
+    Con `start` solo se ejecutan esa etapa (siempre, sin caché) y las que dependen
+    de ella; con `only` se ejecutan exactamente esas etapas (siempre, sin caché),
+    leyendo del disco las salidas de las etapas no seleccionadas. Con `force` se
+    ignora la caché en todas. Regresa un diccionario
+    {etapa: 'ejecutada' | 'omitida' | 'fallida' | 'cancelada'}.
+    """
+    names = {stage['nombre'] for stage in stages}
+    unknown = sorted(({start} if start is not None else set()).union(only or []) - names)
+    if unknown:
+        raise ValueError(f"Etapa desconocida: {unknown}. Opciones: {sorted(names)}")
+    if only:
+        selected = set(only)
+    else:
+        selected = downstream_stages(stages, start) if start is not None else names
+
+    state = _load_state(state_path)
+    lock = threading.Lock()
+    # Solo se conservan los resultados que alguna etapa recibe en memoria.
+    consumed = {source for stage in stages for source in stage.get('recibe', {}).values()}
+    handoff = {}
+
+    def run_stage(stage):
+        with lock:
+            key = stage_key(stage, state['artefactos'])
+            previous = state['etapas'].get(stage['nombre'], {})
+        forced = force or stage['nombre'] == start or stage['nombre'] in (only or ())
+        if not forced and previous.get('clave') == key and all(os.path.exists(p) for p in stage['salidas']):
+            print(f"\n[OMITIDO] {stage['descripcion']}: entradas y código sin cambios.")
+            return 'omitida'
+
+        print(f"\n[PASO] Ejecutando {stage['descripcion']}...")
+        kwargs = {arg: handoff[source] for arg, source in stage.get('recibe', {}).items()
+                  if handoff.get(source) is not None}
+        with stage_wrapper(stage['nombre']) if stage_wrapper else nullcontext():
+            output = stage['funcion'](**kwargs)
+        # Las funciones de etapa imprimen el error y regresan None cuando fallan: la
+        # etapa no se guarda en la caché aunque queden salidas de una ejecución anterior.
+        if output is None:
+            print(f"Error: {stage['descripcion']} no terminó correctamente.")
+            return 'fallida'
+        if stage['nombre'] in consumed:
+            handoff[stage['nombre']] = output
+
+        missing = [p for p in stage['salidas'] if not os.path.exists(p)]
+        if missing:
+            print(f"Error: {stage['descripcion']} no generó {missing}.")
+            return 'fallida'
+        with lock:
+            for path in stage['salidas']:
+                artifact_hash(path, state['artefactos'])
+            state['etapas'][stage['nombre']] = {'clave': key}
+            _save_state(state, state_path)
+        return 'ejecutada'
+
+    by_name = {stage['nombre']: stage for stage in stages}
+
+    def blocks_dependents(name):
+        # Una etapa fallida no detiene a las siguientes si quedan sus salidas de la
+        # ejecución anterior (igual que el generador continúa sin datos actualizados).
+        if results[name] == 'cancelada':
+            return True
+        return results[name] == 'fallida' and not all(os.path.exists(p) for p in by_name[name]['salidas'])
+
+    results = {}
+    pending = [stage for stage in stages if stage['nombre'] in selected]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        while pending or running:
+            for stage in list(pending):
+                deps = [d for d in stage['depende_de'] if d in selected]
+                if any(d in results and blocks_dependents(d) for d in deps):
+                    print(f"\n[CANCELADO] {stage['descripcion']}: falló una etapa de la que depende.")
+                    results[stage['nombre']] = 'cancelada'
+                    pending.remove(stage)
+                elif all(d in results for d in deps):
+                    running[executor.submit(run_stage, stage)] = stage['nombre']
+                    pending.remove(stage)
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    print(f"Error en la etapa '{name}': {e}")
+                    results[name] = 'fallida'
+                if results[name] == 'fallida' and not blocks_dependents(name):
+                    print(f"ADVERTENCIA: se usarán las salidas anteriores de '{name}'.")
+    return results
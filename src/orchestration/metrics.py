@@ -0,0 +1,152 @@
+import contextvars
+import cProfile
+import json
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+
+METRICS_FILE = 'metrics.jsonl'
+PROMETHEUS_FILE = 'pipeline.prom'
+PROFILES_DIR = 'profiles'
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+TRACEMALLOC_TOP = 50
+
+# Campo del evento -> (métrica de Prometheus, ayuda, factor de conversión).
+PROMETHEUS_METRICS = {
+    'segundos': ('pipeline_stage_wall_seconds', 'Tiempo de reloj de la etapa.', 1),
+    'cpu_segundos': ('pipeline_stage_cpu_seconds', 'Tiempo de CPU del proceso y sus hijos durante la etapa.', 1),
+    'filas_entrada': ('pipeline_stage_rows_in', 'Filas leídas por la etapa.', 1),
+    'filas_salida': ('pipeline_stage_rows_out', 'Filas escritas por la etapa.', 1),
+    'bytes_leidos': ('pipeline_stage_bytes_read', 'Bytes leídos del disco por la etapa.', 1),
+    'bytes_escritos': ('pipeline_stage_bytes_written', 'Bytes escritos al disco por la etapa.', 1),
+    'cambios_publicados': ('pipeline_stage_published_changes', 'Recomendaciones nuevas, modificadas o eliminadas.', 1),
+    'rss_max_mb': ('pipeline_stage_peak_rss_bytes', 'RSS máximo del proceso al terminar la etapa.', 1024 ** 2),
+    'timestamp': ('pipeline_stage_last_run_timestamp_seconds', 'Hora de fin de la última ejecución.', 1),
+}
+
+_current_event = contextvars.ContextVar('current_stage_event', default=None)
+_lock = threading.Lock()
+_latest_events = {}
+
+
+def record_metrics(**values):
+    """
+    Suma valores (filas, bytes) al evento de la etapa en curso. Fuera de una
+    etapa instrumentada con `stage_metrics` no hace nada, así que las funciones
+    de cada etapa pueden llamarla siempre.
+    """
+    event = _current_event.get()
+    if event is None:
+        return
+    for key, value in values.items():
+        if value is not None:
+            event[key] = event.get(key, 0) + int(value)
+
+
+def _peak_rss_mb():
+    # En Linux `ru_maxrss` viene en KB.
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _write_prometheus(metrics_dir):
+    lines = []
+    for field, (name, help_text, factor) in PROMETHEUS_METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for stage, event in sorted(_latest_events.items()):
+            if event.get(field) is not None:
+                lines.append(f'{name}{{stage="{stage}"}} {event[field] * factor:g}')
+    # Escritura atómica: el colector de textfile nunca debe leer un archivo a medias.
+    prom_file = os.path.join(metrics_dir, PROMETHEUS_FILE)
+    tmp_file = f"{prom_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp_file, prom_file)
+
+
+def write_event(event, metrics_dir):
+    """
+    Agrega el evento al archivo JSON-lines y actualiza el textfile de Prometheus
+    con el último evento de cada etapa.
+    """
+    os.makedirs(metrics_dir, exist_ok=True)
+    with _lock:
+        with open(os.path.join(metrics_dir, METRICS_FILE), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(event, ensure_ascii=False) + '\n')
+        _latest_events[event['etapa']] = event
+        _write_prometheus(metrics_dir)
+
+
+def _save_tracemalloc(snapshot, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for stat in snapshot.statistics('lineno')[:TRACEMALLOC_TOP]:
+            f.write(f"{stat}\n")
+
+
+@contextmanager
+def stage_metrics(stage, metrics_dir, profile=None):
+    """
+    Mide una etapa y emite un evento estructurado al terminar (también si falla):
+    tiempo de reloj y de CPU, filas y bytes (reportados por la etapa con
+    `record_metrics`) y RSS máximo. Con `profile='cprofile'` o `'tracemalloc'`
+    guarda además el perfil de la etapa en `metrics_dir/profiles/`.
+
+    El tiempo de CPU y el RSS son del proceso completo: si se ejecutan etapas en
+    paralelo, incluyen el trabajo de las demás. tracemalloc es global al proceso.
+    """
+    if profile is not None and profile not in PROFILE_MODES:
+        raise ValueError(f"Modo de perfil no soportado: '{profile}'. Usa uno de {PROFILE_MODES}.")
+    event = {
+        'etapa': stage,
+        'inicio': datetime.now().isoformat(timespec='seconds'),
+        'filas_entrada': 0, 'filas_salida': 0, 'bytes_leidos': 0, 'bytes_escritos': 0,
+    }
+    token = _current_event.set(event)
+
+    profiler = None
+    if profile == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif profile == 'tracemalloc':
+        tracemalloc.start()
+
+    start_wall, start_cpu, start_children = time.perf_counter(), time.process_time(), _children_cpu()
+    try:
+        yield event
+    except Exception as e:
+        event['error'] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        event['segundos'] = round(time.perf_counter() - start_wall, 3)
+        event['cpu_segundos'] = round(time.process_time() - start_cpu + _children_cpu() - start_children, 3)
+        event['rss_max_mb'] = _peak_rss_mb()
+        event['timestamp'] = round(time.time(), 3)
+        _current_event.reset(token)
+
+        if profile is not None:
+            profiles_dir = os.path.join(metrics_dir, PROFILES_DIR)
+            os.makedirs(profiles_dir, exist_ok=True)
+            stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+            if profiler is not None:
+                profiler.disable()
+                event['perfil'] = os.path.join(profiles_dir, f"{stage}-{stamp}.prof")
+                profiler.dump_stats(event['perfil'])
+            else:
+                _, peak = tracemalloc.get_traced_memory()
+                snapshot = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+                event['tracemalloc_pico_mb'] = round(peak / 1024 ** 2, 1)
+                event['perfil'] = os.path.join(profiles_dir, f"{stage}-{stamp}.tracemalloc.txt")
+                _save_tracemalloc(snapshot, event['perfil'])
+
+        write_event(event, metrics_dir)
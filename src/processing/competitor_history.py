@@ -0,0 +1,244 @@
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+from src.storage import read_table, write_table, table_path
+from src.utils import parse_prices
+
+
+COMPETITOR_HISTORY_TABLE = 'competitor_price_history'
+# Último registro del historial por producto: los agregados solo se comparan contra él.
+COMPETITOR_LATEST_TABLE = 'competitor_price_latest'
+COMPETITOR_SNAPSHOT_FILE = 'suburbia_products.json'
+# Productos nuevos o con cambio de precio en la última extracción (ver el scraper).
+COMPETITOR_DELTA_FILE = 'suburbia_products_delta.json'
+HISTORY_COLUMNS = ['sku_competidor', 'fecha_extraccion', 'competitor_price']
+# Cada agregado escribe un fragmento nuevo; con más fragmentos que este límite
+# el historial se reescribe ordenado en uno solo (compactación).
+HISTORY_MAX_FRAGMENTS = 64
+# Desplazamiento para que los días (desde 1970) quepan en 32 bits sin signo.
+_DAY_OFFSET = 1 << 31
+
+
+def history_base(project_root):
+    return os.path.join(project_root, 'data', 'scraped_data', COMPETITOR_HISTORY_TABLE)
+
+
+def latest_base(project_root):
+    return os.path.join(project_root, 'data', 'scraped_data', COMPETITOR_LATEST_TABLE)
+
+
+def _snapshot_prices(df_competitor_raw):
+    return pd.DataFrame({
+        'sku_competidor': df_competitor_raw['sku_competidor'].astype(str),
+        'fecha_extraccion': pd.to_datetime(df_competitor_raw['fecha_extraccion']),
+        'competitor_price': parse_prices(df_competitor_raw['precio_descuento']),
+    }, columns=HISTORY_COLUMNS)
+
+
+def load_snapshot_prices(project_root):
+    """
+    Precios de la última extracción (`sku_competidor`, `competitor_price`): la
+    fuente del `competitor_price` del estado actual en la transformación y en el
+    servicio de precios.
+    """
+    df_raw = pd.read_json(os.path.join(project_root, 'data', 'scraped_data', COMPETITOR_SNAPSHOT_FILE))
+    return pd.DataFrame({
+        'sku_competidor': df_raw['sku_competidor'],
+        'competitor_price': parse_prices(df_raw['precio_descuento']),
+    })
+
+
+def _empty_history():
+    return pd.DataFrame({'sku_competidor': pd.Series(dtype=object),
+                         'fecha_extraccion': pd.Series(dtype='datetime64[ns]'),
+                         'competitor_price': pd.Series(dtype=float)})
+
+
+def _read_history_table(base, storage_format):
+    df = read_table(base, storage_format, columns=HISTORY_COLUMNS)
+    df['sku_competidor'] = df['sku_competidor'].astype(str)
+    df['fecha_extraccion'] = pd.to_datetime(df['fecha_extraccion'])
+    return df
+
+
+def load_history(project_root, storage_format=None):
+    """
+    Historial de precios de la competencia ordenado por `sku_competidor` y
+    `fecha_extraccion`. Regresa una tabla vacía si aún no existe.
+    """
+    try:
+        df_history = _read_history_table(history_base(project_root), storage_format)
+    except FileNotFoundError:
+        return _empty_history()
+    # Cada fragmento viene ordenado; el ordenamiento estable solo intercala los fragmentos.
+    return df_history.sort_values(['sku_competidor', 'fecha_extraccion'], kind='stable').reset_index(drop=True)
+
+
+def _latest_prices(df_history):
+    # El historial está ordenado: la última fila de cada producto es la más reciente.
+    return df_history.drop_duplicates('sku_competidor', keep='last').reset_index(drop=True)
+
+
+def load_latest(project_root, storage_format=None):
+    """
+    Último registro del historial de cada producto. Se lee de una tabla pequeña
+    que mantiene `append_history`; si falta o es anterior al historial (por
+    ejemplo, tras una interrupción entre ambas escrituras), se reconstruye del historial.
+    """
+    history_path = table_path(history_base(project_root), storage_format)
+    if not os.path.exists(history_path):
+        return _empty_history()
+    path = table_path(latest_base(project_root), storage_format)
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(history_path):
+        return _read_history_table(latest_base(project_root), storage_format)
+    df_latest = _latest_prices(load_history(project_root, storage_format))
+    write_table(df_latest, latest_base(project_root), storage_format)
+    return df_latest
+
+
+def _same_price(prices, previous):
+    return (prices == previous) | (prices.isna() & previous.isna())
+
+
+def _late_changes(project_root, df_late, storage_format):
+    """
+    Filas de una extracción atrasada (anterior al último registro de su
+    producto) que cambian el precio vigente en su fecha. Solo se lee el
+    historial de esos productos.
+    """
+    df_history = load_history(project_root, storage_format)
+    df_history = df_history[df_history['sku_competidor'].isin(df_late['sku_competidor'])]
+    # Las filas ya registradas (misma llave) prevalecen sobre las de la extracción.
+    df_all = pd.concat([df_history.assign(nueva=False), df_late.assign(nueva=True)], ignore_index=True)
+    df_all = df_all.sort_values(['sku_competidor', 'fecha_extraccion'], kind='stable')
+    df_all = df_all.drop_duplicates(['sku_competidor', 'fecha_extraccion'], keep='first')
+    previous = df_all.groupby('sku_competidor')['competitor_price'].shift()
+    first = ~df_all['sku_competidor'].duplicated()
+    return df_all.loc[df_all['nueva'] & (first | ~_same_price(df_all['competitor_price'], previous)), HISTORY_COLUMNS]
+
+
+def append_history(project_root, df_competitor_raw, storage_format=None):
+    """
+    Agrega al historial los precios de una extracción. Solo se guardan los
+    cambios: el primer precio de cada producto y los precios distintos al
+    vigente en su `fecha_extraccion`. Cada precio se compara solo contra el
+    último registro de su producto (ver `load_latest`), sin leer el historial;
+    una extracción atrasada lee el historial de sus productos y se intercala en
+    su fecha. Las filas nuevas se escriben ordenadas como un fragmento aparte,
+    sin reescribir el historial. Regresa el número de filas agregadas.
+    """
+    df_new = _snapshot_prices(df_competitor_raw).drop_duplicates('sku_competidor', keep='last')
+    df_latest = load_latest(project_root, storage_format)
+    merged = df_new.merge(df_latest, on='sku_competidor', how='left', suffixes=('', '_ultimo'))
+
+    known = merged['fecha_extraccion_ultimo'].notna()
+    later = ~known | (merged['fecha_extraccion'] > merged['fecha_extraccion_ultimo'])
+    late = known & (merged['fecha_extraccion'] < merged['fecha_extraccion_ultimo'])
+    changed = later & ~(known & _same_price(merged['competitor_price'], merged['competitor_price_ultimo']))
+    df_added = merged.loc[changed, HISTORY_COLUMNS]
+    if late.any():
+        df_added = pd.concat([df_added, _late_changes(project_root, merged.loc[late, HISTORY_COLUMNS],
+                                                      storage_format)], ignore_index=True)
+    if df_added.empty:
+        return 0
+
+    base = history_base(project_root)
+    write_table(df_added.sort_values(['sku_competidor', 'fecha_extraccion'], kind='stable'),
+                base, storage_format, append=True)
+    path = table_path(base, storage_format)
+    if os.path.isdir(path) and len(os.listdir(path)) > HISTORY_MAX_FRAGMENTS:
+        print(f"Compactando el historial de precios de la competencia ({len(os.listdir(path))} fragmentos)...")
+        write_table(load_history(project_root, storage_format), base, storage_format)
+
+    # El último registro solo cambia para los productos con filas posteriores a él.
+    df_latest = pd.concat([df_latest, merged.loc[changed, HISTORY_COLUMNS]], ignore_index=True)
+    df_latest = df_latest.drop_duplicates('sku_competidor', keep='last').sort_values('sku_competidor')
+    write_table(df_latest, latest_base(project_root), storage_format)
+    return len(df_added)
+
+
+def sync_history(project_root, storage_format=None):
+    """
+    Incorpora al historial la última extracción. Si ya hay historial y la delta
+    del scraper (`suburbia_products_delta.json`) es al menos tan reciente como la
+    foto completa, solo se procesan sus productos; si no, la foto completa. Es
+    idempotente: volver a agregar la misma extracción no agrega filas.
+    """
+    scraped_path = os.path.join(project_root, 'data', 'scraped_data')
+    competitor_file = os.path.join(scraped_path, COMPETITOR_SNAPSHOT_FILE)
+    delta_file = os.path.join(scraped_path, COMPETITOR_DELTA_FILE)
+    if (os.path.exists(table_path(history_base(project_root), storage_format)) and os.path.exists(delta_file)
+            and os.path.getmtime(delta_file) >= os.path.getmtime(competitor_file)):
+        competitor_file = delta_file
+    df_competitor_raw = pd.read_json(competitor_file)
+    if df_competitor_raw.empty:
+        return 0
+    added = append_history(project_root, df_competitor_raw, storage_format)
+    if added:
+        print(f"Historial de precios de la competencia: {added} cambios de precio agregados.")
+    return added
+
+
+def _days(fechas):
+    return pd.to_datetime(fechas).to_numpy().astype('datetime64[D]').astype(np.int64) + _DAY_OFFSET
+
+
+def build_asof_index(df_history, competitor_skus):
+    """
+    Índice para búsquedas as-of: llaves (producto, día) ordenadas del historial y,
+    para cada posición de `competitor_skus`, el código de su producto en el
+    historial (-1 si no tiene historial). Se agrega un -1 al final para la
+    posición -1 (sin producto).
+    """
+    # El historial está ordenado por sku_competidor: los códigos quedan en orden.
+    codes, uniques = pd.factorize(df_history['sku_competidor'], sort=True)
+    return {
+        'keys': (codes.astype(np.int64) << 32) | _days(df_history['fecha_extraccion']),
+        'price': df_history['competitor_price'].to_numpy(dtype=float),
+        'codes': np.append(pd.Index(uniques).get_indexer(pd.Index(competitor_skus)), -1),
+    }
+
+
+def asof_prices(asof_index, positions, fechas):
+    """
+    Precio vigente en cada `fecha` (el último extraído ese día o antes) para el
+    producto en cada posición de `positions`, con búsqueda binaria sobre las
+    llaves ordenadas. NaN si no hay un precio extraído hasta esa fecha.
+    """
+    codes = asof_index['codes'][positions]
+    keys = asof_index['keys']
+    if len(keys) == 0:
+        return np.full(len(codes), np.nan)
+    # Se buscan las llaves distintas ya ordenadas: la búsqueda binaria recorre el
+    # arreglo en orden en lugar de saltar al azar, y las ventas repiten llaves.
+    query, inverse = np.unique((codes.astype(np.int64) << 32) | _days(fechas), return_inverse=True)
+    found = np.searchsorted(keys, query, side='right')[inverse] - 1
+    safe = np.maximum(found, 0)
+    # La llave encontrada debe ser del mismo producto (si no, no hay precio hasta esa fecha).
+    valid = (codes >= 0) & (found >= 0) & ((keys[safe] >> 32) == codes)
+    return np.where(valid, asof_index['price'][safe], np.nan)
+
+
+def prices_as_of(df_history, fecha=None):
+    """
+    Precio de cada producto de la competencia vigente en `fecha` (o el último
+    registrado si no se indica), como una serie indexada por `sku_competidor`.
+    """
+    skus = df_history['sku_competidor'].drop_duplicates()
+    fecha = pd.Timestamp.max.normalize() if fecha is None else pd.Timestamp(fecha)
+    index = build_asof_index(df_history, skus)
+    prices = asof_prices(index, np.arange(len(skus)), np.full(len(skus), fecha.to_datetime64()))
+    return pd.Series(prices, index=skus.to_numpy(), name='competitor_price')
+
+
+def history_checksum(df_history, until):
+    """
+    Hash de las filas del historial extraídas hasta el día `until` (inclusive).
+    Si no cambia, las filas de la tabla analítica hasta esa fecha siguen vigentes.
+    """
+    if until is None:
+        return None
+    rows = df_history[df_history['fecha_extraccion'].dt.normalize() <= pd.Timestamp(until)]
+    hashes = pd.util.hash_pandas_object(rows, index=False).to_numpy()
+    return hashlib.sha256(hashes.tobytes()).hexdigest()
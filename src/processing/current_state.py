@@ -0,0 +1,38 @@
+import os
+import pandas as pd
+from src.storage import read_table, write_table
+from src.processing.schema import apply_schema
+
+
+CURRENT_STATE_KEYS = ['sku', 'id_tienda']
+CURRENT_STATE_TABLE = 'current_state'
+
+
+def merge_current_state(df_state, df_new_rows):
+    """
+    Incorpora filas nuevas de la tabla analítica al estado actual (una fila por
+    sku-tienda). Equivale a `sort_values('fecha').groupby(llaves).last()` sobre
+    toda la historia, pero solo procesa el estado vigente y las filas nuevas.
+    """
+    if df_state is None or df_state.empty:
+        combined = df_new_rows
+    else:
+        combined = pd.concat([df_state, df_new_rows[df_state.columns]], ignore_index=True)
+    # Si los bloques traen categorías distintas, `concat` las deja como texto.
+    state = combined.sort_values('fecha', kind='stable').groupby(CURRENT_STATE_KEYS, observed=True).last()
+    return apply_schema(state.reset_index())
+
+
+def load_current_state(processed_path, storage_format=None, columns=None):
+    """
+    Carga el estado actual materializado con los tipos de `ANALYTICAL_SCHEMA`.
+    Lanza FileNotFoundError si no existe.
+    """
+    return apply_schema(read_table(os.path.join(processed_path, CURRENT_STATE_TABLE), storage_format, columns=columns))
+
+
+def save_current_state(df_state, processed_path, storage_format=None):
+    """
+    Reemplaza el estado actual en disco de forma atómica.
+    """
+    return write_table(df_state, os.path.join(processed_path, CURRENT_STATE_TABLE), storage_format)
@@ -1,13 +1,149 @@
+import argparse
 import pandas as pd
+import numpy as np
 import os
-import json
-from src.utils import clean_and_parse_price
+import uuid
+from pandas.api.extensions import take
+from src.utils import read_json, write_json
+from src.storage import (read_table, iter_table, write_table_stream, table_path, table_exists,
+                         table_size_bytes, file_checksum, file_fingerprint, STORAGE_FORMATS)
+from src.processing.current_state import (merge_current_state, load_current_state, save_current_state,
+                                          CURRENT_STATE_TABLE)
+from src.processing.schema import apply_schema
+from src.processing.product_matching import best_competitor_skus, load_matches, MATCH_TABLE
+from src.processing.competitor_history import (load_snapshot_prices, sync_history, load_history, history_base,
+                                               history_checksum, build_asof_index, asof_prices)
+from src.orchestration.metrics import record_metrics
 
 
-def transform_data(project_root):
+WATERMARK_FILE = 'analytical_base_table_watermark.json'
+# Ventas por bloque en el modo streaming que usan el pipeline y la CLI.
+CHUNK_SIZE = 1_000_000
+
+
+ANALYTICAL_COLUMNS = [
+    'fecha', 'id_tienda', 'sku', 'product_name', 'precio_base_interno',
+    'precio_unitario', 'cantidad_vendida', 'stock_disponible', 'competitor_price'
+]
+
+
+def competitor_price_index(df_catalog, df_competitor, df_matches=None):
+    """
+    Índices para ubicar el precio de la competencia de cada producto del catálogo
+    en `df_competitor` (`sku_competidor`, `competitor_price`). Si una llave
+    aparece repetida se conserva su primera fila; los productos sin
+    `competitor_sku` se ligan con el mejor empate por nombre de `df_matches`.
+    """
+    df_catalog = df_catalog.drop_duplicates('sku')
+    df_competitor = df_competitor.drop_duplicates('sku_competidor')
+    competitor_skus = best_competitor_skus(df_catalog, df_matches)
+    return {
+        'catalog_index': pd.Index(df_catalog['sku']),
+        'competitor_skus': competitor_skus,
+        # Posición en la tabla de competencia de cada producto del catálogo (-1 = sin precio).
+        'competitor_pos': np.append(pd.Index(df_competitor['sku_competidor']).get_indexer(competitor_skus), -1),
+        'competitor_price': df_competitor['competitor_price'].to_numpy(),
+    }
+
+
+def _build_dimension_index(df_catalog, df_inventory, df_competitor, df_matches=None, df_history=None):
+    """
+    Construye una sola vez los índices hash de las tablas de dimensiones
+    (catálogo por `sku`, inventario por `sku`-`id_tienda`, competencia por
+    `sku_competidor`, ver `competitor_price_index`) para enriquecer las ventas
+    con búsquedas en lugar de merges. Si una llave aparece repetida se conserva
+    su primera fila.
+
+    Con `df_history` (historial de precios de la competencia) se indexa además
+    el precio vigente por fecha, para las búsquedas as-of de `_enrich_sales`.
+    """
+    df_catalog = df_catalog.drop_duplicates('sku')
+    df_inventory = df_inventory.drop_duplicates(['sku', 'id_tienda'])
+    dims = competitor_price_index(df_catalog, df_competitor, df_matches)
+    dims.update({
+        'product_name': pd.Categorical(df_catalog['product_name']),
+        'base_price': df_catalog['base_price'].to_numpy(),
+        'inventory_index': pd.MultiIndex.from_frame(df_inventory[['sku', 'id_tienda']]),
+        'stock_disponible': df_inventory['stock_disponible'].to_numpy(),
+        'competitor_asof': None if df_history is None else build_asof_index(df_history, dims['competitor_skus']),
+    })
+    return dims
+
+
+def _lookup(values, positions):
+    # Las posiciones -1 (sin coincidencia) quedan como NaN, igual que un merge 'left'.
+    return take(values, positions, allow_fill=True)
+
+
+def _enrich_sales(df_sales, dims):
+    """
+    Integra un bloque de ventas con catálogo, inventario y precios de la
+    competencia mediante los índices de `_build_dimension_index`, y proyecta
+    las columnas de la tabla analítica.
+    """
+    fecha = pd.to_datetime(df_sales['fecha'])
+    # Los SKU se buscan una vez por categoría y no una vez por venta.
+    sku = pd.Categorical(df_sales['sku'])
+    id_tienda = df_sales['id_tienda'].to_numpy()
+
+    # El -1 agregado al final cubre el código -1 de los SKU nulos.
+    catalog_pos = np.append(dims['catalog_index'].get_indexer(sku.categories), -1)[sku.codes]
+    inventory_pos = dims['inventory_index'].get_indexer(pd.MultiIndex.from_arrays([sku, id_tienda]))
+    if dims['competitor_asof'] is not None:
+        # Precio de la competencia vigente en la fecha de cada venta.
+        competitor_price = asof_prices(dims['competitor_asof'], catalog_pos, fecha)
+    else:
+        competitor_price = _lookup(dims['competitor_price'], dims['competitor_pos'][catalog_pos])
+
+    return apply_schema(pd.DataFrame({
+        'fecha': fecha.to_numpy(),
+        'id_tienda': id_tienda,
+        'sku': sku,
+        'product_name': _lookup(dims['product_name'], catalog_pos),
+        'precio_base_interno': _lookup(dims['base_price'], catalog_pos),
+        'precio_unitario': (df_sales['precio_final'] / df_sales['cantidad_vendida']).to_numpy(),
+        'cantidad_vendida': df_sales['cantidad_vendida'].to_numpy(),
+        'stock_disponible': _lookup(dims['stock_disponible'], inventory_pos),
+        'competitor_price': competitor_price,
+    }, columns=ANALYTICAL_COLUMNS))
+
+
+def refresh_competitor_prices(df_state, dims):
+    """
+    El estado actual es la base de las recomendaciones de hoy: su
+    `competitor_price` es el de la última extracción, no el vigente en la fecha
+    de la última venta. `dims` viene de `competitor_price_index` (o de
+    `_build_dimension_index`) con los precios de `load_snapshot_prices`.
+    """
+    sku = pd.Categorical(df_state['sku'])
+    catalog_pos = np.append(dims['catalog_index'].get_indexer(sku.categories), -1)[sku.codes]
+    prices = _lookup(dims['competitor_price'], dims['competitor_pos'][catalog_pos])
+    return apply_schema(df_state.assign(competitor_price=prices))
+
+
+def transform_data(project_root, storage_format=None, incremental=False, chunk_size=None):
     """
     Carga, limpia, integra y transforma los datos de diversas fuentes
     en una única tabla analítica, usando la ruta del proyecto proporcionada.
+    La tabla se guarda particionada por mes de `fecha` y por `id_tienda`.
+
+    Cada venta lleva el precio de la competencia vigente en su `fecha`, tomado del
+    historial de precios (ver `src.processing.competitor_history`) con una
+    búsqueda as-of; el estado actual lleva el de la última extracción.
+
+    Con `incremental=True` solo se procesan las ventas posteriores a la marca de
+    agua (última `fecha` procesada) y se agregan a la tabla existente. Si cambió
+    alguna tabla de dimensiones (catálogo o inventario) o el historial de la
+    competencia hasta la marca de agua, se reconstruye la tabla completa
+    automáticamente.
+
+    Con `chunk_size` las ventas se leen y se escriben por bloques (modo streaming):
+    las dimensiones se indexan una sola vez y la memoria máxima depende del tamaño
+    de bloque y de las dimensiones, no del volumen de ventas.
+
+    La tabla usa los tipos compactos de `ANALYTICAL_SCHEMA`. Regresa el estado
+    actual (última fila por sku-tienda) para pasarlo en memoria al modelo, o None
+    si no hubo ventas que transformar.
     """
     INTERNAL_PATH = os.path.join(project_root, 'data', 'synthetic_data', 'internal')
     SCRAPED_PATH = os.path.join(project_root, 'data', 'scraped_data')
@@ -17,49 +153,157 @@ def transform_data(project_root):
 
     print("--- Iniciando Fase 3: Transformación de Datos ---")
 
+    sales_base = os.path.join(INTERNAL_PATH, 'daily_sales')
+    inventory_base = os.path.join(INTERNAL_PATH, 'inventory')
+    catalog_base = os.path.join(INTERNAL_PATH, 'product_catalog')
+    competitor_file = os.path.join(SCRAPED_PATH, 'suburbia_products.json')
+    matches_base = os.path.join(PROCESSED_PATH, MATCH_TABLE)
+    output_base = os.path.join(PROCESSED_PATH, 'analytical_base_table')
+    watermark_file = os.path.join(PROCESSED_PATH, WATERMARK_FILE)
+
     print("Cargando archivos de datos...")
     try:
-        df_sales = pd.read_csv(os.path.join(INTERNAL_PATH, 'daily_sales.csv'))
-        df_inventory = pd.read_csv(os.path.join(INTERNAL_PATH, 'inventory.csv'))
-        df_catalog = pd.read_csv(os.path.join(INTERNAL_PATH, 'product_catalog.csv'))
+        df_inventory = read_table(inventory_base, storage_format)
+        df_catalog = read_table(catalog_base, storage_format)
+
+        df_competitor = load_snapshot_prices(project_root)
+        # La última extracción se incorpora al historial (si el scraper no lo hizo ya).
+        sync_history(project_root, storage_format)
+        df_history = load_history(project_root, storage_format)
+        # Los empates por nombre solo se usan (y solo invalidan la tabla) si algún
+        # producto del catálogo no trae `competitor_sku`.
+        df_matches = None
+        if 'competitor_sku' not in df_catalog or df_catalog['competitor_sku'].isna().any():
+            df_matches = load_matches(project_root, storage_format)
+
+        dimensions_checksum = {
+            'product_catalog': file_checksum(table_path(catalog_base, storage_format)),
+            'inventory': file_checksum(table_path(inventory_base, storage_format)),
+        }
+        if df_matches is not None:
+            dimensions_checksum['product_matches'] = file_checksum(table_path(matches_base, storage_format))
+        competitor_checksum = file_checksum(competitor_file)
+        sales_fingerprint = file_fingerprint(table_path(sales_base, storage_format))
+        output_size_before = table_size_bytes(output_base, storage_format)
+
+        # Decide entre carga incremental y reconstrucción completa. Las ventas ya
+        # procesadas solo cambian si cambia el historial de la competencia hasta
+        # la marca de agua; una extracción nueva solo actualiza el estado actual.
+        watermark = read_json(watermark_file) if incremental else None
+        sales_filters = None
+        refresh_only = False
+        state_base = os.path.join(PROCESSED_PATH, CURRENT_STATE_TABLE)
+        if (watermark is None or watermark['ultima_fecha'] is None
+                or not table_exists(output_base, storage_format) or not table_exists(state_base, storage_format)):
+            if incremental:
+                print("No hay marca de agua previa: se reconstruye la tabla completa.")
+        elif watermark['dimensiones'] != dimensions_checksum:
+            print("Cambió una tabla de dimensiones: se reconstruye la tabla completa.")
+            watermark = None
+        elif watermark.get('historial_competencia') != history_checksum(df_history, watermark['ultima_fecha']):
+            print("Cambió el historial de la competencia en fechas ya procesadas: se reconstruye la tabla completa.")
+            watermark = None
+        elif watermark['ventas'] == sales_fingerprint:
+            if watermark.get('competencia') == competitor_checksum:
+                print("No hay ventas nuevas desde la última ejecución. Nada que transformar.")
+                return load_current_state(PROCESSED_PATH, storage_format)
+            print("No hay ventas nuevas; se actualizan los precios de la competencia del estado actual.")
+            refresh_only = True
+        else:
+            print(f"Modo incremental: procesando ventas posteriores a {watermark['ultima_fecha']}.")
+            sales_filters = [('fecha', '>', pd.Timestamp(watermark['ultima_fecha']))]
+
+        if refresh_only:
+            sales_chunks = []
+        elif chunk_size:
+            sales_chunks = iter_table(sales_base, storage_format, filters=sales_filters, chunk_size=chunk_size)
+        else:
+            sales_chunks = [read_table(sales_base, storage_format, filters=sales_filters)]
 
-        df_competitor_raw = pd.read_json(os.path.join(SCRAPED_PATH, 'suburbia_products.json'))
-        df_competitor_raw['competitor_price'] = df_competitor_raw['precio_descuento'].apply(clean_and_parse_price)
-        df_competitor = df_competitor_raw[['sku_competidor', 'competitor_price']].copy()
+        print("Limpiando, pre-procesando e integrando fuentes de datos...")
+        dims = _build_dimension_index(df_catalog, df_inventory, df_competitor, df_matches, df_history)
+        # El estado actual (última fila por sku-tienda) se mantiene junto con la tabla.
+        append = sales_filters is not None or refresh_only
+        df_state = load_current_state(PROCESSED_PATH, storage_format) if append else None
+        stats = {'rows': 0, 'last_date': None, 'head': None, 'state': df_state}
+
+        def enriched_chunks():
+            for df_sales in sales_chunks:
+                if df_sales.empty:
+                    continue
+                df_chunk = _enrich_sales(df_sales, dims)
+                chunk_last_date = df_chunk['fecha'].max()
+                stats['rows'] += len(df_chunk)
+                stats['last_date'] = chunk_last_date if stats['last_date'] is None \
+                    else max(stats['last_date'], chunk_last_date)
+                if stats['head'] is None:
+                    stats['head'] = df_chunk.head()
+                stats['state'] = merge_current_state(stats['state'], df_chunk)
+                yield df_chunk
+
+        # Cada bloque enriquecido se escribe directamente en la salida.
+        output_file = write_table_stream(enriched_chunks(), output_base, storage_format,
+                                         partitioned=True, append=append)
 
     except FileNotFoundError as e:
         print(f"Error: Archivo no encontrado. Asegúrate de haber generado los datos. ({e})")
-        return
+        return None
     except ValueError as e:
         print(f"Error: Uno de los archivos de entrada está vacío o mal formateado. ({e})")
-        return
-
-    print("Limpiando y pre-procesando datos...")
-    df_sales['fecha'] = pd.to_datetime(df_sales['fecha'])
-    df_sales['precio_unitario'] = df_sales['precio_final'] / df_sales['cantidad_vendida']
-
-    print("Integrando fuentes de datos...")
-    df_merged = pd.merge(df_sales, df_catalog, on='sku', how='left')
-    df_merged = pd.merge(df_merged, df_inventory, on=['sku', 'id_tienda'], how='left')
-    df_merged = pd.merge(df_merged, df_competitor,
-                         left_on='competitor_sku', right_on='sku_competidor',
-                         how='left')
+        return None
 
-    df_final = df_merged[[
-        'fecha', 'id_tienda', 'sku', 'product_name', 'base_price',
-        'precio_unitario', 'cantidad_vendida', 'stock_disponible', 'competitor_price'
-    ]].copy()
-    df_final.rename(columns={'base_price': 'precio_base_interno'}, inplace=True)
+    if output_file is None and not refresh_only:
+        print("No hay ventas nuevas que agregar." if append else "No hay ventas que transformar.")
+    if stats['state'] is not None:
+        stats['state'] = refresh_competitor_prices(stats['state'], dims)
+        save_current_state(stats['state'], PROCESSED_PATH, storage_format)
+        record_metrics(
+            filas_entrada=stats['rows'] + len(df_inventory) + len(df_catalog) + len(df_competitor) + len(df_history),
+            filas_salida=stats['rows'] + len(stats['state']),
+            # Cota superior: en modo incremental solo se leen las particiones nuevas de ventas.
+            bytes_leidos=(table_size_bytes(sales_base, storage_format) + table_size_bytes(inventory_base, storage_format)
+                          + table_size_bytes(catalog_base, storage_format) + os.path.getsize(competitor_file)
+                          + table_size_bytes(history_base(project_root), storage_format)),
+            bytes_escritos=(table_size_bytes(output_base, storage_format) - (output_size_before if append else 0)
+                            + table_size_bytes(state_base, storage_format)),
+        )
+    last_date = stats['last_date']
+    if append and last_date is None:
+        last_date = pd.Timestamp(watermark['ultima_fecha'])
+    last_date = None if last_date is None else last_date.isoformat()
 
-    output_file = os.path.join(PROCESSED_PATH, 'analytical_base_table.csv')
-    df_final.to_csv(output_file, index=False)
+    write_json(watermark_file, {
+        'ultima_fecha': last_date,
+        # Identifica la tabla completa: cambia al reconstruirla y se conserva al
+        # agregar ventas, para que los consumidores incrementales (ver
+        # `src.modeling.elasticity`) sepan si las filas ya procesadas siguen vigentes.
+        'generacion': watermark.get('generacion') if append and watermark.get('generacion') else uuid.uuid4().hex,
+        'dimensiones': dimensions_checksum,
+        'historial_competencia': history_checksum(df_history, last_date),
+        'competencia': competitor_checksum,
+        'ventas': sales_fingerprint,
+    })
+    if refresh_only:
+        print("\n--- Transformación Completada ---")
+        print(f"Precios de la competencia actualizados en el estado actual ({len(stats['state'])} registros).")
+        return stats['state']
+    if output_file is None:
+        return None
 
     print("\n--- Transformación Completada ---")
-    print(f"Tabla analítica guardada en: '{output_file}'")
+    print(f"Tabla analítica {'actualizada' if append else 'guardada'} en: '{output_file}' ({stats['rows']} filas)")
     print("Primeras 5 filas de la tabla final:")
-    print(df_final.head())
+    print(stats['head'])
+    return stats['state']
 
 
 if __name__ == "__main__":
-    project_root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    transform_data(project_root_path)
\ No newline at end of file
+    project_root_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser = argparse.ArgumentParser(description="Transformación de datos a la tabla analítica.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Solo agrega las ventas posteriores a la marca de agua.")
+    parser.add_argument('--filas-bloque', type=int, default=CHUNK_SIZE,
+                        help="Ventas por bloque (0 = todas en memoria).")
+    parser.add_argument('--formato', choices=STORAGE_FORMATS, default=None)
+    args = parser.parse_args()
+    transform_data(project_root_path, args.formato, incremental=args.incremental, chunk_size=args.filas_bloque or None)
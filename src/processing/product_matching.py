@@ -0,0 +1,368 @@
+import argparse
+import os
+import re
+import unicodedata
+import numpy as np
+import pandas as pd
+from src.storage import read_table, write_table, table_exists, table_size_bytes, STORAGE_FORMAT
+from src.orchestration.metrics import record_metrics
+
+
+MATCH_TABLE = 'product_matches'
+MATCH_INDEX_FILE = 'product_match_index.npz'
+MATCH_COLUMNS = ['sku', 'product_name', 'sku_competidor', 'nombre_producto', 'similitud', 'rango']
+
+NGRAM_SIZE = 3
+TOP_K = 3
+MIN_SCORE = 0.5
+# Un n-grama presente en más de esta proporción de los productos indexados (y en
+# más de COMMON_MIN_DOCS) se considera común: no genera candidatos, pero sí cuenta
+# en la similitud mediante un bitset por producto.
+MAX_DOC_FREQUENCY = 0.05
+COMMON_MIN_DOCS = 64
+# Máximo de pares (consulta, candidato) que se evalúan a la vez; acota la memoria.
+MAX_PAIRS_PER_BATCH = 2_000_000
+
+
+def normalize_name(name):
+    """
+    Minúsculas, sin acentos y solo letras y dígitos separados por un espacio.
+    """
+    text = unicodedata.normalize('NFKD', str(name).lower()).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.findall(r'[a-z0-9]+', text))
+
+
+def name_ngrams(name, n=NGRAM_SIZE):
+    """
+    Conjunto de n-gramas de caracteres del nombre normalizado (con un espacio
+    al inicio y al final para que los bordes de palabra cuenten).
+    """
+    text = f" {normalize_name(name)} "
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def _encode_names(names, vocabulary, grow):
+    """
+    Convierte nombres en pares (fila, id de n-grama) y regresa también el número
+    de n-gramas distintos de cada nombre y el vocabulario. Con `grow=True` los
+    n-gramas nuevos se agregan al final del vocabulario; si no, se ignoran
+    (cuentan en la longitud, no en la intersección).
+    """
+    ngram_sets = [name_ngrams(name) for name in names]
+    lengths = np.fromiter(map(len, ngram_sets), dtype=np.int32, count=len(ngram_sets))
+    flat = np.array([ngram for ngrams in ngram_sets for ngram in ngrams], dtype=f'U{NGRAM_SIZE}')
+    rows = np.repeat(np.arange(len(ngram_sets), dtype=np.int32), lengths)
+    grams = pd.Index(vocabulary).get_indexer(flat)
+    if grow and (grams < 0).any():
+        vocabulary = np.concatenate([vocabulary, pd.unique(flat[grams < 0])]).astype(f'U{NGRAM_SIZE}')
+        grams = pd.Index(vocabulary).get_indexer(flat)
+    known = grams >= 0
+    return rows[known], grams[known].astype(np.int32), lengths, vocabulary
+
+
+def build_index(doc_keys, doc_names, index=None):
+    """
+    Índice invertido de n-gramas sobre los productos de la competencia. Se guarda
+    como pares (n-grama, documento) para poder agregar documentos sin reconstruirlo;
+    las listas de documentos por n-grama se arman al evaluar.
+
+    Con `index` se agregan los documentos al final del índice existente.
+    """
+    if index is None:
+        index = {
+            'vocabulario': np.array([], dtype=f'U{NGRAM_SIZE}'),
+            'doc_keys': np.array([], dtype=str),
+            'doc_names': np.array([], dtype=str),
+            'doc_lengths': np.array([], dtype=np.int32),
+            'pair_grams': np.array([], dtype=np.int32),
+            'pair_docs': np.array([], dtype=np.int32),
+            'query_keys': np.array([], dtype=str),
+            'query_names': np.array([], dtype=str),
+            'scored_docs': np.array(0),
+            # Parámetros con que se calcularon los empates guardados.
+            'top_k': np.array(0),
+            'min_score': np.array(np.nan),
+        }
+    rows, grams, lengths, vocabulary = _encode_names(doc_names, index['vocabulario'], grow=True)
+    first_doc = len(index['doc_keys'])
+    return {
+        **index,
+        'vocabulario': vocabulary,
+        'doc_keys': np.concatenate([index['doc_keys'], np.asarray(doc_keys, dtype=str)]),
+        'doc_names': np.concatenate([index['doc_names'], np.asarray(doc_names, dtype=str)]),
+        'doc_lengths': np.concatenate([index['doc_lengths'], lengths]),
+        'pair_grams': np.concatenate([index['pair_grams'], grams]),
+        'pair_docs': np.concatenate([index['pair_docs'], rows + first_doc]),
+    }
+
+
+def load_index(index_file):
+    try:
+        with np.load(index_file, allow_pickle=False) as data:
+            return {key: data[key] for key in data.files}
+    except (FileNotFoundError, ValueError, OSError):
+        return None
+
+
+def save_index(index, index_file):
+    # Escritura atómica: un índice a medias obligaría a reconstruirlo.
+    tmp_file = f"{index_file}.tmp"
+    with open(tmp_file, 'wb') as f:
+        np.savez(f, **index)
+    os.replace(tmp_file, index_file)
+
+
+def update_index(index, doc_keys, doc_names):
+    """
+    Agrega al índice los productos nuevos de la competencia. Si un producto ya
+    indexado cambió de nombre o desapareció, el índice se reconstruye. Regresa el
+    índice y el número de documentos que ya estaban indexados y se conservan.
+    """
+    if index is not None:
+        previous = dict(zip(index['doc_keys'].tolist(), index['doc_names'].tolist()))
+        current = dict(zip(doc_keys, doc_names))
+        if all(current.get(key) == name for key, name in previous.items()):
+            new_keys = [key for key in current if key not in previous]
+            if new_keys:
+                print(f"Índice de productos: se agregan {len(new_keys)} productos nuevos.")
+            return build_index(new_keys, [current[key] for key in new_keys], index), len(previous)
+        print("Cambió o desapareció un producto indexado: se reconstruye el índice.")
+    return build_index(doc_keys, doc_names), 0
+
+
+def _posting_lists(index, first_doc):
+    # Listas de documentos por n-grama (formato CSR) para los documentos >= first_doc.
+    mask = index['pair_docs'] >= first_doc
+    grams, docs = index['pair_grams'][mask], index['pair_docs'][mask]
+    order = np.argsort(grams, kind='stable')
+    frequency = np.bincount(grams, minlength=len(index['vocabulario']))
+    indptr = np.concatenate([[0], np.cumsum(frequency)])
+    return indptr, docs[order], frequency, grams, docs
+
+
+def _bitsets(rows, grams, num_rows, common_pos, num_words):
+    # Una fila de palabras de 64 bits por palabra, para que cada palabra sea contigua.
+    bits = np.zeros((num_words, num_rows), dtype=np.uint64)
+    pos = common_pos[grams]
+    mask = pos >= 0
+    np.bitwise_or.at(bits, (pos[mask] // 64, rows[mask]),
+                     np.left_shift(np.uint64(1), (pos[mask] % 64).astype(np.uint64)))
+    return bits
+
+
+def score_candidates(index, query_names, first_doc=0, top_k=TOP_K, min_score=MIN_SCORE):
+    """
+    Similitud de Dice entre n-gramas (2|A∩B| / (|A|+|B|)) de cada consulta contra
+    los documentos del índice a partir de `first_doc`, sin comparar todos contra
+    todos: los candidatos de una consulta son los documentos que comparten con
+    ella al menos un n-grama no común (o todos, si la consulta solo tiene
+    n-gramas comunes). Las intersecciones se cuentan con `np.unique` sobre los
+    pares (consulta, documento) de las listas invertidas y se suman los
+    n-gramas comunes con bitsets.
+
+    Regresa arreglos (consulta, documento, similitud) con los `top_k` documentos
+    de cada consulta con similitud >= `min_score`, ordenados por consulta y por
+    similitud descendente (los empates, por orden en el índice).
+    """
+    num_docs = len(index['doc_keys'])
+    num_queries = len(query_names)
+    empty = (np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([], dtype=np.float32))
+    if num_docs <= first_doc or num_queries == 0:
+        return empty
+
+    indptr, postings, frequency, doc_grams, doc_rows = _posting_lists(index, first_doc)
+    q_rows, q_grams, q_lengths, _ = _encode_names(query_names, index['vocabulario'], grow=False)
+    doc_lengths = index['doc_lengths']
+
+    common = frequency > max(MAX_DOC_FREQUENCY * (num_docs - first_doc), COMMON_MIN_DOCS)
+    common_pos = np.full(len(frequency), -1, dtype=np.int64)
+    common_pos[common] = np.arange(common.sum())
+    num_words = max(1, -(-int(common.sum()) // 64))
+    doc_bits = _bitsets(doc_rows, doc_grams, num_docs, common_pos, num_words)
+    query_bits = _bitsets(q_rows, q_grams, num_queries, common_pos, num_words)
+    doc_common = np.bincount(doc_rows[common[doc_grams]], minlength=num_docs)
+    q_common = np.bincount(q_rows[common[q_grams]], minlength=num_queries)
+
+    # Solo los n-gramas raros (y presentes en los documentos evaluados) generan candidatos.
+    rare = ~common[q_grams] & (frequency[q_grams] > 0)
+    r_rows, r_grams = q_rows[rare], q_grams[rare]
+    r_lengths = frequency[r_grams]
+    cost = np.bincount(r_rows, weights=r_lengths, minlength=num_queries).astype(np.int64)
+    dense = np.bincount(r_rows, minlength=num_queries) == 0
+    cost[dense] = num_docs - first_doc
+
+    # Lotes de consultas contiguas con a lo sumo MAX_PAIRS_PER_BATCH pares cada uno.
+    batch_of = np.concatenate([[0], np.cumsum(cost)[:-1]]) // MAX_PAIRS_PER_BATCH
+    boundaries = np.concatenate([[0], np.flatnonzero(np.diff(batch_of)) + 1, [num_queries]])
+    gram_bounds = np.searchsorted(r_rows, boundaries)
+
+    results = []
+    for b in range(len(boundaries) - 1):
+        q_start, q_end = boundaries[b], boundaries[b + 1]
+        g_start, g_end = gram_bounds[b], gram_bounds[b + 1]
+        lens = r_lengths[g_start:g_end]
+        starts = np.repeat(indptr[r_grams[g_start:g_end]], lens)
+        offsets = np.arange(lens.sum()) - np.repeat(np.cumsum(lens) - lens, lens)
+        keys = np.repeat(r_rows[g_start:g_end].astype(np.int64), lens) * num_docs + postings[starts + offsets]
+        keys, overlap = np.unique(keys, return_counts=True)
+
+        dense_queries = q_start + np.flatnonzero(dense[q_start:q_end])
+        if len(dense_queries):
+            all_docs = np.arange(first_doc, num_docs, dtype=np.int64)
+            dense_keys = (dense_queries[:, None] * num_docs + all_docs).ravel()
+            keys = np.concatenate([keys, dense_keys])
+            overlap = np.concatenate([overlap, np.zeros(len(dense_keys), dtype=overlap.dtype)])
+
+        queries, docs = keys // num_docs, keys % num_docs
+        # Cota superior con todos los n-gramas comunes compartidos: descarta pares sin leer los bitsets.
+        lengths = q_lengths[queries] + doc_lengths[docs]
+        bound = overlap + np.minimum(q_common[queries], doc_common[docs])
+        keep = 2 * bound >= min_score * lengths
+        queries, docs, overlap, lengths = queries[keep], docs[keep], overlap[keep], lengths[keep]
+        for word in range(num_words):
+            overlap = overlap + np.bitwise_count(query_bits[word][queries] & doc_bits[word][docs])
+        score = 2 * overlap / lengths
+
+        keep = score >= min_score
+        queries, docs, score = queries[keep], docs[keep], score[keep]
+        # Los pares ya vienen ordenados por consulta y documento: un solo ordenamiento
+        # estable de consulta + (1 - similitud) / 2 los deja por similitud dentro de cada consulta.
+        order = np.argsort(queries + (1 - score) / 2, kind='stable')
+        queries, docs, score = queries[order], docs[order], score[order]
+        first = np.concatenate([[True], queries[1:] != queries[:-1]])
+        position = np.arange(len(queries))
+        rank = position - np.maximum.accumulate(np.where(first, position, 0))
+        keep = rank < top_k
+        results.append((queries[keep], docs[keep], score[keep].astype(np.float32)))
+
+    return tuple(np.concatenate(parts) for parts in zip(*results)) if results else empty
+
+
+def _matches_frame(index, query_keys, query_names, queries, docs, scores):
+    return pd.DataFrame({
+        'sku': np.asarray(query_keys, dtype=object)[queries],
+        'product_name': np.asarray(query_names, dtype=object)[queries],
+        'sku_competidor': index['doc_keys'][docs].astype(object),
+        'nombre_producto': index['doc_names'][docs].astype(object),
+        'similitud': np.round(scores, 4),
+    })
+
+
+def _top_k(df_matches, top_k):
+    df_matches = df_matches.sort_values(['sku', 'similitud'], ascending=[True, False], kind='stable')
+    df_matches['rango'] = df_matches.groupby('sku').cumcount() + 1
+    return df_matches[df_matches['rango'] <= top_k].reset_index(drop=True)[MATCH_COLUMNS]
+
+
+def match_products(project_root, storage_format=None, top_k=TOP_K, min_score=MIN_SCORE):
+    """
+    Empata los productos del catálogo interno con los de la competencia por el
+    texto del nombre y guarda la tabla `product_matches` con los `top_k`
+    productos de la competencia más parecidos a cada SKU y su similitud (0 a 1).
+
+    El índice de n-gramas de la competencia se guarda en
+    `data/processed/product_match_index.npz` y se actualiza de forma incremental:
+    cuando el scraping trae productos nuevos solo se indexan esos, y los SKU ya
+    empatados solo se comparan contra ellos. Los SKU nuevos o con nombre distinto
+    se comparan contra todo el índice, igual que todos los SKU si los empates
+    guardados se calcularon con otros `top_k` o `min_score`.
+    """
+    fmt = storage_format or STORAGE_FORMAT
+    INTERNAL_PATH = os.path.join(project_root, 'data', 'synthetic_data', 'internal')
+    PROCESSED_PATH = os.path.join(project_root, 'data', 'processed')
+    os.makedirs(PROCESSED_PATH, exist_ok=True)
+    catalog_base = os.path.join(INTERNAL_PATH, 'product_catalog')
+    competitor_file = os.path.join(project_root, 'data', 'scraped_data', 'suburbia_products.json')
+    match_base = os.path.join(PROCESSED_PATH, MATCH_TABLE)
+    index_file = os.path.join(PROCESSED_PATH, MATCH_INDEX_FILE)
+
+    print("--- Empate de productos con la competencia ---")
+    try:
+        df_catalog = read_table(catalog_base, fmt, columns=['sku', 'product_name'])
+        df_competitor = pd.read_json(competitor_file)[['sku_competidor', 'nombre_producto']]
+    except (FileNotFoundError, ValueError, KeyError) as e:
+        print(f"Error: no se pudieron cargar el catálogo o el scraping ({e}).")
+        return None
+    df_catalog = df_catalog.drop_duplicates('sku').dropna()
+    df_competitor = df_competitor.drop_duplicates('sku_competidor').dropna()
+    df_competitor = df_competitor.astype({'sku_competidor': str, 'nombre_producto': str})
+    record_metrics(filas_entrada=len(df_catalog) + len(df_competitor),
+                   bytes_leidos=table_size_bytes(catalog_base, fmt) + os.path.getsize(competitor_file))
+
+    index, kept_docs = update_index(load_index(index_file), df_competitor['sku_competidor'].tolist(),
+                                    df_competitor['nombre_producto'].tolist())
+
+    query_keys = df_catalog['sku'].astype(str).to_numpy()
+    query_names = df_catalog['product_name'].astype(str).to_numpy()
+    previous_names = dict(zip(index['query_keys'].tolist(), index['query_names'].tolist()))
+    same_name = np.array([previous_names.get(k) == n for k, n in zip(query_keys, query_names)], dtype=bool)
+    scored_docs = min(int(index['scored_docs']), kept_docs)
+    same_params = int(index.get('top_k', 0)) == top_k and float(index.get('min_score', np.nan)) == min_score
+    if scored_docs > 0 and not same_params:
+        print("Cambiaron `top_k` o `min_score`: se recalculan todos los empates.")
+    if scored_docs == 0 or not same_params or not table_exists(match_base, fmt):
+        same_name[:] = False
+
+    parts = []
+    if same_name.any():
+        # SKU ya empatados: se conservan sus empates y solo se comparan con los productos nuevos.
+        df_previous = read_table(match_base, fmt)
+        parts.append(df_previous[df_previous['sku'].astype(str).isin(query_keys[same_name])])
+        keys, names = query_keys[same_name], query_names[same_name]
+        parts.append(_matches_frame(index, keys, names, *score_candidates(index, names, scored_docs, top_k, min_score)))
+    keys, names = query_keys[~same_name], query_names[~same_name]
+    parts.append(_matches_frame(index, keys, names, *score_candidates(index, names, 0, top_k, min_score)))
+    print(f"{int((~same_name).sum())} SKU comparados contra todo el índice ({len(index['doc_keys'])} productos).")
+    if same_name.any():
+        print(f"{int(same_name.sum())} SKU ya empatados comparados solo contra "
+              f"{len(index['doc_keys']) - scored_docs} productos nuevos.")
+
+    df_matches = _top_k(pd.concat(parts, ignore_index=True), top_k)
+    output_file = write_table(df_matches, match_base, fmt)
+    index.update({
+        'query_keys': query_keys.astype(str),
+        'query_names': query_names.astype(str),
+        'scored_docs': np.array(len(index['doc_keys'])),
+        'top_k': np.array(top_k),
+        'min_score': np.array(min_score),
+    })
+    save_index(index, index_file)
+    record_metrics(filas_salida=len(df_matches),
+                   bytes_escritos=table_size_bytes(match_base, fmt) + os.path.getsize(index_file))
+
+    print(f"Tabla de empates guardada en: '{output_file}' ({len(df_matches)} empates, "
+          f"{df_matches['sku'].nunique()} SKU con al menos uno).")
+    return df_matches
+
+
+def best_competitor_skus(df_catalog, df_matches):
+    """
+    `competitor_sku` de cada producto del catálogo: el empate exacto si existe y,
+    si falta, el producto de la competencia con mayor similitud en `df_matches`.
+    """
+    competitor_sku = df_catalog['competitor_sku'] if 'competitor_sku' in df_catalog \
+        else pd.Series(None, index=df_catalog.index, dtype=object)
+    if df_matches is None or df_matches.empty:
+        return competitor_sku
+    best = df_matches[df_matches['rango'] == 1].drop_duplicates('sku').set_index('sku')['sku_competidor']
+    return competitor_sku.fillna(df_catalog['sku'].map(best))
+
+
+def load_matches(project_root, storage_format=None):
+    """
+    Tabla de empates, o None si aún no se ha calculado.
+    """
+    match_base = os.path.join(project_root, 'data', 'processed', MATCH_TABLE)
+    if not table_exists(match_base, storage_format):
+        return None
+    return read_table(match_base, storage_format, columns=['sku', 'sku_competidor', 'rango'])
+
+
+if __name__ == "__main__":
+    project_root_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser = argparse.ArgumentParser(description="Empate de productos por nombre con la competencia.")
+    parser.add_argument('--top', type=int, default=TOP_K, help="Empates por SKU.")
+    parser.add_argument('--umbral', type=float, default=MIN_SCORE, help="Similitud mínima (0 a 1).")
+    parser.add_argument('--formato', default=None, help="Formato de almacenamiento (por defecto, STORAGE_FORMAT).")
+    args = parser.parse_args()
+    match_products(project_root_path, args.formato, args.top, args.umbral)
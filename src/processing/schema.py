@@ -0,0 +1,36 @@
+import pandas as pd
+
+
+# Tipos compactos de la tabla analítica. Se aplican tanto a los DataFrames que
+# se pasan en memoria entre etapas como a las tablas que se guardan y se leen.
+ANALYTICAL_SCHEMA = {
+    'fecha': 'datetime64[ns]',
+    'id_tienda': 'int16',
+    'sku': 'category',
+    'product_name': 'category',
+    'precio_base_interno': 'float32',
+    'precio_unitario': 'float32',
+    'cantidad_vendida': 'int16',
+    # Puede faltar el inventario de una combinación sku-tienda (NaN).
+    'stock_disponible': 'float32',
+    'competitor_price': 'float32',
+}
+
+
+def apply_schema(df, schema=ANALYTICAL_SCHEMA):
+    """
+    Convierte las columnas presentes en `df` a los tipos declarados en `schema`.
+    Las columnas que ya tienen el tipo correcto no se copian.
+    """
+    casts = {}
+    for col, dtype in schema.items():
+        if col not in df.columns or str(df[col].dtype) == dtype:
+            continue
+        if dtype.startswith('datetime64'):
+            casts[col] = pd.to_datetime(df[col]).astype(dtype)
+        else:
+            casts[col] = df[col].astype(dtype)
+    if not casts:
+        return df
+    return df.assign(**casts)
+
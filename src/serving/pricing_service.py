@@ -0,0 +1,248 @@
+import argparse
+import asyncio
+import json
+import os
+from datetime import datetime
+from functools import partial
+from urllib.parse import urlsplit, parse_qs
+from src.modeling.pricing_model import apply_pricing_rules, load_model_inputs, MODEL_COLUMNS
+from src.modeling.elasticity import ELASTICITY_TABLE
+from src.modeling.demand_velocity import VELOCITY_TABLE
+from src.processing.current_state import load_current_state, CURRENT_STATE_TABLE
+from src.processing.competitor_history import load_snapshot_prices, COMPETITOR_SNAPSHOT_FILE
+from src.processing.data_transformer import competitor_price_index, refresh_competitor_prices
+from src.processing.product_matching import load_matches, MATCH_TABLE
+from src.storage import read_table, table_path, file_fingerprint, STORAGE_FORMAT
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+RELOAD_INTERVAL = 2.0
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               413: 'Payload Too Large'}
+
+
+def _watched_paths(project_root, storage_format=None, use_elasticity=False, use_coverage=False):
+    """
+    Artefactos cuyo cambio en disco provoca una recarga del servicio.
+    """
+    processed = os.path.join(project_root, 'data', 'processed')
+    paths = [
+        table_path(os.path.join(processed, 'analytical_base_table'), storage_format),
+        table_path(os.path.join(processed, CURRENT_STATE_TABLE), storage_format),
+        table_path(os.path.join(project_root, 'data', 'synthetic_data', 'internal', 'product_catalog'), storage_format),
+        table_path(os.path.join(processed, MATCH_TABLE), storage_format),
+        os.path.join(project_root, 'data', 'scraped_data', COMPETITOR_SNAPSHOT_FILE),
+    ]
+    if use_elasticity:
+        paths.append(table_path(os.path.join(processed, ELASTICITY_TABLE), storage_format))
+    if use_coverage:
+        paths.append(table_path(os.path.join(processed, VELOCITY_TABLE), storage_format))
+    return paths
+
+
+def _paths_fingerprint(paths):
+    return tuple(file_fingerprint(p) if os.path.exists(p) else None for p in paths)
+
+
+def _latest_competitor_prices(df_state, project_root, storage_format=None):
+    """
+    Actualiza `competitor_price` del estado actual con la última extracción, sin
+    esperar a que se vuelva a ejecutar la transformación; usa la misma fuente y
+    el mismo cruce que `transform_data`. Si falta el catálogo o el scraping se
+    conservan los precios del estado actual.
+    """
+    catalog_base = os.path.join(project_root, 'data', 'synthetic_data', 'internal', 'product_catalog')
+    try:
+        df_catalog = read_table(catalog_base, storage_format, columns=['sku', 'competitor_sku'])
+        df_competitor = load_snapshot_prices(project_root)
+    except (FileNotFoundError, ValueError, KeyError) as e:
+        print(f"ADVERTENCIA: no se actualizaron los precios de la competencia ({e}).")
+        return df_state
+    dims = competitor_price_index(df_catalog, df_competitor, load_matches(project_root, storage_format))
+    return refresh_competitor_prices(df_state, dims)
+
+
+def build_snapshot(project_root, storage_format=None, use_elasticity=False, use_coverage=False):
+    """
+    Calcula las recomendaciones de todo el estado actual y las indexa por
+    (sku, id_tienda), ya serializadas en JSON, para responder cada consulta con
+    una sola búsqueda en un diccionario. Las reglas, elasticidades y velocidad
+    de demanda son las mismas que usa el modelo con las mismas opciones (ver
+    `load_model_inputs`).
+    """
+    processed = os.path.join(project_root, 'data', 'processed')
+    rules, df_elasticities, df_velocity = load_model_inputs(project_root, storage_format, use_elasticity, use_coverage)
+    df_state = load_current_state(processed, storage_format, columns=MODEL_COLUMNS)
+    df_state = _latest_competitor_prices(df_state, project_root, storage_format)
+    df_recommendations = apply_pricing_rules(df_state, rules, df_elasticities, velocity=df_velocity)
+
+    lines = df_recommendations.to_json(orient='records', lines=True, force_ascii=False).splitlines()
+    keys = zip(df_recommendations['sku'].astype(str), df_recommendations['id_tienda'].astype(int))
+    return {
+        'registros': {key: line.encode('utf-8') for key, line in zip(keys, lines)},
+        'version': datetime.now().isoformat(timespec='seconds'),
+    }
+
+
+class PricingService:
+    """
+    Servicio HTTP (asyncio) que mantiene en memoria las recomendaciones del
+    estado actual, con las mismas opciones del modelo (`use_elasticity`,
+    `use_coverage`) con que se publicaron las recomendaciones. Revisa periódicamente los artefactos de `_watched_paths` y, si
+    cambiaron, construye un snapshot nuevo en un hilo aparte y lo reemplaza con una
+    sola asignación: las peticiones en curso terminan con el snapshot que tomaron.
+
+    Rutas:
+        GET  /precio?sku=SKU1000&id_tienda=100   una recomendación
+        POST /precios  [{"sku": ..., "id_tienda": ...}, ...]   varias (null si no existe)
+        GET  /salud    número de registros y versión del snapshot
+    """
+
+    def __init__(self, project_root, storage_format=None, reload_interval=RELOAD_INTERVAL, use_elasticity=False,
+                 use_coverage=False):
+        self.project_root = project_root
+        self.storage_format = storage_format or STORAGE_FORMAT
+        self.reload_interval = reload_interval
+        self.options = {'use_elasticity': use_elasticity, 'use_coverage': use_coverage}
+        self.paths = _watched_paths(project_root, self.storage_format, **self.options)
+        self.fingerprint = _paths_fingerprint(self.paths)
+        self.snapshot = build_snapshot(project_root, self.storage_format, **self.options)
+
+    async def _watch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            # La huella se toma antes de leer: si algo cambia durante la carga, se recarga de nuevo.
+            fingerprint = await loop.run_in_executor(None, _paths_fingerprint, self.paths)
+            if fingerprint == self.fingerprint:
+                continue
+            try:
+                snapshot = await loop.run_in_executor(None, partial(build_snapshot, self.project_root,
+                                                                    self.storage_format, **self.options))
+            except (FileNotFoundError, ValueError) as e:
+                print(f"Error al recargar el snapshot, se conserva el anterior: {e}")
+                continue
+            self.snapshot, self.fingerprint = snapshot, fingerprint
+            print(f"Snapshot recargado: {len(snapshot['registros'])} registros (versión {snapshot['version']}).")
+
+    def lookup(self, sku, id_tienda, snapshot=None):
+        snapshot = snapshot or self.snapshot
+        return snapshot['registros'].get((sku, id_tienda))
+
+    def dispatch(self, method, target, body):
+        """
+        Resuelve una petición y regresa (estado HTTP, cuerpo JSON en bytes).
+        """
+        snapshot = self.snapshot
+        url = urlsplit(target)
+
+        if url.path == '/precio':
+            if method != 'GET':
+                return 405, b'{"error": "Usa GET"}'
+            params = parse_qs(url.query)
+            try:
+                sku, id_tienda = params['sku'][0], int(params['id_tienda'][0])
+            except (KeyError, ValueError):
+                return 400, b'{"error": "Se requieren sku e id_tienda (entero)"}'
+            record = self.lookup(sku, id_tienda, snapshot)
+            if record is None:
+                return 404, b'{"error": "No hay recomendacion para ese sku-tienda"}'
+            return 200, record
+
+        if url.path == '/precios':
+            if method != 'POST':
+                return 405, b'{"error": "Usa POST"}'
+            try:
+                items = json.loads(body)
+                keys = [(str(item['sku']), int(item['id_tienda'])) for item in items]
+            except (ValueError, TypeError, KeyError):
+                return 400, b'{"error": "Se espera una lista JSON de {sku, id_tienda}"}'
+            records = [self.lookup(sku, id_tienda, snapshot) or b'null' for sku, id_tienda in keys]
+            return 200, b'{"resultados": [' + b','.join(records) + b']}'
+
+        if url.path == '/salud':
+            return 200, json.dumps({'registros': len(snapshot['registros']), 'version': snapshot['version']}).encode()
+
+        return 404, b'{"error": "Ruta no encontrada"}'
+
+    async def _handle_connection(self, reader, writer):
+        # HTTP/1.1 mínimo con conexiones persistentes (keep-alive).
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    writer.write(_response(400, b'{"error": "Peticion mal formada"}', keep_alive=False))
+                    break
+                if length > MAX_BODY_BYTES:
+                    writer.write(_response(413, b'{"error": "Cuerpo demasiado grande"}', keep_alive=False))
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                status, payload = self.dispatch(method, target, body)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        watcher = asyncio.create_task(self._watch())
+        print(f"Servicio de precios escuchando en http://{host}:{port} "
+              f"({len(self.snapshot['registros'])} registros, recarga cada {self.reload_interval} s)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+
+def _response(status, payload, keep_alive=True):
+    return (
+        f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+        f"Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(payload)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    ).encode('latin-1') + payload
+
+
+if __name__ == "__main__":
+    project_root_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser = argparse.ArgumentParser(description="Servicio HTTP de recomendaciones de precio.")
+    parser.add_argument('--raiz', default=project_root_path, help="Raíz del proyecto (carpeta con data/).")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--puerto', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--formato', default=None, help="Formato de almacenamiento (por defecto, STORAGE_FORMAT).")
+    parser.add_argument('--recarga', type=float, default=RELOAD_INTERVAL, help="Segundos entre revisiones de cambios.")
+    parser.add_argument('--elasticidad', action='store_true',
+                        help="Usa las elasticidades estimadas, como `src.main --elasticidad`.")
+    parser.add_argument('--cobertura', action='store_true',
+                        help="Agrega las reglas de días de cobertura, como `src.main --cobertura`.")
+    args = parser.parse_args()
+
+    try:
+        service = PricingService(args.raiz, args.formato, args.recarga, args.elasticidad, args.cobertura)
+    except FileNotFoundError as e:
+        print(f"Error: no se encontró el estado actual ({e}). Ejecuta la transformación primero.")
+    else:
+        asyncio.run(service.serve(args.host, args.puerto))
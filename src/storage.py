@@ -0,0 +1,309 @@
+import argparse
+import os
+import shutil
+import uuid
+import pandas as pd
+
+
+# Formato de las tablas intermedias: 'parquet' (por defecto) o 'csv'.
+STORAGE_FORMAT = os.environ.get('STORAGE_FORMAT', 'parquet')
+STORAGE_FORMATS = ('parquet', 'csv')
+
+# Columnas de partición para las tablas con fecha: mes de `fecha` y tienda.
+PARTITION_COLS = ['mes', 'id_tienda']
+MAX_PARTITIONS = 100_000
+
+
+def _resolve_format(storage_format):
+    storage_format = storage_format or STORAGE_FORMAT
+    if storage_format not in STORAGE_FORMATS:
+        raise ValueError(f"Formato de almacenamiento no soportado: '{storage_format}'. Usa uno de {STORAGE_FORMATS}.")
+    return storage_format
+
+
+def table_path(base_path, storage_format=None):
+    """
+    Ruta física de una tabla a partir de su ruta base sin extensión
+    (ej. 'data/processed/analytical_base_table').
+    """
+    return f"{base_path}.{_resolve_format(storage_format)}"
+
+
+def table_exists(base_path, storage_format=None):
+    return os.path.exists(table_path(base_path, storage_format))
+
+
+def _with_partition_cols(df):
+    df = df.copy()
+    df['mes'] = pd.to_datetime(df['fecha']).dt.strftime('%Y-%m')
+    return df
+
+
+def _partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    return ds.partitioning(pa.schema([('mes', pa.string()), ('id_tienda', pa.int64())]), flavor='hive')
+
+
+def _to_arrow(df, partitioned):
+    import pyarrow as pa
+    if partitioned:
+        # Ordenar por las llaves de partición deja un solo fragmento por partición.
+        df = _with_partition_cols(df).sort_values(PARTITION_COLS, kind='stable')
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Las columnas categóricas se guardan como texto: Parquet ya las codifica con
+    # diccionario, y así los bloques con distintas categorías comparten esquema.
+    fields = [pa.field(f.name, f.type.value_type) if pa.types.is_dictionary(f.type) else f
+              for f in table.schema]
+    table = table.cast(pa.schema(fields, metadata=table.schema.metadata))
+    return table.combine_chunks()
+
+
+def write_table_stream(chunks, base_path, storage_format=None, partitioned=False, append=False):
+    """
+    Escribe una tabla a partir de un iterable de DataFrames, sin reunirlos en
+    memoria. Al sobrescribir, se escribe en una ruta temporal que reemplaza a la
+    tabla al final con renames, para que un lector nunca la vea a medias (ver
+    el comentario del reemplazo). Regresa la ruta de
+    la tabla, o None si no hubo filas que escribir.
+    """
+    storage_format = _resolve_format(storage_format)
+    path = table_path(base_path, storage_format)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    target = path if append else f"{path}.tmp-{uuid.uuid4().hex}"
+
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        return None
+
+    if storage_format == 'csv':
+        header = not (append and os.path.exists(path))
+        first.to_csv(target, mode='a' if append else 'w', header=header, index=False)
+        for df in chunks:
+            df.to_csv(target, mode='a', header=False, index=False)
+    else:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        first_table = _to_arrow(first, partitioned)
+        schema = first_table.schema
+
+        def batches():
+            yield from first_table.to_batches()
+            for df in chunks:
+                # Un bloque puede traer nulos donde el primero traía enteros (o al revés).
+                yield from _to_arrow(df, partitioned).cast(schema).to_batches()
+
+        ds.write_dataset(
+            pa.RecordBatchReader.from_batches(schema, batches()), target, format='parquet',
+            partitioning=_partitioning() if partitioned else None,
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore',
+            max_partitions=MAX_PARTITIONS,
+        )
+
+    if not append:
+        # Un directorio no se puede reemplazar de forma atómica si ya existe: la
+        # tabla anterior se aparta con un rename, la nueva toma su lugar con otro
+        # y solo entonces se borra la anterior. Entre los dos renames (sin E/S de
+        # datos) la ruta no existe, pero nunca contiene una tabla a medias.
+        old = None
+        if os.path.isdir(path):
+            old = f"{path}.old-{uuid.uuid4().hex}"
+            os.replace(path, old)
+        try:
+            os.replace(target, path)
+        except OSError:
+            if old is not None:
+                os.replace(old, path)
+            raise
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+    return path
+
+
+def write_table(df, base_path, storage_format=None, partitioned=False, append=False):
+    """
+    Escribe una tabla con el backend indicado. En Parquet la tabla es un
+    directorio de fragmentos; con `partitioned=True` se particiona por mes de
+    `fecha` y por `id_tienda`. Con `append=True` se agregan filas sin reescribir
+    lo existente.
+    """
+    path = write_table_stream([df], base_path, storage_format, partitioned, append)
+    return path or table_path(base_path, storage_format)
+
+
+def _to_expression(filters):
+    import pyarrow.parquet as pq
+    return pq.filters_to_expression(filters) if filters else None
+
+
+def _apply_filters(df, filters):
+    ops = {
+        '==': lambda s, v: s == v, '!=': lambda s, v: s != v,
+        '>': lambda s, v: s > v, '>=': lambda s, v: s >= v,
+        '<': lambda s, v: s < v, '<=': lambda s, v: s <= v,
+        'in': lambda s, v: s.isin(v), 'not in': lambda s, v: ~s.isin(v),
+    }
+    for col, op, value in filters:
+        df = df[ops[op](df[col], value)]
+    return df
+
+
+def read_table(base_path, storage_format=None, columns=None, filters=None):
+    """
+    Lee una tabla. `columns` limita las columnas leídas y `filters` es una lista
+    de tuplas `(columna, operador, valor)`. En Parquet ambos se aplican en la
+    lectura (poda de columnas y de particiones/row groups); en CSV se aplican
+    después de leer.
+    """
+    storage_format = _resolve_format(storage_format)
+    path = table_path(base_path, storage_format)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No existe la tabla '{path}'")
+
+    if storage_format == 'csv':
+        usecols = None
+        if columns is not None:
+            usecols = list(dict.fromkeys(list(columns) + [f[0] for f in filters or []]))
+        df = pd.read_csv(path, usecols=usecols)
+        if 'fecha' in df.columns:
+            df['fecha'] = pd.to_datetime(df['fecha'])
+        if filters:
+            df = _apply_filters(df, filters).reset_index(drop=True)
+        return df[list(columns)] if columns is not None else df
+
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(path, format='parquet', partitioning=_partitioning()
+                         if _is_partitioned(path) else None)
+    if columns is None:
+        columns = [c for c in dataset.schema.names if c != 'mes']
+    table = dataset.to_table(columns=list(columns), filter=_to_expression(filters))
+    return table.to_pandas()
+
+
+def iter_table(base_path, storage_format=None, columns=None, filters=None, chunk_size=1_000_000):
+    """
+    Lee una tabla por bloques de hasta `chunk_size` filas, con la misma poda de
+    columnas y filtros que `read_table`. La memoria depende del tamaño de bloque,
+    no del tamaño de la tabla.
+    """
+    storage_format = _resolve_format(storage_format)
+    path = table_path(base_path, storage_format)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No existe la tabla '{path}'")
+
+    if storage_format == 'csv':
+        usecols = None
+        if columns is not None:
+            usecols = list(dict.fromkeys(list(columns) + [f[0] for f in filters or []]))
+        for df in pd.read_csv(path, usecols=usecols, chunksize=chunk_size):
+            if 'fecha' in df.columns:
+                df['fecha'] = pd.to_datetime(df['fecha'])
+            if filters:
+                df = _apply_filters(df, filters).reset_index(drop=True)
+            yield df[list(columns)] if columns is not None else df
+        return
+
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(path, format='parquet', partitioning=_partitioning()
+                         if _is_partitioned(path) else None)
+    if columns is None:
+        columns = [c for c in dataset.schema.names if c != 'mes']
+
+    # Los fragmentos pueden ser pequeños: se acumulan hasta completar un bloque.
+    pending, pending_rows = [], 0
+    for batch in dataset.to_batches(columns=list(columns), filter=_to_expression(filters), batch_size=chunk_size):
+        if batch.num_rows == 0:
+            continue
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        if pending_rows >= chunk_size:
+            yield pa.Table.from_batches(pending).to_pandas()
+            pending, pending_rows = [], 0
+    if pending:
+        yield pa.Table.from_batches(pending).to_pandas()
+
+
+def _is_partitioned(path):
+    return any(name.startswith('mes=') for name in os.listdir(path))
+
+
+def export_csv(base_path, output_file, storage_format=None, columns=None, filters=None):
+    """
+    Exporta una tabla almacenada (en cualquier formato) a un CSV. Es la salida
+    en CSV de las tablas intermedias (ver la CLI de este módulo).
+    """
+    df = read_table(base_path, storage_format, columns=columns, filters=filters)
+    df.to_csv(output_file, index=False)
+    return output_file
+
+
+def table_size_bytes(base_path, storage_format=None):
+    path = table_path(base_path, storage_format)
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(dirpath, f)) for f in filenames)
+    return total
+
+
+def _table_files(path):
+    if os.path.isfile(path):
+        return [path]
+    return sorted(
+        os.path.join(dirpath, f)
+        for dirpath, _, filenames in os.walk(path) for f in filenames
+    )
+
+
+def file_checksum(path):
+    """
+    SHA-256 del contenido de un archivo o de todos los archivos de un directorio.
+    Pensado para tablas pequeñas (dimensiones, JSON de scraping).
+    """
+    import hashlib
+    digest = hashlib.sha256()
+    for file in _table_files(path):
+        digest.update(os.path.relpath(file, path).encode())
+        with open(file, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path):
+    """
+    Huella barata de un archivo o directorio (rutas, tamaños y fechas de
+    modificación), para tablas grandes donde leer todo el contenido sería costoso.
+    """
+    import hashlib
+    digest = hashlib.sha256()
+    for file in _table_files(path):
+        stat = os.stat(file)
+        digest.update(f"{os.path.relpath(file, path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta una tabla intermedia a CSV.")
+    parser.add_argument('tabla', help="Ruta base de la tabla, sin extensión (ej. data/processed/analytical_base_table).")
+    parser.add_argument('salida', help="Archivo CSV de salida.")
+    parser.add_argument('--formato', choices=STORAGE_FORMATS, default=None,
+                        help="Formato en que está guardada la tabla (por defecto, STORAGE_FORMAT).")
+    parser.add_argument('--columnas', nargs='+', default=None, help="Columnas a exportar (por defecto, todas).")
+    parser.add_argument('--tiendas', nargs='+', type=int, default=None, help="Solo las filas de estas tiendas.")
+    args = parser.parse_args()
+
+    filters = [('id_tienda', 'in', args.tiendas)] if args.tiendas else None
+    try:
+        output_file = export_csv(args.tabla, args.salida, args.formato, args.columnas, filters)
+    except (FileNotFoundError, KeyError, ValueError) as e:
+        print(f"Error: no se pudo exportar '{table_path(args.tabla, args.formato)}' ({e}).")
+    else:
+        print(f"Tabla exportada a '{output_file}'.")
@@ -1,5 +1,14 @@
+import json
+import os
 import pandas as pd
+import numpy as np
 import re
+from collections import OrderedDict
+
+
+PRICE_RANGE_SEPARATORS = r'[-–—]'
+PRICE_CACHE_MAXSIZE = 10_000
+_price_cache = OrderedDict()
 
 
 def clean_and_parse_price(price_str):
@@ -7,19 +16,85 @@ def clean_and_parse_price(price_str):
     if price_str is None:
         return None
 
+    price_str = str(price_str)
+
+    # Si hay un guion (rango de precios), toma el primer número.
+    # Debe hacerse antes de limpiar, porque la limpieza elimina el guion.
+    price_str = re.split(PRICE_RANGE_SEPARATORS, price_str, maxsplit=1)[0]
+
     # expresión regular para eliminar todo lo que no sea un dígito o un punto.
-    cleaned_str = re.sub(r'[^\d.]', '', str(price_str))
+    cleaned_str = re.sub(r'[^\d.]', '', price_str)
 
     # Si después de limpiar no queda nada, retornamos None.
     if not cleaned_str:
         return None
 
     try:
-        # Si hay un guion (rango de precios), toma el primer número
-        if '-' in cleaned_str:
-            cleaned_str = cleaned_str.split('-')[0]
-
         return float(cleaned_str)
     except (ValueError, TypeError):
         # Si algo falla en la conversión, retornamos None.
         return None
+
+
+def _parse_price_strings(raw_strings):
+    """
+    Versión columnar de `clean_and_parse_price` para una lista de textos únicos.
+    """
+    s = pd.Series(raw_strings, dtype=object)
+    cleaned = s.str.split(PRICE_RANGE_SEPARATORS, n=1, regex=True).str[0].str.replace(r'[^\d.]', '', regex=True)
+
+    # Solo se convierten los textos que `float()` aceptaría; el resto queda en NaN.
+    valid = cleaned.str.fullmatch(r'\d+\.?\d*|\.\d+').fillna(False).to_numpy(dtype=bool)
+    values = np.full(len(s), np.nan)
+    values[valid] = cleaned[valid].astype(float).to_numpy()
+    return values
+
+
+def parse_prices(series):
+    """
+    Limpia y convierte a float una columna completa de precios con operaciones
+    de texto de pandas. Da los mismos resultados que `clean_and_parse_price`
+    (con NaN en lugar de None). Los textos repetidos se procesan una sola vez y
+    se guardan en un caché acotado (LRU), ya que las páginas repiten pocos precios.
+    """
+    series = pd.Series(series)
+    codes, uniques = pd.factorize(series.astype(object), use_na_sentinel=True)
+    keys = [str(u) for u in uniques]
+
+    misses = [k for k in keys if k not in _price_cache]
+    if misses:
+        for key, value in zip(misses, _parse_price_strings(misses)):
+            _price_cache[key] = value
+    unique_values = np.empty(len(keys) + 1)
+    for i, key in enumerate(keys):
+        _price_cache.move_to_end(key)
+        unique_values[i] = _price_cache[key]
+    unique_values[-1] = np.nan  # los nulos (código -1) quedan en NaN
+
+    while len(_price_cache) > PRICE_CACHE_MAXSIZE:
+        _price_cache.popitem(last=False)
+
+    return pd.Series(unique_values[codes], index=series.index, dtype=float)
+
+
+def read_json(path):
+    """
+    Lee un archivo JSON (marcas de agua, estados). Regresa None si no existe o
+    está corrupto.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_json(path, data):
+    """
+    Escribe un archivo JSON de forma atómica: a un temporal y luego con rename,
+    para que un lector nunca lo vea a medias.
+    """
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_file, path)
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+from src.modeling.pricing_model import apply_pricing_rules, COVERAGE_RULES, DEFAULT_REASON, PRICING_RULES
+
+
+def test_unknown_stock_does_not_trigger_stock_rules():
+    df_state = pd.DataFrame({
+        'sku': ['SKU1', 'SKU2', 'SKU3'],
+        'id_tienda': [100, 100, 100],
+        'product_name': ['a', 'b', 'c'],
+        'precio_base_interno': np.array([100.0, 100.0, 100.0], dtype='float32'),
+        'precio_unitario': np.array([100.0, 100.0, 100.0], dtype='float32'),
+        'stock_disponible': np.array([np.nan, 80.0, 5.0], dtype='float32'),
+        'competitor_price': np.array([np.nan, np.nan, np.nan], dtype='float32'),
+    })
+    result = apply_pricing_rules(df_state)
+    assert result['stock_actual'].isna().tolist() == [True, False, False]
+    assert result['stock_actual'].iloc[1:].tolist() == [80, 5]
+    assert result['justificacion'].tolist() == [DEFAULT_REASON, 'Descuento por Alto Inventario',
+                                                'Aumento por Bajo Inventario']
+    assert result['precio_recomendado'].iloc[0] == 100.0
+
+
+def test_unknown_stock_has_unknown_coverage():
+    df_state = pd.DataFrame({
+        'sku': ['SKU1'], 'id_tienda': [100], 'product_name': ['a'],
+        'precio_base_interno': [100.0], 'precio_unitario': [100.0],
+        'stock_disponible': [np.nan], 'competitor_price': [np.nan],
+        'dias_cobertura': [np.nan],
+    })
+    result = apply_pricing_rules(df_state, PRICING_RULES + COVERAGE_RULES)
+    assert result['justificacion'].tolist() == [DEFAULT_REASON]
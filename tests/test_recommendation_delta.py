@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+from src.modeling.recommendation_delta import diff_recommendations
+
+
+def _recommendations(prices, reasons):
+    return pd.DataFrame({
+        'sku': ['SKU1', 'SKU2', 'SKU3'],
+        'id_tienda': np.array([100, 100, 100], dtype=np.int64),
+        'precio_recomendado': prices,
+        'justificacion': reasons,
+    })
+
+
+def test_reason_only_change_is_published():
+    df_previous = _recommendations([10.0, 20.0, np.nan], ['Mantener Precio Actual'] * 3)
+    df_current = _recommendations([10.0, 20.0, np.nan],
+                                  ['Mantener Precio Actual', 'Ajuste por Competencia', 'Ajuste por Competencia'])
+    _, df_changes = diff_recommendations(df_previous, df_current)
+    assert df_changes['sku'].tolist() == ['SKU2', 'SKU3']
+    assert df_changes['tipo_cambio'].tolist() == ['modificado', 'modificado']
+    assert df_changes['justificacion'].tolist() == ['Ajuste por Competencia', 'Ajuste por Competencia']
+
+
+def test_unchanged_recommendations_have_no_changes():
+    df_previous = _recommendations([10.0, 20.0, np.nan], ['Mantener Precio Actual'] * 3)
+    _, df_changes = diff_recommendations(df_previous, df_previous.copy())
+    assert df_changes.empty
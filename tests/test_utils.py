@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.utils import clean_and_parse_price, parse_prices
+
+
+# Textos de precio como aparecen en las páginas de la competencia.
+PRICE_STRINGS = [
+    '$1,299.00', '$ 899', '$899.50 MXN', 'MXN 1,049.90', '$1,299.00 - $1,599.00', '$999–$1,199',
+    '$1,234,567.89', '1299', '.99', '12.', '$', '', '   ', 'Agotado', '$1.2.3', '-$500',
+    '$2,499.00 — $2,999.00', 'Desde $349.00', 1299, 899.5, None, np.nan,
+]
+
+
+@pytest.mark.parametrize('price', PRICE_STRINGS)
+def test_parse_prices_matches_clean_and_parse_price(price):
+    expected = clean_and_parse_price(price)
+    result = parse_prices(pd.Series([price], dtype=object)).iloc[0]
+    if expected is None:
+        assert np.isnan(result)
+    else:
+        assert result == expected
+
+
+def test_parse_prices_keeps_index_and_repeated_values():
+    series = pd.Series(['$1,299.00', None, '$1,299.00', '$899 MXN'], index=[10, 11, 12, 13])
+    result = parse_prices(series)
+    assert list(result.index) == [10, 11, 12, 13]
+    np.testing.assert_array_equal(result.to_numpy(), [1299.0, np.nan, 1299.0, 899.0])